@@ -0,0 +1,122 @@
+"""
+Performance checks for qsimulator. Running this file prints the measurements and exits with an error if any of the
+budgets is exceeded, so it can be used as a check before merging.
+
+Import time
+-----------
+"import qsimulator" is lazy and must not pull in numpy or any of the backends. It is timed in a fresh interpreter
+(the best of a few runs, so that a busy machine doesn't fail the check), together with the cost of the first use of
+qsimulator.State, which is when numpy and the core modules get loaded.
+
+Cache blocking
+--------------
+A layered circuit (rotations on every qubit and a CNOT ladder) is run on a 20 qubit State once with one pass over the
+state vector per gate (State.apply) and once with the cache-blocked schedule of qsimulator.CacheBlocking. The number of
+passes (sweeps) of the blocked schedule per gate has to stay under a budget, the times are only reported.
+"""
+
+import subprocess
+import sys
+
+IMPORT_TIME_BUDGET = 0.02  # seconds, for "import qsimulator" alone
+SWEEP_RATIO_BUDGET = 0.25  # sweeps per gate of the blocked schedule of the benchmark circuit
+
+_IMPORT_SCRIPT = """
+import sys, time
+t1 = time.perf_counter()
+import qsimulator
+t2 = time.perf_counter()
+heavy = sorted(name for name in ('numpy', 'qsimulator.QuantumGate', 'qsimulator.MPS', 'qsimulator.Noise')
+               if name in sys.modules)
+qsimulator.State
+t3 = time.perf_counter()
+print(t2 - t1, t3 - t2, ','.join(heavy))
+"""
+
+
+def import_time(repeats=5):
+    """
+    Measures the time it takes to import qsimulator in a fresh interpreter.
+
+    Parameters
+    ----------
+    repeats -> int, number of fresh interpreters, the fastest run is reported
+
+    Returns
+    -------
+    (float, float, list of str) -> time of "import qsimulator", time of the first use of qsimulator.State, and the
+        heavy modules that were loaded by the bare import (should be empty)
+    """
+    results = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, '-c', _IMPORT_SCRIPT], capture_output=True, text=True, check=True)
+        (importTime, firstUseTime, heavy) = output.stdout.split(' ')
+        results.append((float(importTime), float(firstUseTime), [name for name in heavy.strip().split(',') if name]))
+    return min(results)
+
+
+def blocked_sweeps(numQubits=20, layers=4, blockQubits=None):
+    """
+    Runs a layered circuit with and without cache blocking.
+
+    Parameters
+    ----------
+    numQubits -> int
+    layers -> int, number of layers of rotations and CNOT ladders
+    blockQubits -> int, the blocks hold 2**blockQubits amplitudes, by default CacheBlocking.BLOCK_QUBITS
+
+    Returns
+    -------
+    (int, int, float, float) -> number of gates, number of sweeps of the blocked schedule, time with one sweep per
+        gate and time of the blocked schedule
+    """
+    import time
+    import numpy as np
+    from qsimulator.CacheBlocking import BLOCK_QUBITS, schedule_circuit
+    from qsimulator.QuantumGate import cxGate, ryGate, rzGate
+    from qsimulator.QuantumRegister import zeros
+
+    rng = np.random.default_rng(0)
+    circuit = []
+    for _ in range(layers):
+        circuit += [(ryGate(theta), [q]) for q, theta in enumerate(rng.uniform(0, np.pi, numQubits))]
+        circuit += [(cxGate(), [q, q + 1]) for q in range(numQubits - 1)]
+        circuit += [(rzGate(theta), [q]) for q, theta in enumerate(rng.uniform(0, np.pi, numQubits))]
+    schedule = schedule_circuit(circuit, numQubits, BLOCK_QUBITS if blockQubits is None else blockQubits)
+
+    # Warm up the kernels, so that compiling them isn't timed
+    schedule_circuit(circuit[:2], 4, 2).run(zeros(4))
+
+    time1 = time.perf_counter()
+    state = zeros(numQubits)
+    for gate, qubits in circuit:
+        state = state.apply(gate.matrix, qubits)
+    time2 = time.perf_counter()
+    blocked = schedule.run(zeros(numQubits))
+    time3 = time.perf_counter()
+    if not np.allclose(state.vector, blocked.vector):
+        raise Exception("The blocked schedule gave a different state.")
+    return len(circuit), schedule.sweeps, time2 - time1, time3 - time2
+
+
+if __name__ == "__main__":
+    failures = []
+
+    (importTime, firstUseTime, heavy) = import_time()
+    print("import qsimulator: {:.2f} ms (budget {:.2f} ms)".format(importTime * 1e3, IMPORT_TIME_BUDGET * 1e3))
+    print("first use of qsimulator.State: {:.2f} ms".format(firstUseTime * 1e3))
+    if importTime > IMPORT_TIME_BUDGET:
+        failures.append("import qsimulator took longer than the budget")
+    if heavy:
+        failures.append("import qsimulator loaded {}".format(', '.join(heavy)))
+
+    (numGates, sweeps, plainTime, blockedTime) = blocked_sweeps()
+    print("cache blocking: {} gates in {} sweeps, {:.2f} sweeps per gate (budget {:.2f})".format(
+        numGates, sweeps, sweeps / numGates, SWEEP_RATIO_BUDGET))
+    print("one sweep per gate: {:.2f} s, blocked: {:.2f} s".format(plainTime, blockedTime))
+    if sweeps > SWEEP_RATIO_BUDGET * numGates:
+        failures.append("the blocked schedule took too many sweeps")
+
+    for failure in failures:
+        print("FAILED: " + failure)
+    sys.exit(1 if failures else 0)
@@ -7,7 +7,10 @@ import time
 Given is a Boolean function that is either constant or balanced (i.e., 0 for half of inputs, 1 for the other half).
 We make use of interference to determine whether the function is constant or balanced in a single function evaluation.
 
-When doing the observation we are not interested in the rightmost qubit, that one is removed out of the equation.
+The oracle |x>|y> -> |x>|f(x) XOR y> is applied with the extra qubit y in the state |-> = (|0> - |1>) / sqrt(2),
+where it only flips the sign of |x> when f(x) = 1 (phase kickback). So we apply the phase oracle |x> -> (-1)**f(x) |x>
+to the d qubits of x directly and leave the extra qubit out, which halves the register and skips building the
+2**(d+1) x 2**(d+1) oracle matrix. The measured distribution is the same as with the extra qubit.
 If the function is constant we should observe the state |0> (|00...000>). If the function is balanced it will yield
 any other state.
 """
@@ -45,30 +48,18 @@ def deutsch_josza_algorithm(func, d):
     """
 
     q1 = qs.State(np.array([1, 1]) / np.sqrt(2))
-    q2 = qs.State(np.array([1, -1]) / np.sqrt(2))
 
-    # Equivalent to Hadamard gate applied to d bits in state |0> and final bit in state |1>
-    initState = q1**d * q2
+    # Equivalent to Hadamard gate applied to d bits in state |0>
+    initState = q1**d
 
     H = qs.hGate()
-    I = qs.iGate(1)
-
-    # Create the required oracle
-    numStates = 2**(d+1)
-    operatorMatrix = np.zeros((numStates, numStates))
-    for i in range(numStates):
-        for j in range(numStates):
-            rightBit = j % 2
-            rest = j // 2
-            if 2 * rest + (func(rest) + rightBit) % 2 == i:  # 2 * rest still needed, write down if unclear
-                operatorMatrix[i][j] = 1
-                
-    # Creating QuantumGate object
-    oracle = qs.QuantumGate(operatorMatrix)
-    
-    # Applying Hadamard gate to |0> state qubits
-    finalState = (H**d * I)(oracle(initState))
-    measurements = finalState.measure() // 2  # to remove the rightmost bit
+
+    # Create the required oracle, the sign flips (-1)**f(x) on the d qubits
+    oracle = qs.phaseOracle(func, d)
+
+    # Applying Hadamard gate to every qubit
+    finalState = (H**d)(oracle(initState))
+    measurements = finalState.measure()
     return measurements
 
 
@@ -11,32 +11,40 @@ import time
 # O(sqrt(N/M)) time.
 # Here, we construct a search problem with 1 solution amongst 1024
 # possible answers, and find the solution with 25 applications of
-# the Grover iteration operator.
+# the Grover iteration operator. The resource estimator picks how the
+# iterations are run, see qs.select_backend.
+
+def grover_plan(numQubits, marked):
+    # Every Grover iteration, as gates that both execution strategies of qs.run_plan can apply. The oracle flips the
+    # sign of the marked entry, and the reflection about the mean 2|s><s| - I = H^n (2|0><0| - I) H^n is applied, up to
+    # a global sign that can't be measured, as the phase oracle of x == 0 between two layers of Hadamard gates.
+    answers = np.zeros(2**numQubits, dtype=np.int64)
+    answers[marked] = 1
+    zero = np.zeros(2**numQubits, dtype=np.int64)
+    zero[0] = 1
+    layer = [(qs.hGate(), [qubit]) for qubit in range(numQubits)]
+    iteration = [(qs.phaseOracle(answers, numQubits), None)] + layer + [(qs.phaseOracle(zero, numQubits), None)] + layer
+    numIterations = int(np.floor(np.pi/4 * np.sqrt(2**numQubits)))
+    return iteration * numIterations
+
 
 def grover_algorithm(numQubits=10):
     numEntries = 2**numQubits
 
-    # Create the initial state, every coefficient is the same
-    state = qs.equiprobable(numQubits)
-
-    I = np.identity(numEntries)
-    # Random entry in the main diagonal of the matrix is -1, this represents the unknown value of x we are looking for
-    randInt = random.randint(0, numEntries)
+    # Random entry, this represents the unknown value of x we are looking for
+    randInt = random.randrange(numEntries)
     print(f"Value of x for which the value of the function is 1 is {randInt}.")
-    I[randInt][randInt] = -1
 
-    oracle = qs.QuantumGate(I)
+    plan = grover_plan(numQubits, randInt)
 
-    # Reflection is the second gate we will need, the syntax looks confusing but its just to quickly create the
-    # required matrix.
-    reflection = qs.QuantumGate(2 * np.ones((numEntries, numEntries))/numEntries - np.identity(numEntries))
+    # Fail before allocating the state if no strategy fits in memory
+    report = qs.select_backend(plan, numQubits)
+    print(f"Running {len(plan)} gates with the '{report.chosen}' strategy.")
 
-    # Finally this is the gate we will use, obtained matrix multiplying oracle and reflection gates
-    grover = oracle(reflection)
-
-    numIterations = np.floor(np.pi/4 * np.sqrt(numEntries))  # for some reason this returns a float
-    for i in range(int(numIterations)):
-        state = grover(state)
+    # Create the initial state, every coefficient is the same, and apply the plan with the chosen strategy: the dense
+    # 2**numQubits x 2**numQubits matrices of every gate, or the gates applied to the state vector
+    state = qs.equiprobable(numQubits)
+    (state, _) = qs.run_plan(state, plan, strategies=[report.chosen])
 
     return state.measure()
 
@@ -1,3 +1,13 @@
+"""
+Grover's algorithm written with an oracle of a function instead of a matrix with a -1 on its diagonal.
+
+The textbook oracle maps |x>|y> to |x>|f(x) XOR y> and is applied with y in the state |-> = (|0> - |1>) / sqrt(2),
+where it only flips the sign of |x> when f(x) = 1 (phase kickback). So the phase oracle |x> -> (-1)**f(x) |x> is
+applied to the q qubits of x directly, without the extra qubit. The reflection about the mean is
+H^q (2|0><0| - I) H^q, the Hadamard gates are applied one qubit at a time and 2|0><0| - I is (up to a global sign
+that can't be measured) the phase oracle of the function that is 1 only for x = 0, so no 2**q x 2**q matrix is built.
+"""
+
 import qsimulator as qs
 import numpy as np
 import random
@@ -16,7 +26,31 @@ def construct_problem(q=10):
 
 
 def grover_algorithm(func, q):
-    q1 = qs.State(np.array([1, 1]) / np.sqrt(2))
-    q2 = qs.State(np.array([1, -1]) / np.sqrt(2))
+    # Create the initial state, every coefficient is the same
+    state = qs.equiprobable(q)
+
+    H = qs.hGate()
+    oracle = qs.phaseOracle(func, q)
+    zeroOracle = qs.phaseOracle(lambda x: int(x == 0), q)
+
+    numIterations = int(np.floor(np.pi / 4 * np.sqrt(2**q)))
+    for i in range(numIterations):
+        state = oracle(state)
+        for qubit in range(q):
+            state = H(state, [qubit])
+        state = zeroOracle(state)
+        for qubit in range(q):
+            state = H(state, [qubit])
+
+    return state.measure()
+
 
-    initState = q1**d * q2
\ No newline at end of file
+if __name__ == "__main__":
+    q = 10
+    f = construct_problem(q)
+    time1 = time.time()
+    measurement = grover_algorithm(f, q)
+    time2 = time.time()
+    print(f"Value of x for which the value of the function is 1 is {int(np.argmax([f(x) for x in range(2**q)]))}.")
+    print(f"Measured state is the state number {measurement}.")
+    print(f"Time taken was {time2 - time1} s.")
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+This module applies long gate sequences to big state vectors in cache-sized blocks.
+
+Applying a gate to a 2**n amplitude state vector is a full pass over memory, and with a few gates per amplitude the
+time goes into moving the vector between memory and the cache, not into arithmetic. A gate that only mixes the
+amplitudes of the low-order qubits (the rightmost qubits, the least significant bits of the stored index) never mixes
+amplitudes from different blocks of 2**blockQubits consecutive amplitudes, so a whole run of such gates can be applied
+to one block while it sits in the cache before moving on to the next block: one pass over memory for the whole run
+instead of one per gate.
+
+Two kinds of gates act on high-order qubits and still stay inside a block, because a high-order qubit has a fixed value
+within each block: diagonal gates (Z, S, CZ, phase gates) only multiply every block by a diagonal on its low-order
+qubits, and controlled gates (CX, Toffoli) with high-order controls either act on a block or leave it alone. Only the
+qubits that a gate mixes, all of them for a general gate and the target for a controlled gate, have to be low.
+
+For gates that mix high-order qubits the qubits are remapped: the amplitudes are transposed so that the qubits needed
+next become low-order ones, which costs one pass over memory, and the qubits sent to the high-order positions are
+those whose next use is furthest away. The State that comes out keeps the qubit order it ended up in (see
+State.qubit_order), so the last remapping is never undone unless the amplitudes are read in the usual order.
+
+A schedule is a list of steps, each one a pass over the vector: a group of gates applied block by block, a remapping,
+or a single gate too big to be blocked. BlockSchedule.sweeps compares with the one pass per gate of State.apply.
+"""
+
+import numpy as np
+from qsimulator import kernels
+from qsimulator.QuantumRegister import State
+
+# 2**15 complex amplitudes are 512 kB, a block and the gates' temporaries fit in the L2 cache
+BLOCK_QUBITS = 15
+
+
+class _Gate(object):
+    """
+    A gate of the circuit with the qubits it mixes. Diagonal gates mix none of their qubits and controlled gates only
+    their target.
+    """
+
+    def __init__(self, matrix, qubits):
+        self.matrix = np.asarray(matrix, dtype=np.complex128)
+        self.qubits = list(qubits)
+        if self.matrix.shape != (2 ** len(self.qubits), 2 ** len(self.qubits)):
+            raise Exception("Gate of shape {} can't act on {} qubits.".format(self.matrix.shape, len(self.qubits)))
+        if kernels._is_diagonal(self.matrix):
+            self.kind = 'diagonal'
+            self.active = []
+        elif kernels._is_controlled(self.matrix):
+            self.kind = 'controlled'
+            self.active = self.qubits[-1:]
+        else:
+            self.kind = 'general'
+            self.active = self.qubits
+
+
+class BlockSchedule(object):
+    """
+    Schedule of a circuit: the gates grouped into blocked passes over the state vector, with the remappings of the
+    qubits in between. Create schedules with schedule_circuit.
+
+    Parameters
+    ----------
+    numQubits: int
+    blockQubits: int
+        number of low-order qubits in a block
+    order: list of int
+        qubit order of the amplitudes before the first step
+    """
+
+    def __init__(self, numQubits, blockQubits, order):
+        self.num_qubits = numQubits
+        self.block_qubits = min(blockQubits, numQubits)
+        self.num_gates = 0
+        self.initial_order = list(order)
+        self.final_order = list(order)
+        # ('block', [(gate, stored axes)]), ('remap', axis permutation) or ('gate', (gate, stored axes))
+        self.steps = []
+
+    @property
+    def sweeps(self):
+        """
+        Number of passes over the state vector, one per step.
+        """
+        return len(self.steps)
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __str__(self):
+        counts = {}
+        for kind, _ in self.steps:
+            counts[kind] = counts.get(kind, 0) + 1
+        return "{} gates on {} qubits in {} sweeps ({} blocked groups, {} remappings, {} unblocked gates)".format(
+            self.num_gates, self.num_qubits, self.sweeps, counts.get('block', 0), counts.get('remap', 0),
+            counts.get('gate', 0))
+
+    def run(self, state):
+        """
+        Applies the scheduled gates to a State.
+
+        Parameters
+        ----------
+        state -> State object, stored in the qubit order the schedule was made for
+
+        Returns
+        -------
+        State object, stored in BlockSchedule.final_order
+        """
+        n = self.num_qubits
+        if state.num_qubits != n or state.qubit_order != self.initial_order:
+            raise Exception("Schedule was made for {} qubits stored in the order {}.".format(n, self.initial_order))
+        vector = state._vector
+        owned = False  # the input vector is copied by the first step, after that steps work in place
+        for kind, step in self.steps:
+            if kind == 'block':
+                vector = _run_block_group(vector, step, n, self.block_qubits, owned)
+            elif kind == 'remap':
+                tensor = np.transpose(np.reshape(vector, (2,) * n), step)
+                vector = np.ascontiguousarray(tensor, dtype=np.complex128).reshape(-1)
+            else:
+                (gate, axes) = step
+                vector = kernels.apply_gate(vector, gate.matrix, axes, n)
+            owned = True
+        if not owned:
+            vector = np.array(vector, dtype=np.complex128)
+        return State._from_vector(vector, n, self.final_order)
+
+
+def _block_gate(gate, axes, n, b):
+    # Works out once how a gate acts inside a block: the local qubits of its low axes and the bit of the block index
+    # for its high axes
+    high = n - b
+    local = [a - high if a >= high else None for a in axes]
+    shifts = [None if a >= high else high - 1 - a for a in axes]
+    if gate.kind == 'diagonal':
+        diagonal = gate.matrix.diagonal().reshape((2,) * len(axes))
+        lowQubits = [q for q in local if q is not None]
+        return ('diagonal', diagonal, local, shifts, lowQubits)
+    if gate.kind == 'controlled':
+        controlMask = sum(1 << s for s in shifts[:-1] if s is not None)
+        lowControls = [q for q in local[:-1] if q is not None]
+        return ('controlled', gate.matrix[-2:, -2:], controlMask, lowControls, local[-1])
+    return ('general', gate.matrix, local)
+
+
+def _run_block_group(vector, group, n, b, owned):
+    blocks = np.reshape(vector, (-1, 2 ** b))
+    output = blocks if owned else np.empty(blocks.shape, dtype=np.complex128)
+    gates = [_block_gate(gate, axes, n, b) for gate, axes in group]
+    for j in range(len(blocks)):
+        block = output[j]
+        if not owned:
+            block[:] = blocks[j]
+        for gate in gates:
+            if gate[0] == 'diagonal':
+                (_, diagonal, local, shifts, lowQubits) = gate
+                index = tuple(slice(None) if q is not None else (j >> s) & 1 for q, s in zip(local, shifts))
+                if lowQubits:
+                    kernels.apply_diagonal(block, diagonal[index].reshape(-1), lowQubits, b)
+                elif diagonal[index] != 1:
+                    block *= diagonal[index]
+            elif gate[0] == 'controlled':
+                (_, matrix, controlMask, lowControls, target) = gate
+                if j & controlMask != controlMask:
+                    continue
+                if lowControls:
+                    kernels.apply_controlled(block, matrix, lowControls, target, b)
+                else:
+                    kernels.apply_1q(block, matrix, target, b)
+            else:
+                (_, matrix, local) = gate
+                if len(local) == 1:
+                    kernels.apply_1q(block, matrix, local[0], b)
+                elif len(local) == 2:
+                    kernels.apply_2q(block, matrix, local, b)
+                else:
+                    block[:] = kernels.apply_gate(block, matrix, local, b)
+    return output.reshape(-1)
+
+
+def _next_uses(gates, start, numQubits):
+    # Index of the next gate from start on that mixes each qubit, len(gates) for qubits that are never mixed again
+    uses = [len(gates)] * numQubits
+    found = 0
+    for i in range(start, len(gates)):
+        for q in gates[i].active:
+            if uses[q] == len(gates):
+                uses[q] = i
+                found += 1
+        if found == numQubits:
+            break
+    return uses
+
+
+def schedule_circuit(circuit, numQubits, blockQubits=BLOCK_QUBITS, order=None):
+    """
+    Groups the gates of a circuit into blocked passes over the state vector, with qubit remappings in between.
+
+    Parameters
+    ----------
+    circuit -> list of (gate, qubits) pairs, the gates being QuantumGates or numpy arrays, qubits None meaning the
+        whole register
+    numQubits -> int
+    blockQubits -> int, the blocks hold 2**blockQubits amplitudes
+    order -> list of ints, qubit order of the State the schedule will run on (State.qubit_order), by default the
+        usual order
+
+    Returns
+    -------
+    BlockSchedule object
+    """
+    order = list(range(numQubits)) if order is None else list(order)
+    schedule = BlockSchedule(numQubits, blockQubits, order)
+    b = schedule.block_qubits
+    high = numQubits - b
+    gates = [_Gate(getattr(gate, 'matrix', gate), range(numQubits) if qubits is None else qubits)
+             for gate, qubits in circuit]
+    schedule.num_gates = len(gates)
+
+    group = []
+    for i, gate in enumerate(gates):
+        if len(gate.active) > b:
+            # Mixes more qubits than a block holds, it gets a pass of its own
+            if group:
+                schedule.steps.append(('block', group))
+                group = []
+            schedule.steps.append(('gate', (gate, [order.index(q) for q in gate.qubits])))
+            continue
+
+        if any(order.index(q) < high for q in gate.active):
+            if group:
+                schedule.steps.append(('block', group))
+                group = []
+            # The b qubits needed soonest become the low-order ones, ties keep qubits where they are
+            uses = _next_uses(gates, i, numQubits)
+            ranked = sorted(range(numQubits), key=lambda q: (uses[q], order.index(q) < high))
+            low = set(ranked[:b])
+            incoming = [q for q in order[:high] if q in low]
+            outgoing = [q for q in order[high:] if q not in low]
+            newOrder = list(order)
+            for q, r in zip(incoming, outgoing):
+                (newOrder[order.index(q)], newOrder[order.index(r)]) = (r, q)
+            schedule.steps.append(('remap', [order.index(q) for q in newOrder]))
+            order = newOrder
+
+        group.append((gate, [order.index(q) for q in gate.qubits]))
+    if group:
+        schedule.steps.append(('block', group))
+    schedule.final_order = order
+    return schedule
+
+
+def run_blocked(state, circuit, blockQubits=BLOCK_QUBITS):
+    """
+    Applies a circuit to a State in cache-sized blocks.
+
+    Parameters
+    ----------
+    state -> State object
+    circuit -> list of (gate, qubits) pairs
+    blockQubits -> int, the blocks hold 2**blockQubits amplitudes
+
+    Returns
+    -------
+    State object, its amplitudes may be stored in another qubit order
+    """
+    return schedule_circuit(circuit, state.num_qubits, blockQubits, state.qubit_order).run(state)
+
+
+if __name__ == "__main__":
+    import time
+    from qsimulator.QuantumGate import hGate, cxGate, rzGate, ryGate
+    from qsimulator.QuantumRegister import zeros
+
+    n = 22
+    rng = np.random.default_rng(0)
+    circuit = []
+    for layer in range(4):
+        circuit += [(ryGate(theta), [q]) for q, theta in enumerate(rng.uniform(0, np.pi, n))]
+        circuit += [(cxGate(), [q, q + 1]) for q in range(n - 1)]
+        circuit += [(rzGate(theta), [q]) for q, theta in enumerate(rng.uniform(0, np.pi, n))]
+    circuit += [(hGate(), [q]) for q in range(n)]
+
+    schedule = schedule_circuit(circuit, n)
+    print(schedule)
+
+    time1 = time.time()
+    state = zeros(n)
+    for gate, qubits in circuit:
+        state = state.apply(gate.matrix, qubits)
+    time2 = time.time()
+    blocked = schedule.run(zeros(n))
+    time3 = time.time()
+    print("One pass per gate: {} s, blocked: {} s.".format(time2 - time1, time3 - time2))
+    print(np.allclose(state.vector, blocked.vector))
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+This module contains the DensityMatrix class that is used to represent a mixed state of a quantum system.
+
+A density matrix of n qubits has 4**n entries, so every operation here works on the matrix reshaped into a tensor
+with 2n axes of length 2 (n "row" axes followed by n "column" axes). Gates only touch the axes of the qubits they act
+on, which keeps applying a gate at O(4**n * 2**k) instead of the O(8**n) needed by U * rho * U^dagger with dense
+matrices. With complex128 entries 14 qubits take 4 GB, so that is about as far as a single machine goes.
+"""
+
+import numpy as np
+import random
+from qsimulator.basic import apply_local_operator
+from qsimulator.QuantumRegister import State
+
+
+class DensityMatrix(object):
+
+    def __init__(self, matrix):
+        """
+        Class that represents the (possibly mixed) state of a quantum system. Input to the __init__ constructor is
+        either a numpy 2**n x 2**n array or a State object, in which case the density matrix of the pure state
+        |psi><psi| is created.
+
+        Qubits are ordered the same way as in State: qubit 0 is the leftmost qubit.
+
+        Parameters
+        ----------
+        matrix -> np.ndarray or State
+        """
+        if isinstance(matrix, State):
+            vector = np.asarray(matrix.vector, dtype=np.complex128)
+            matrix = np.outer(vector, np.conjugate(vector))
+        elif not isinstance(matrix, np.ndarray):
+            raise Exception("Input is not a numpy array or a State.")
+
+        if matrix.ndim != 2 or matrix.shape[0] != matrix.shape[1]:
+            raise Exception("Density matrix has to be a square matrix.")
+
+        self.matrix = matrix
+        self.num_qubits = int(np.log2(matrix.shape[0]))
+
+    def __str__(self):
+        """
+        Defines the behaviour when print(DensityMatrix) is invoked.
+        """
+        return str(self.matrix)
+
+    def __mul__(self, other):
+        """
+        Defines the behaviour when * operator is invoked. If the second operand is another DensityMatrix the kronecker
+        product of the two systems is returned.
+        """
+        if isinstance(other, DensityMatrix):
+            return DensityMatrix(np.kron(self.matrix, other.matrix))
+        else:
+            raise Exception("Unsupported type of object.")
+
+    def _tensor(self):
+        """
+        Returns the density matrix viewed as a tensor with 2n axes of length 2 (rows first, then columns).
+        """
+        return self.matrix.reshape((2,) * (2 * self.num_qubits))
+
+    def apply(self, matrix, qubits=None):
+        """
+        Applies an operator to the chosen qubits, rho -> U rho U^dagger. The operator is contracted with the row axes
+        of the chosen qubits from the left and (complex conjugated) with the column axes from the right.
+
+        Parameters
+        ----------
+        matrix -> 2**k x 2**k numpy array
+        qubits -> sequence of k integers, the qubits the operator acts on. If None the operator acts on all qubits.
+
+        Returns
+        -------
+        DensityMatrix object
+        """
+        if qubits is None:
+            qubits = range(self.num_qubits)
+        qubits = list(qubits)
+        n = self.num_qubits
+
+        tensor = apply_local_operator(matrix, self._tensor(), qubits)
+        tensor = apply_local_operator(np.conjugate(matrix), tensor, [n + q for q in qubits])
+        return DensityMatrix(tensor.reshape(2 ** n, 2 ** n))
+
+    def apply_kraus(self, operators, qubits=None):
+        """
+        Applies a quantum channel given by its Kraus operators, rho -> sum_i K_i rho K_i^dagger.
+
+        Parameters
+        ----------
+        operators -> list of 2**k x 2**k numpy arrays
+        qubits -> sequence of k integers, the qubits the channel acts on. If None it acts on all qubits.
+
+        Returns
+        -------
+        DensityMatrix object
+        """
+        result = np.zeros_like(self.matrix, dtype=np.complex128)
+        for operator in operators:
+            result += self.apply(operator, qubits).matrix
+        return DensityMatrix(result)
+
+    def trace(self):
+        """
+        Returns the trace of the density matrix, 1 for a normalised state.
+        """
+        return np.real(np.trace(self.matrix))
+
+    def purity(self):
+        """
+        Returns Tr(rho^2), which is 1 for pure states and 1/2**n for the maximally mixed state.
+        """
+        # Tr(rho^2) = sum_ij rho_ij rho_ji = sum_ij |rho_ij|^2 because rho is hermitian
+        return float(np.real(np.vdot(self.matrix, self.matrix)))
+
+    def probabilities(self):
+        """
+        Returns the probabilities of measuring each of the basis states, i.e. the diagonal of the density matrix.
+
+        Returns
+        -------
+        np.ndarray of floats
+        """
+        return np.real(np.diagonal(self.matrix)).copy()
+
+    def partial_trace(self, qubits):
+        """
+        Traces out the chosen qubits and returns the reduced density matrix of the remaining ones (in their original
+        order).
+
+        Parameters
+        ----------
+        qubits -> sequence of integers, the qubits that are traced out
+
+        Returns
+        -------
+        DensityMatrix object
+        """
+        n = self.num_qubits
+        traced = set(qubits)
+        if any(q < 0 or q >= n for q in traced):
+            raise Exception("Can't trace out qubits that are not in the register.")
+
+        # Each traced qubit gets the same index for its row and column axis, einsum then sums over the diagonal
+        inputIndices = list(range(2 * n))
+        for q in traced:
+            inputIndices[n + q] = q
+        kept = [q for q in range(n) if q not in traced]
+        outputIndices = kept + [n + q for q in kept]
+
+        reduced = np.einsum(self._tensor(), inputIndices, outputIndices)
+        size = 2 ** len(kept)
+        return DensityMatrix(reduced.reshape(size, size))
+
+    def measure(self):
+        """
+        Measures the system and returns a number corresponding to the basis state that was measured. Like
+        State.measure it doesn't collapse the state.
+
+        Returns
+        -------
+        int
+        """
+        P = np.cumsum(self.probabilities())
+        return int(min(np.searchsorted(P, random.random() * P[-1], side='right'), len(P) - 1))
+
+    def collapse_qubits(self, numQubits):
+        """
+        Measures the "rightmost" numQubits qubits and returns the state of the remaining qubits. Unlike
+        State.collapse_qubits, which picks a single outcome at random, the result is the exact post-measurement
+        ensemble averaged over all the outcomes, which is the partial trace over the measured qubits.
+
+        Parameters
+        ----------
+        numQubits -> int
+
+        Returns
+        -------
+        DensityMatrix object
+        """
+        if numQubits > self.num_qubits:
+            raise Exception("Can't measure more qubits than there are qubits in the register.")
+        return self.partial_trace(range(self.num_qubits - numQubits, self.num_qubits))
+
+
+if __name__ == "__main__":
+    q1 = State(np.array([1, 0, 1, 1, 0, 0, 0, 0]) / np.sqrt(3))
+    rho = DensityMatrix(q1)
+    print(rho.collapse_qubits(2))
+    print(rho.partial_trace([0]).purity())
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+This module computes the time evolution exp(-i H t)|psi> of a State under a Hamiltonian given as a sum of Pauli
+strings (a list of (coefficient, Pauli string) pairs, see the Observables module), without ever building the
+2**n x 2**n matrix of H or of its exponential.
+
+Two methods are available:
+
+    - Trotter-Suzuki product formulas (trotter_evolve). The exponential of a single Pauli term is the rotation
+      cos(theta) psi - i sin(theta) P psi, where P psi is worked out from the bit masks of the term (see
+      Observables.pauli_product), so not even the matrix of the term is built. A time step applies these rotations
+      one after the other. Order 1 is the plain Lie product, order 2 the symmetric Strang splitting and
+      higher even orders follow Suzuki's recursion.
+    - Krylov subspace exponentiation (expm_multiply, krylov_evolve). The Lanczos algorithm builds an orthonormal basis
+      of span{psi, H psi, H**2 psi, ...} in which H is a small tridiagonal matrix, and exp(-i H t) psi is approximated
+      by exponentiating that matrix. It only needs H times a vector, which hamiltonian_operator provides.
+
+Both adapt the size of their time steps to a tolerance on the error of the final state, and return an estimate of
+that error together with the evolved State: the Trotter step is checked against two steps of half the size, the
+Krylov step uses the standard a posteriori estimate from the last Lanczos coefficient.
+"""
+
+import numpy as np
+from qsimulator.QuantumRegister import State
+from qsimulator.Observables import pauli_masks, pauli_product, hamiltonian_operator
+from qsimulator.bitops import parity
+
+KRYLOV_DIM = 20  # default number of Lanczos vectors
+
+
+def _pauli_terms(hamiltonian, numQubits):
+    # Every term as (coefficient, xMask, zMask, numY)
+    terms = []
+    for coefficient, pauli in hamiltonian:
+        if np.imag(coefficient) != 0:
+            raise Exception("Time evolution needs a hermitian Hamiltonian, the coefficients have to be real.")
+        terms.append((float(np.real(coefficient)),) + pauli_masks(pauli, numQubits))
+    return terms
+
+
+def _product_formula(numTerms, order):
+    # List of (term, weight): a time step dt applies exp(-i weight dt H_term) for every entry, in order
+    if order == 1:
+        return [(j, 1.0) for j in range(numTerms)]
+    if order == 2:
+        half = [(j, 0.5) for j in range(numTerms - 1)]
+        return half + [(numTerms - 1, 1.0)] + half[::-1]
+    if order % 2 != 0 or order < 1:
+        raise Exception("Product formulas are of order 1 or of an even order, not {}.".format(order))
+
+    # Suzuki: S_2k(t) = S_2k-2(p t)**2 S_2k-2((1 - 4 p) t) S_2k-2(p t)**2
+    p = 1 / (4 - 4 ** (1 / (order - 1)))
+    inner = _product_formula(numTerms, order - 2)
+    formula = []
+    for scale in (p, p, 1 - 4 * p, p, p):
+        for j, weight in inner:
+            if formula and formula[-1][0] == j:
+                formula[-1] = (j, formula[-1][1] + scale * weight)  # neighbouring rotations of the same term merge
+            else:
+                formula.append((j, scale * weight))
+    return formula
+
+
+def _apply_formula(vector, terms, formula, dt, indices):
+    # exp(-i theta P) psi = cos(theta) psi - i sin(theta) P psi, since P**2 = I. Only a few temporaries of the size of
+    # the vector are made, whatever the number of qubits a term acts on.
+    vector = vector.copy()  # the rotations are applied to it in place
+    for j, weight in formula:
+        (coefficient, xMask, zMask, numY) = terms[j]
+        theta = coefficient * weight * dt
+        if xMask == 0 and zMask == 0:
+            vector *= np.exp(-1j * theta)  # the identity term is a global phase
+        elif xMask == 0:
+            # Strings of Z: P is diagonal with entries (-1)**popcount(k & zMask)
+            vector *= np.where(parity(indices & zMask), np.exp(1j * theta), np.exp(-1j * theta))
+        else:
+            product = pauli_product(vector, xMask, zMask, numY, indices)
+            vector *= np.cos(theta)
+            vector -= 1j * np.sin(theta) * product
+    return vector
+
+
+def trotter_step(state, hamiltonian, dt, order=2):
+    """
+    Applies a single step of a product formula, an approximation of exp(-i H dt).
+
+    Parameters
+    ----------
+    state -> State object
+    hamiltonian -> list of (coefficient, Pauli string) pairs, with real coefficients
+    dt -> float
+    order -> int, 1 or even
+
+    Returns
+    -------
+    State object
+    """
+    n = state.num_qubits
+    terms = _pauli_terms(hamiltonian, n)
+    vector = _apply_formula(np.asarray(state.vector, dtype=np.complex128), terms, _product_formula(len(terms), order),
+                            dt, np.arange(2 ** n))
+    return State._from_vector(vector, n)
+
+
+def trotter_evolve(state, hamiltonian, time, order=2, tolerance=1e-6, step=None):
+    """
+    Computes exp(-i H time)|psi> with a product formula and adaptive time steps.
+
+    Every step of size dt is compared with two steps of size dt/2. Their difference estimates the error of the
+    half steps, which are kept if the error is below the step's share of the tolerance (tolerance * dt / time), and
+    the next step size is chosen from the error and the order of the formula.
+
+    Parameters
+    ----------
+    state -> State object
+    hamiltonian -> list of (coefficient, Pauli string) pairs, with real coefficients
+    time -> float, can be negative
+    order -> int, 1 or even
+    tolerance -> float, target for the norm of the error of the final state
+    step -> float, size of the first step, by default time / 8
+
+    Returns
+    -------
+    (State, float) -> the evolved state and the estimate of the norm of its error
+    """
+    n = state.num_qubits
+    terms = _pauli_terms(hamiltonian, n)
+    formula = _product_formula(len(terms), order)
+    vector = np.asarray(state.vector, dtype=np.complex128)
+    indices = np.arange(len(vector))
+
+    (direction, total) = (np.sign(time), abs(time))
+    dt = total / 8 if step is None else abs(step)
+    (elapsed, error) = (0.0, 0.0)
+    while total - elapsed > 1e-14 * total:
+        dt = min(dt, total - elapsed)
+        full = _apply_formula(vector, terms, formula, direction * dt, indices)
+        half = _apply_formula(vector, terms, formula, direction * dt / 2, indices)
+        half = _apply_formula(half, terms, formula, direction * dt / 2, indices)
+        # The error of one step scales as dt**(order + 1), so the half steps are 2**order - 1 times closer
+        stepError = np.linalg.norm(full - half) / (2 ** order - 1)
+        target = tolerance * dt / total
+
+        if stepError <= target:
+            (vector, elapsed, error) = (half, elapsed + dt, error + stepError)
+        elif dt < 1e-12 * total:
+            raise Exception("Trotter step size underflow, the tolerance can't be reached.")
+        factor = 0.9 * (target / stepError) ** (1 / (order + 1)) if stepError > 0 else 2
+        dt *= min(2, max(0.2, factor))
+    return State._from_vector(vector, n), error
+
+
+def expm_multiply(operator, vector, time, krylovDim=KRYLOV_DIM, tolerance=1e-8):
+    """
+    Computes exp(-i H time) vector for a hermitian H given only through products with vectors, using the Lanczos
+    algorithm and adaptive time steps.
+
+    Every step builds a Krylov basis of krylovDim vectors from the current vector and takes the largest time step
+    (up to twice the previous one) for which the error estimate stays below the step's share of the tolerance. The
+    estimate only depends on the small tridiagonal matrix, so trying a shorter step doesn't need a new basis.
+
+    Parameters
+    ----------
+    operator -> function that takes a vector and returns H times it
+    vector -> np.ndarray
+    time -> float, can be negative
+    krylovDim -> int, number of Lanczos vectors per step
+    tolerance -> float, target for the norm of the error of the result
+
+    Returns
+    -------
+    (np.ndarray, float) -> exp(-i H time) vector and the estimate of the norm of its error
+    """
+    vector = np.array(vector, dtype=np.complex128)
+    krylovDim = min(krylovDim, len(vector))
+    (direction, total) = (np.sign(time), abs(time))
+    (elapsed, error, tau) = (0.0, 0.0, total)
+
+    while total - elapsed > 1e-14 * total:
+        beta = np.linalg.norm(vector)
+        if beta == 0:
+            break
+        basis = np.empty((krylovDim, len(vector)), dtype=np.complex128)
+        basis[0] = vector / beta
+        (alphas, betas) = ([], [])
+        exact = False
+        for j in range(krylovDim):
+            w = operator(basis[j])
+            alphas.append(np.real(np.vdot(basis[j], w)))
+            w = w - alphas[j] * basis[j] - (betas[j - 1] * basis[j - 1] if j > 0 else 0)
+            w -= np.matmul(basis[:j + 1].T, np.matmul(np.conjugate(basis[:j + 1]), w))  # full reorthogonalisation
+            betas.append(np.linalg.norm(w))
+            # Compared with the size of H on this basis vector, so that the test doesn't depend on the norm of the state
+            if betas[j] <= 1e-12 * (abs(alphas[j]) + (betas[j - 1] if j > 0 else 0)):
+                exact = True
+                break  # the Krylov space is invariant under H, the step is exact
+            if j + 1 < krylovDim:
+                basis[j + 1] = w / betas[j]
+        m = len(alphas)
+
+        T = np.diag(alphas) + np.diag(betas[:m - 1], 1) + np.diag(betas[:m - 1], -1)
+        (eigenvalues, eigenvectors) = np.linalg.eigh(T)
+        tau = min(tau, total - elapsed)
+        while True:
+            coefficients = np.matmul(eigenvectors, np.exp(-1j * direction * tau * eigenvalues) * eigenvectors[0])
+            stepError = 0.0 if exact else beta * betas[m - 1] * abs(coefficients[m - 1])
+            if stepError <= tolerance * tau / total:
+                break
+            if tau < 1e-12 * total:
+                raise Exception("Krylov step size underflow, the tolerance can't be reached.")
+            tau /= 2
+
+        vector = beta * np.matmul(coefficients, basis[:m])
+        (elapsed, error) = (elapsed + tau, error + stepError)
+        tau *= 2
+    return vector, error
+
+
+def krylov_evolve(state, hamiltonian, time, krylovDim=KRYLOV_DIM, tolerance=1e-8):
+    """
+    Computes exp(-i H time)|psi> for a Hamiltonian given as a sum of Pauli strings with the Krylov method, see
+    expm_multiply.
+
+    Parameters
+    ----------
+    state -> State object
+    hamiltonian -> list of (coefficient, Pauli string) pairs, with real coefficients
+    time -> float, can be negative
+    krylovDim -> int, number of Lanczos vectors per step
+    tolerance -> float, target for the norm of the error of the final state
+
+    Returns
+    -------
+    (State, float) -> the evolved state and the estimate of the norm of its error
+    """
+    if any(np.imag(coefficient) != 0 for coefficient, _ in hamiltonian):
+        raise Exception("Time evolution needs a hermitian Hamiltonian, the coefficients have to be real.")
+    n = state.num_qubits
+    vector, error = expm_multiply(hamiltonian_operator(hamiltonian, n), state.vector, time, krylovDim, tolerance)
+    return State._from_vector(vector, n), error
+
+
+if __name__ == "__main__":
+    import time
+    from qsimulator.QuantumRegister import zeros
+    from qsimulator.Observables import expectation_pauli
+
+    # Transverse field Ising chain, starting with all spins up
+    n = 12
+    ising = [(-1.0, {q: 'Z', q + 1: 'Z'}) for q in range(n - 1)] + [(-0.7, {q: 'X'}) for q in range(n)]
+
+    time1 = time.time()
+    (exact, krylovError) = krylov_evolve(zeros(n), ising, 2.0)
+    time2 = time.time()
+    (trotter, trotterError) = trotter_evolve(zeros(n), ising, 2.0, order=2, tolerance=1e-4)
+    time3 = time.time()
+    print("Krylov: <Z_0> = {:.6f}, error estimate {:.1e}, {:.2f} s".format(
+        expectation_pauli(exact, {0: 'Z'}), krylovError, time2 - time1))
+    print("Trotter: <Z_0> = {:.6f}, error estimate {:.1e}, {:.2f} s".format(
+        expectation_pauli(trotter, {0: 'Z'}), trotterError, time3 - time2))
+    print("Distance between the two: {:.1e}".format(np.linalg.norm(exact.vector - trotter.vector)))
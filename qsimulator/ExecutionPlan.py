@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+This module compiles the structure of a circuit into an execution plan that can be replayed many times.
+
+A circuit is a list of (gate, qubits) pairs. Its structure is the number of qubits of the register together with the
+size of every gate and the qubits it acts on, but not the values in the gate matrices. Everything that only depends on
+the structure is worked out once when the plan is compiled:
+
+    - consecutive gates are fused into groups acting on at most maxFused qubits, so that the state vector is only
+      swept once per group instead of once per gate,
+    - for every group the axis permutation that brings its qubits to the front of the state tensor (and the inverse
+      one) is precomputed, applying the group is then one transpose, one matrix product and one transpose back,
+    - for every gate the positions of its qubits inside its group are precomputed.
+
+Compiled plans are cached by structure with LRU eviction, so compile_circuit on a circuit with a structure that was
+seen before costs a dictionary lookup. A plan is replayed with new gate matrices (a different oracle, or
+ParameterizedGates bound to new values) with ExecutionPlan.run.
+"""
+
+import functools
+import numpy as np
+from qsimulator.basic import apply_local_operator
+from qsimulator.QuantumRegister import State
+
+PLAN_CACHE_SIZE = 128
+MAX_FUSED_QUBITS = 3
+
+
+class _Group(object):
+    """
+    Gates that are applied together as one fused matrix.
+    """
+
+    def __init__(self, numQubits, gateIndices, qubits, positions):
+        self.gateIndices = gateIndices  # indices of the gates of the group in the circuit
+        self.qubits = qubits  # qubits of the group, the fused matrix acts on them in this order
+        self.positions = positions  # for every gate, the positions of its qubits within the group
+        self.size = 2 ** len(qubits)
+
+        rest = [q for q in range(numQubits) if q not in qubits]
+        self.permutation = list(qubits) + rest
+        self.inversePermutation = list(np.argsort(self.permutation))
+        # Single gates whose qubits are already in the group's order don't need fusing at all
+        self.single = len(gateIndices) == 1 and positions[0] == list(range(len(qubits)))
+
+
+class ExecutionPlan(object):
+    """
+    Precompiled execution plan of a circuit structure. Create plans with compile_circuit rather than directly, so that
+    they are cached.
+
+    Parameters
+    ----------
+    numQubits: int
+    structure: tuple of (int, tuple of int)
+        number of qubits and qubits of every gate
+    maxFused: int
+        maximum number of qubits of a group of fused gates
+    """
+
+    def __init__(self, numQubits, structure, maxFused=MAX_FUSED_QUBITS):
+        self.num_qubits = numQubits
+        self.structure = structure
+        self.groups = []
+
+        (gateIndices, groupQubits) = ([], [])
+        for i, (k, qubits) in enumerate(structure):
+            merged = groupQubits + [q for q in qubits if q not in groupQubits]
+            if gateIndices and len(merged) > maxFused:
+                self._add_group(gateIndices, groupQubits)
+                (gateIndices, merged) = ([], list(qubits))
+            gateIndices.append(i)
+            groupQubits = merged
+        if gateIndices:
+            self._add_group(gateIndices, groupQubits)
+
+    def _add_group(self, gateIndices, groupQubits):
+        positions = [[groupQubits.index(q) for q in self.structure[i][1]] for i in gateIndices]
+        self.groups.append(_Group(self.num_qubits, gateIndices, groupQubits, positions))
+
+    def __len__(self):
+        return len(self.groups)
+
+    def run(self, state, gates):
+        """
+        Applies the gates to a State following the plan.
+
+        Parameters
+        ----------
+        state -> State object with num_qubits qubits
+        gates -> list of QuantumGates or numpy arrays, or the circuit itself as (gate, qubits) pairs. They have to
+            have the structure the plan was compiled for, only the values in the matrices may differ.
+
+        Returns
+        -------
+        State object
+        """
+        if len(gates) != len(self.structure):
+            raise Exception("Plan was compiled for {} gates, {} were given.".format(len(self.structure), len(gates)))
+        if gates and isinstance(gates[0], tuple):
+            gates = [gate for gate, _ in gates]
+        matrices = [np.asarray(getattr(gate, 'matrix', gate)) for gate in gates]
+
+        n = self.num_qubits
+        tensor = np.reshape(state.vector, (2,) * n)
+        for group in self.groups:
+            if group.single:
+                fused = matrices[group.gateIndices[0]]
+            else:
+                fused = np.identity(group.size, dtype=np.complex128).reshape((2,) * len(group.qubits) + (-1,))
+                for i, positions in zip(group.gateIndices, group.positions):
+                    fused = apply_local_operator(matrices[i], fused, positions)
+                fused = fused.reshape(group.size, group.size)
+
+            front = np.transpose(tensor, group.permutation).reshape(group.size, -1)
+            tensor = np.transpose(np.matmul(fused, front).reshape((2,) * n), group.inversePermutation)
+        return State._from_vector(np.ascontiguousarray(tensor).reshape(-1), n)
+
+
+@functools.lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _compile(numQubits, structure, maxFused):
+    return ExecutionPlan(numQubits, structure, maxFused)
+
+
+def circuit_structure(circuit, numQubits):
+    """
+    Returns the structural key of a circuit: the size of every gate and the qubits it acts on.
+
+    Parameters
+    ----------
+    circuit -> list of (gate, qubits) pairs, qubits None meaning the whole register
+    numQubits -> int
+
+    Returns
+    -------
+    tuple of (int, tuple of int), hashable
+    """
+    structure = []
+    for gate, qubits in circuit:
+        qubits = tuple(range(numQubits)) if qubits is None else tuple(int(q) for q in qubits)
+        structure.append((len(qubits), qubits))
+    return tuple(structure)
+
+
+def compile_circuit(circuit, numQubits, maxFused=MAX_FUSED_QUBITS):
+    """
+    Compiles a circuit into an ExecutionPlan, or returns the cached plan of a circuit with the same structure.
+
+    Parameters
+    ----------
+    circuit -> list of (gate, qubits) pairs
+    numQubits -> int
+    maxFused -> int, maximum number of qubits of a group of fused gates
+
+    Returns
+    -------
+    ExecutionPlan object
+    """
+    return _compile(numQubits, circuit_structure(circuit, numQubits), maxFused)
+
+
+def plan_cache_info():
+    """
+    Returns the hits, misses and size of the plan cache.
+    """
+    return _compile.cache_info()
+
+
+def clear_plan_cache():
+    """
+    Empties the plan cache.
+    """
+    _compile.cache_clear()
+
+
+if __name__ == "__main__":
+    import time
+    from qsimulator.QuantumGate import hGate, cxGate, rzGate
+    from qsimulator.QuantumRegister import zeros
+
+    n = 16
+    rotation = rzGate()
+    circuit = [(hGate(), [q]) for q in range(n)] + [(cxGate(), [q, q + 1]) for q in range(n - 1)] \
+        + [(rotation, [q]) for q in range(n)]
+    plan = compile_circuit(circuit, n)
+    print("{} gates in {} groups".format(len(circuit), len(plan)))
+
+    time1 = time.time()
+    for theta in np.linspace(0, 1, 10):
+        rotation.bind(theta)
+        state = compile_circuit(circuit, n).run(zeros(n), circuit)
+    time2 = time.time()
+    print(plan_cache_info())
+    print("10 runs took {} s.".format(time2 - time1))
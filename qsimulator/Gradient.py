@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+This module computes gradients of expectation values with respect to the parameters of a circuit using the adjoint
+method.
+
+A circuit is a list of (gate, qubits) pairs, where the gate is a QuantumGate and qubits the list of qubits it acts on.
+The parameters are the ParameterizedGates in the circuit. For E(theta) = <psi|U^dagger H U|psi> the adjoint method
+runs the circuit forward once, applies H once and then walks the circuit backwards with two state vectors, un-applying
+one gate at a time. The whole gradient costs about three passes over the circuit, however many parameters there are,
+where the parameter shift rule needs two full simulations per parameter.
+"""
+
+import numpy as np
+from qsimulator.basic import apply_local_operator
+from qsimulator.QuantumGate import ParameterizedGate
+from qsimulator.QuantumRegister import State
+from qsimulator.Observables import apply_hamiltonian
+
+
+def _apply(matrix, tensor, qubits, numQubits):
+    if qubits is None:
+        qubits = range(numQubits)
+    return apply_local_operator(matrix, tensor, qubits)
+
+
+def run_circuit(circuit, state):
+    """
+    Applies every gate of a circuit to a State.
+
+    Parameters
+    ----------
+    circuit -> list of (QuantumGate, qubits) pairs
+    state -> State object
+
+    Returns
+    -------
+    State object
+    """
+    n = state.num_qubits
+    tensor = np.reshape(state.vector, (2,) * n)
+    for gate, qubits in circuit:
+        tensor = _apply(gate.matrix, tensor, qubits, n)
+    return State._from_vector(tensor.reshape(-1), n)
+
+
+def expectation_and_gradient(circuit, hamiltonian, state):
+    """
+    Computes the expectation value of a Hamiltonian after running a circuit and its gradient with respect to the
+    parameters of all the ParameterizedGates in the circuit.
+
+    Parameters
+    ----------
+    circuit -> list of (QuantumGate, qubits) pairs
+    hamiltonian -> list of (coefficient, Pauli string) pairs, see the Observables module
+    state -> State object, the initial state
+
+    Returns
+    -------
+    (float, np.ndarray) -> the expectation value and the derivatives with respect to the parameters, in the order in
+        which the ParameterizedGates appear in the circuit. A gate that appears several times gets one entry per
+        appearance, sum them to get the derivative with respect to its shared parameter.
+    """
+    n = state.num_qubits
+    psi = run_circuit(circuit, state)
+    lam = apply_hamiltonian(psi, hamiltonian)
+    value = float(np.real(np.vdot(psi.vector, lam.vector)))
+
+    psi = np.reshape(psi.vector, (2,) * n)
+    lam = np.reshape(lam.vector, (2,) * n)
+    gradient = []
+    for gate, qubits in reversed(circuit):
+        if isinstance(gate, ParameterizedGate):
+            # dU/dtheta psi_(k-1) = -i G psi_k, with psi_k the state right after the gate
+            mu = _apply(-1j * gate.generator, psi, qubits, n)
+            gradient.append(2 * np.real(np.vdot(lam, mu)))
+
+        dagger = np.conjugate(gate.matrix.T)
+        psi = _apply(dagger, psi, qubits, n)
+        lam = _apply(dagger, lam, qubits, n)
+
+    return value, np.array(gradient[::-1])
+
+
+def gradient(circuit, hamiltonian, state):
+    """
+    Computes the gradient of the expectation value of a Hamiltonian with respect to the parameters of the circuit. See
+    expectation_and_gradient.
+    """
+    return expectation_and_gradient(circuit, hamiltonian, state)[1]
+
+
+if __name__ == "__main__":
+    from qsimulator.QuantumGate import ryGate, rzGate, cxGate
+    from qsimulator.QuantumRegister import zeros
+
+    rotations = [ryGate(0.3), ryGate(1.2), rzGate(0.7)]
+    circuit = [(rotations[0], [0]), (rotations[1], [1]), (cxGate(), [0, 1]), (rotations[2], [1])]
+    hamiltonian = [(1.0, 'ZZ'), (0.5, 'XI')]
+
+    print(expectation_and_gradient(circuit, hamiltonian, zeros(2)))
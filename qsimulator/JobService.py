@@ -0,0 +1,493 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+This module contains a local job service: a server that runs simulation jobs on a pool of worker processes that stay
+alive between jobs, and the client that talks to it.
+
+Launching every simulation as its own script pays for starting Python, importing numpy and qsimulator and compiling
+the kernels every time, and throws away the execution plans and other caches at the end. The JobServer starts its
+worker processes once, imports (and warms up) the modules in them, and then feeds them jobs from a priority queue.
+
+The server listens on a Unix socket, or on a localhost TCP port where Unix sockets are not available. Messages are
+JSON objects, one per line. A client sends
+
+    {"op": "submit", "job": name, "args": [...], "kwargs": {...}, "priority": int, "tag": anything}
+    {"op": "cancel", "id": int}
+    {"op": "status"}
+
+and the server answers with events, all the events of a job carrying its id:
+
+    {"event": "queued", "id": int, "tag": tag}, {"event": "started", "id": int},
+    {"event": "progress", "id": int, "fraction": float, "message": str},
+    {"event": "result", "id": int, "result": ...}, {"event": "error", "id": int, "error": str},
+    {"event": "cancelled", "id": int}, {"event": "status", "queued": int, "running": int, "workers": int}
+
+A connection can have any number of jobs in flight. Jobs are only run by name, from the table of jobs the server was
+created with ({name: "module:function"}), and their arguments and results have to be JSON (numpy arrays and numbers
+are converted). Jobs with a higher priority run first. A job function that has a progress parameter is given a
+function progress(fraction, message) to call. A job that is still queued is cancelled straight away. A running job is
+stopped by terminating the worker process that runs it, which is then replaced by a new warm one: every worker process
+has an executor of its own, so this doesn't disturb the jobs of the other workers.
+"""
+
+import asyncio
+import importlib
+import inspect
+import itertools
+import json
+import multiprocessing
+import os
+import signal
+import socket
+from concurrent.futures import ProcessPoolExecutor
+
+# Modules imported by every worker process when it starts
+DEFAULT_PRELOAD = ('qsimulator.QuantumRegister', 'qsimulator.QuantumGate', 'qsimulator.kernels',
+                   'qsimulator.ExecutionPlan')
+
+_TERMINAL_EVENTS = ('result', 'error', 'cancelled')
+
+
+class JobCancelled(Exception):
+    """
+    Raised by JobClient.result when the job was cancelled.
+    """
+    pass
+
+
+def _to_json(value):
+    # numpy arrays and scalars become lists and Python numbers, complex numbers become [real, imag]
+    if hasattr(value, 'tolist'):
+        value = value.tolist()
+    if isinstance(value, complex):
+        return [value.real, value.imag]
+    if isinstance(value, (list, tuple)):
+        return [_to_json(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): _to_json(item) for key, item in value.items()}
+    return value
+
+
+# ----------------------------------Worker side---------------------------------
+
+def _worker_init(preload):
+    for name in preload:
+        module = importlib.import_module(name)
+        if hasattr(module, 'numba_available'):
+            module.numba_available()  # compiles the kernels now rather than in the first job
+
+
+def _warm_up():
+    return os.getpid()
+
+
+class _Progress(object):
+
+    def __init__(self, jobId, queue):
+        self.jobId = jobId
+        self.queue = queue
+
+    def __call__(self, fraction, message=''):
+        self.queue.put((self.jobId, float(fraction), str(message)))
+
+
+def _run_job(jobId, target, args, kwargs, progressQueue):
+    (moduleName, functionName) = target.split(':')
+    function = getattr(importlib.import_module(moduleName), functionName)
+    if 'progress' in inspect.signature(function).parameters:
+        kwargs = dict(kwargs, progress=_Progress(jobId, progressQueue))
+    return _to_json(function(*args, **kwargs))
+
+
+# ----------------------------------Server side---------------------------------
+
+class _Job(object):
+
+    def __init__(self, jobId, name, args, kwargs, priority, writer):
+        self.id = jobId
+        self.name = name
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.writer = writer
+        self.state = 'queued'
+        self.worker = None  # index of the worker running it
+
+
+class JobServer(object):
+    """
+    Server that runs jobs on a warm pool of worker processes.
+
+    Parameters
+    ----------
+    jobs: dict
+        name -> "module:function" of every job that can be submitted
+    path: str, optional
+        path of the Unix socket to listen on. If None a localhost TCP port is used.
+    port: int
+        TCP port, 0 picks a free one (see JobServer.address once started)
+    workers: int, optional
+        number of worker processes, by default the number of cores
+    preload: sequence of str
+        modules imported in every worker when it starts
+    """
+
+    def __init__(self, jobs, path=None, port=0, workers=None, preload=DEFAULT_PRELOAD):
+        if path is not None and not hasattr(socket, 'AF_UNIX'):
+            raise Exception("Unix sockets are not available, use a TCP port instead.")
+        self.jobs = dict(jobs)
+        self.path = path
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.preload = tuple(preload)
+        self.address = None
+
+        self._ids = itertools.count(1)
+        self._sequence = itertools.count()
+        self._jobs = {}
+        self._running = 0
+        self._workers = []  # (executor, process id) of every worker
+        self._tasks = []
+        self._connections = {}  # handler task -> writer of every open connection
+
+    async def start(self):
+        """
+        Starts the worker processes, waits until all of them are up, and starts listening.
+        """
+        self._manager = multiprocessing.Manager()
+        self._progress = self._manager.Queue()
+        self._workers = list(await asyncio.gather(*[self._start_worker() for _ in range(self.workers)]))
+
+        self._queue = asyncio.PriorityQueue()
+        if self.path is not None:
+            self._server = await asyncio.start_unix_server(self._handle, self.path)
+            self.address = self.path
+        else:
+            self._server = await asyncio.start_server(self._handle, '127.0.0.1', self.port)
+            self.address = self._server.sockets[0].getsockname()[:2]
+        self._tasks = [asyncio.create_task(self._dispatch(worker)) for worker in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._forward_progress()))
+
+    async def serve_forever(self):
+        """
+        Starts the server if needed and serves until cancelled.
+        """
+        if self.address is None:
+            await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        """
+        Stops listening and shuts down the worker processes.
+        """
+        self._server.close()
+        for task in self._tasks:
+            task.cancel()
+        for writer in self._connections.values():
+            writer.close()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        self._progress.put(None)
+        for executor, _ in self._workers:
+            executor.shutdown(wait=True, cancel_futures=True)
+        self._manager.shutdown()
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+    async def _start_worker(self):
+        # An executor with a single process, which can be terminated without breaking the other workers
+        executor = ProcessPoolExecutor(1, initializer=_worker_init, initargs=(self.preload,))
+        processId = await asyncio.get_running_loop().run_in_executor(executor, _warm_up)
+        return executor, processId
+
+    def _send(self, writer, event):
+        if not writer.is_closing():
+            writer.write((json.dumps(event) + '\n').encode())
+
+    async def _handle(self, reader, writer):
+        self._connections[asyncio.current_task()] = writer
+        try:
+            async for line in reader:
+                try:
+                    message = json.loads(line)
+                    op = message['op']
+                except (ValueError, KeyError, TypeError):
+                    self._send(writer, {'event': 'error', 'id': None, 'error': "Invalid message."})
+                    continue
+
+                if op == 'submit':
+                    self._submit(message, writer)
+                elif op == 'cancel':
+                    self._cancel(message.get('id'))
+                elif op == 'status':
+                    self._send(writer, {'event': 'status', 'queued': self._queue.qsize(), 'running': self._running,
+                                        'workers': self.workers})
+                else:
+                    self._send(writer, {'event': 'error', 'id': None, 'error': "Unknown op {}.".format(op)})
+                await writer.drain()
+        finally:
+            # Nobody is left to receive the results of the connection's jobs, finished jobs are no longer in _jobs
+            for job in [job for job in self._jobs.values() if job.writer is writer]:
+                self._cancel(job.id)
+            writer.close()
+            del self._connections[asyncio.current_task()]
+
+    def _submit(self, message, writer):
+        name = message.get('job')
+        if name not in self.jobs:
+            self._send(writer, {'event': 'error', 'id': None, 'tag': message.get('tag'),
+                                'error': "Unknown job {}.".format(name)})
+            return
+        job = _Job(next(self._ids), name, list(message.get('args', [])), dict(message.get('kwargs', {})),
+                   int(message.get('priority', 0)), writer)
+        self._jobs[job.id] = job
+        self._queue.put_nowait((-job.priority, next(self._sequence), job))
+        self._send(writer, {'event': 'queued', 'id': job.id, 'tag': message.get('tag')})
+
+    def _cancel(self, jobId):
+        job = self._jobs.get(jobId)
+        if job is None:
+            return
+        if job.state == 'queued':
+            job.state = 'cancelled'  # skipped when it comes out of the queue
+            del self._jobs[jobId]
+            self._send(job.writer, {'event': 'cancelled', 'id': jobId})
+        elif job.state == 'running':
+            # The dispatcher sees the executor break, reports the cancellation and starts a new worker
+            job.state = 'cancelled'
+            os.kill(self._workers[job.worker][1], signal.SIGTERM)
+
+    async def _dispatch(self, worker):
+        loop = asyncio.get_running_loop()
+        while True:
+            (_, _, job) = await self._queue.get()
+            if job.state == 'cancelled':
+                continue
+            (executor, _) = self._workers[worker]
+            (job.state, job.worker) = ('running', worker)
+            self._running += 1
+            self._send(job.writer, {'event': 'started', 'id': job.id})
+            try:
+                result = await loop.run_in_executor(executor, _run_job, job.id, self.jobs[job.name], job.args,
+                                                    job.kwargs, self._progress)
+            except Exception as error:
+                if job.state != 'cancelled':
+                    self._send(job.writer, {'event': 'error', 'id': job.id, 'error': repr(error)})
+            else:
+                if job.state != 'cancelled':
+                    self._send(job.writer, {'event': 'result', 'id': job.id, 'result': result})
+            finally:
+                self._running -= 1
+                self._jobs.pop(job.id, None)
+            if job.state == 'cancelled':
+                self._send(job.writer, {'event': 'cancelled', 'id': job.id})
+                executor.shutdown(wait=False)
+                self._workers[worker] = await self._start_worker()
+
+    async def _forward_progress(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await loop.run_in_executor(None, self._progress.get)
+            if item is None:
+                return
+            (jobId, fraction, message) = item
+            job = self._jobs.get(jobId)
+            if job is not None:
+                self._send(job.writer, {'event': 'progress', 'id': jobId, 'fraction': fraction, 'message': message})
+
+
+# ----------------------------------Client side---------------------------------
+
+class JobClient(object):
+    """
+    Client of a JobServer. Several jobs can be submitted over the same connection and their events read separately.
+
+    Parameters
+    ----------
+    address: str or (str, int)
+        path of the server's Unix socket, or its (host, port)
+    """
+
+    def __init__(self, address):
+        self.address = address
+        self._tags = itertools.count()
+        self._pending = {}  # tag -> future of the job id
+        self._events = {}  # job id -> asyncio.Queue of its events
+        self._status = None
+
+    async def connect(self):
+        if isinstance(self.address, str):
+            (self._reader, self._writer) = await asyncio.open_unix_connection(self.address)
+        else:
+            (self._reader, self._writer) = await asyncio.open_connection(*self.address)
+        self._listener = asyncio.create_task(self._listen())
+        return self
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, *exception):
+        await self.close()
+
+    async def close(self):
+        self._listener.cancel()
+        self._writer.close()
+        await self._writer.wait_closed()
+
+    async def _listen(self):
+        async for line in self._reader:
+            event = json.loads(line)
+            kind = event['event']
+            if kind == 'status':
+                if self._status is not None:
+                    self._status.set_result(event)
+            elif kind == 'queued':
+                self._events.setdefault(event['id'], asyncio.Queue())
+                self._pending.pop(event['tag']).set_result(event['id'])
+            elif event.get('id') is None:
+                future = self._pending.pop(event.get('tag'), None)
+                if future is not None:
+                    future.set_exception(Exception(event['error']))
+            else:
+                self._events.setdefault(event['id'], asyncio.Queue()).put_nowait(event)
+
+    async def _write(self, message):
+        self._writer.write((json.dumps(_to_json(message)) + '\n').encode())
+        await self._writer.drain()
+
+    async def submit(self, job, args=(), kwargs=None, priority=0):
+        """
+        Submits a job.
+
+        Parameters
+        ----------
+        job -> str, name of the job on the server
+        args -> sequence, positional arguments of the job function
+        kwargs -> dict, keyword arguments of the job function
+        priority -> int, jobs with a higher priority run first
+
+        Returns
+        -------
+        int, id of the job
+        """
+        tag = next(self._tags)
+        self._pending[tag] = asyncio.get_running_loop().create_future()
+        await self._write({'op': 'submit', 'job': job, 'args': list(args), 'kwargs': kwargs or {},
+                           'priority': priority, 'tag': tag})
+        return await self._pending[tag]
+
+    async def events(self, jobId):
+        """
+        Yields the events of a job as they arrive, up to and including its result, error or cancellation.
+        """
+        queue = self._events.setdefault(jobId, asyncio.Queue())
+        while True:
+            event = await queue.get()
+            yield event
+            if event['event'] in _TERMINAL_EVENTS:
+                del self._events[jobId]
+                return
+
+    async def result(self, jobId, onProgress=None):
+        """
+        Waits for a job to finish and returns its result.
+
+        Parameters
+        ----------
+        jobId -> int
+        onProgress -> function called as onProgress(fraction, message) with every progress report
+
+        Returns
+        -------
+        the result of the job, raises JobCancelled or Exception if it was cancelled or failed
+        """
+        async for event in self.events(jobId):
+            if event['event'] == 'progress' and onProgress is not None:
+                onProgress(event['fraction'], event['message'])
+            elif event['event'] == 'result':
+                return event['result']
+            elif event['event'] == 'error':
+                raise Exception(event['error'])
+            elif event['event'] == 'cancelled':
+                raise JobCancelled()
+
+    async def cancel(self, jobId):
+        """
+        Cancels a job.
+        """
+        await self._write({'op': 'cancel', 'id': jobId})
+
+    async def status(self):
+        """
+        Returns the number of queued and running jobs and of workers of the server.
+        """
+        self._status = asyncio.get_running_loop().create_future()
+        await self._write({'op': 'status'})
+        event = await self._status
+        self._status = None
+        return event
+
+
+def run_job(address, job, args=(), kwargs=None, priority=0, onProgress=None):
+    """
+    Submits a job to a JobServer and waits for its result, for use outside of asyncio code.
+
+    Parameters
+    ----------
+    address -> str or (str, int), path of the server's Unix socket or its (host, port)
+    job -> str, name of the job on the server
+    args -> sequence, positional arguments of the job function
+    kwargs -> dict, keyword arguments of the job function
+    priority -> int, jobs with a higher priority run first
+    onProgress -> function called as onProgress(fraction, message) with every progress report
+
+    Returns
+    -------
+    the result of the job
+    """
+    async def main():
+        async with JobClient(address) as client:
+            jobId = await client.submit(job, args, kwargs, priority)
+            return await client.result(jobId, onProgress)
+
+    return asyncio.run(main())
+
+
+def _count_primes(limit, progress=None):
+    # Example job that reports its progress
+    primes = []
+    for number in range(2, limit):
+        if all(number % prime for prime in primes if prime * prime <= number):
+            primes.append(number)
+        if progress is not None and number % (limit // 4) == 0:
+            progress(number / limit, "{} primes so far".format(len(primes)))
+    return len(primes)
+
+
+if __name__ == "__main__":
+    import sys
+    import tempfile
+
+    # The algorithm scripts live next to the qsimulator package
+    sys.path.insert(0, os.getcwd())
+    jobs = {'grover': 'grover_algorithm:grover_algorithm',
+            'shor': 'shor_algorithm:shor_algorithm',
+            'count_primes': 'qsimulator.JobService:_count_primes'}
+
+    async def demo():
+        server = JobServer(jobs, path=os.path.join(tempfile.mkdtemp(), 'qsimulator.sock'), workers=2)
+        await server.start()
+        async with JobClient(server.address) as client:
+            grover = await client.submit('grover', [8])
+            shor = await client.submit('shor', [15], priority=1)
+            primes = await client.submit('count_primes', [200000])
+            print(await client.status())
+            print("grover:", await client.result(grover))
+            print("shor:", await client.result(shor))
+            print("primes:", await client.result(primes, lambda fraction, message: print(fraction, message)))
+        await server.close()
+
+    asyncio.run(demo())
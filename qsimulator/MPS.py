@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+This module contains the matrix product state (MPS) representation of a quantum register.
+
+The state of n qubits is stored as a chain of n tensors of shape (chiLeft, 2, chiRight), one per qubit, with qubit 0
+(the leftmost qubit) at the start of the chain. The bond dimensions chi only grow with the entanglement of the state,
+so wide but lightly entangled circuits fit in a tiny fraction of the 2**n numbers a State needs. Gates are applied
+locally and the bonds they touch are re-split with an SVD, dropping singular values beyond maxBond or below cutoff.
+
+The chain is kept in mixed canonical form: tensors left of the "center" are left-orthonormal and tensors right of it
+are right-orthonormal, which makes every SVD truncation optimal and lets measurements be sampled qubit by qubit.
+"""
+
+import numpy as np
+from qsimulator.basic import apply_local_operator
+from qsimulator.QuantumRegister import State
+from qsimulator.bitops import from_bits
+
+SWAP = np.array([[1, 0, 0, 0],
+                 [0, 0, 1, 0],
+                 [0, 1, 0, 0],
+                 [0, 0, 0, 1]])
+
+
+class MPS(object):
+
+    def __init__(self, tensors, maxBond=None, cutoff=1e-12):
+        """
+        Matrix product state of a quantum register. Input to the __init__ constructor is a list of numpy arrays of
+        shape (chiLeft, 2, chiRight), the first one with chiLeft = 1 and the last one with chiRight = 1. The tensors
+        are brought into canonical form by the constructor.
+
+        Parameters
+        ----------
+        tensors -> list of np.ndarray
+        maxBond -> int, maximum bond dimension kept after applying a gate, None means no limit
+        cutoff -> float, singular values smaller than cutoff times the largest one are dropped
+        """
+        self.tensors = [np.asarray(tensor, dtype=np.complex128) for tensor in tensors]
+        self.num_qubits = len(self.tensors)
+        self.maxBond = maxBond
+        self.cutoff = cutoff
+        # Sum of the squares of all the discarded singular values, an estimate of the infidelity of the state
+        self.truncation_error = 0.0
+        self.center = self.num_qubits - 1
+        self._move_center(0)
+
+    def _copy(self):
+        new = MPS.__new__(MPS)
+        new.tensors = list(self.tensors)
+        new.num_qubits = self.num_qubits
+        new.maxBond = self.maxBond
+        new.cutoff = self.cutoff
+        new.truncation_error = self.truncation_error
+        new.center = self.center
+        return new
+
+    def __str__(self):
+        """
+        Defines the behaviour when print(MPS) is invoked.
+        """
+        return "MPS with bond dimensions {}".format(self.bond_dimensions())
+
+    def __mul__(self, other):
+        """
+        Defines the behaviour when * operator is invoked. If the second operand is another MPS the kronecker product of
+        the two registers is returned, which just joins the two chains.
+        """
+        if isinstance(other, MPS):
+            return MPS(self.tensors + other.tensors, self.maxBond, self.cutoff)
+        else:
+            raise Exception("Unsupported type of object.")
+
+    def bond_dimensions(self):
+        """
+        Returns the list of the n - 1 bond dimensions between neighbouring qubits.
+        """
+        return [tensor.shape[2] for tensor in self.tensors[:-1]]
+
+    def _move_center(self, site):
+        """
+        Moves the orthogonality center to the given site with QR decompositions.
+        """
+        tensors = self.tensors
+        while self.center < site:
+            c = self.center
+            (l, d, r) = tensors[c].shape
+            Q, R = np.linalg.qr(tensors[c].reshape(l * d, r))
+            tensors[c] = Q.reshape(l, d, -1)
+            tensors[c + 1] = np.tensordot(R, tensors[c + 1], axes=(1, 0))
+            self.center += 1
+        while self.center > site:
+            c = self.center
+            (l, d, r) = tensors[c].shape
+            Q, R = np.linalg.qr(tensors[c].reshape(l, d * r).T)
+            tensors[c] = Q.T.reshape(-1, d, r)
+            tensors[c - 1] = np.tensordot(tensors[c - 1], R.T, axes=(2, 0))
+            self.center -= 1
+
+    def _split(self, theta, start, numSites):
+        """
+        Splits a tensor of shape (chiLeft, 2, ..., 2, chiRight) spanning numSites sites back into the chain with
+        truncated SVDs, going from left to right. The orthogonality center ends up on the last site.
+        """
+        (l, r) = (theta.shape[0], theta.shape[-1])
+        rest = theta.reshape(l, -1)
+        for i in range(numSites - 1):
+            remaining = 2 ** (numSites - i - 1)
+            U, s, Vh = np.linalg.svd(rest.reshape(l * 2, remaining * r), full_matrices=False)
+
+            keep = int(np.sum(s > self.cutoff * s[0])) if s[0] > 0 else 1
+            if self.maxBond is not None:
+                keep = min(keep, self.maxBond)
+            keep = max(keep, 1)
+            self.truncation_error += float(np.sum(s[keep:] ** 2))
+            s = s[:keep] / np.linalg.norm(s[:keep])
+
+            self.tensors[start + i] = U[:, :keep].reshape(l, 2, keep)
+            rest = s[:, None] * Vh[:keep]
+            l = keep
+        self.tensors[start + numSites - 1] = rest.reshape(l, 2, r)
+        self.center = start + numSites - 1
+
+    def _apply_contiguous(self, matrix, start, numSites):
+        """
+        Applies a gate to numSites neighbouring qubits starting at the site start.
+        """
+        self._move_center(start)
+        if numSites == 1:
+            self.tensors[start] = apply_local_operator(matrix, self.tensors[start], [1])
+            return
+
+        theta = self.tensors[start]
+        for site in range(start + 1, start + numSites):
+            theta = np.tensordot(theta, self.tensors[site], axes=(theta.ndim - 1, 0))
+        theta = apply_local_operator(matrix, theta, range(1, numSites + 1))
+        self._split(theta, start, numSites)
+
+    def apply(self, matrix, qubits=None):
+        """
+        Applies a gate to the chosen qubits. Qubits that are not next to each other in the chain are first brought
+        together with SWAP gates, which are undone after the gate was applied.
+
+        Parameters
+        ----------
+        matrix -> 2**k x 2**k numpy array
+        qubits -> sequence of k integers, the qubits the gate acts on. If None the gate acts on all qubits.
+
+        Returns
+        -------
+        MPS object
+        """
+        if qubits is None:
+            qubits = range(self.num_qubits)
+        qubits = list(qubits)
+        new = self._copy()
+
+        # order[site] is the qubit that currently sits at the site
+        order = list(range(self.num_qubits))
+        swaps = []
+        start = min(qubits)
+        for i, qubit in enumerate(qubits):
+            site = order.index(qubit)
+            target = start + i
+            while site > target:
+                new._apply_contiguous(SWAP, site - 1, 2)
+                order[site - 1], order[site] = order[site], order[site - 1]
+                swaps.append(site - 1)
+                site -= 1
+            while site < target:
+                new._apply_contiguous(SWAP, site, 2)
+                order[site], order[site + 1] = order[site + 1], order[site]
+                swaps.append(site)
+                site += 1
+
+        new._apply_contiguous(np.asarray(matrix), start, len(qubits))
+        for site in reversed(swaps):
+            new._apply_contiguous(SWAP, site, 2)
+        return new
+
+    def sample(self, numShots=1, rng=None):
+        """
+        Samples measurements of all the qubits without contracting the whole state. The qubits are sampled one after
+        another from the left, every shot only carries a vector of the size of the current bond. All the shots are
+        processed at once.
+
+        Parameters
+        ----------
+        numShots -> int
+        rng -> np.random.Generator, optional
+
+        Returns
+        -------
+        np.ndarray of shape (numShots, n) of measured bits, column 0 being qubit 0
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+        self._move_center(0)
+
+        bits = np.zeros((numShots, self.num_qubits), dtype=np.int8)
+        environment = np.ones((numShots, 1), dtype=np.complex128)
+        for site, tensor in enumerate(self.tensors):
+            # branches[shot, b, :] is the unnormalised environment after measuring b on this qubit
+            branches = np.einsum('sl,lbr->sbr', environment, tensor)
+            probabilities = np.sum(np.abs(branches) ** 2, axis=2)
+            probabilities /= np.sum(probabilities, axis=1, keepdims=True)
+
+            outcome = (rng.random(numShots) >= probabilities[:, 0]).astype(np.int8)
+            bits[:, site] = outcome
+            environment = branches[np.arange(numShots), outcome]
+            environment /= np.sqrt(probabilities[np.arange(numShots), outcome])[:, None]
+        return bits
+
+    def measure(self):
+        """
+        Measures the register and returns a number corresponding to the basis state that was measured. It doesn't
+        collapse the state.
+
+        Returns
+        -------
+        int
+        """
+        return from_bits(self.sample(1)[0])
+
+    def to_state(self):
+        """
+        Contracts the chain into a dense State. Only possible for registers that fit in memory as a State.
+
+        Returns
+        -------
+        State object
+        """
+        vector = self.tensors[0]
+        for tensor in self.tensors[1:]:
+            vector = np.tensordot(vector, tensor, axes=(vector.ndim - 1, 0))
+        return State(vector.reshape(-1))
+
+
+def state_to_mps(state, maxBond=None, cutoff=1e-12):
+    """
+    Converts a State into an MPS by splitting off one qubit at a time with an SVD.
+
+    Parameters
+    ----------
+    state -> State object
+    maxBond -> int, maximum bond dimension, None means no limit
+    cutoff -> float, relative cutoff for the singular values
+
+    Returns
+    -------
+    MPS object
+    """
+    n = state.num_qubits
+    mps = MPS([np.ones((1, 2, 1))] * n, maxBond, cutoff)
+    theta = np.asarray(state.vector, dtype=np.complex128).reshape((1,) + (2,) * n + (1,))
+    mps._split(theta, 0, n)
+    return mps
+
+
+def product_mps(vectors, maxBond=None, cutoff=1e-12):
+    """
+    Creates an MPS of a product state, every bond has dimension 1.
+
+    Parameters
+    ----------
+    vectors -> list of length 2 numpy arrays, one per qubit, starting from the leftmost qubit
+    maxBond -> int, maximum bond dimension, None means no limit
+    cutoff -> float, relative cutoff for the singular values
+
+    Returns
+    -------
+    MPS object
+    """
+    tensors = [np.asarray(vector, dtype=np.complex128).reshape(1, 2, 1) / np.linalg.norm(vector)
+               for vector in vectors]
+    return MPS(tensors, maxBond, cutoff)
+
+
+def mps_zeros(numQubits, maxBond=None, cutoff=1e-12):
+    """
+    This function initializes an MPS in which every qubit is in the state |0>.
+    """
+    return product_mps([np.array([1, 0])] * numQubits, maxBond, cutoff)
+
+
+def mps_equiprobable(numQubits, maxBond=None, cutoff=1e-12):
+    """
+    This function initializes an MPS in which every state is equally probable.
+    """
+    return product_mps([np.array([1, 1]) / np.sqrt(2)] * numQubits, maxBond, cutoff)
+
+
+if __name__ == "__main__":
+    H = (1 / np.sqrt(2)) * np.array([[1, 1],
+                                     [1, -1]])
+    CX = np.array([[1, 0, 0, 0],
+                   [0, 1, 0, 0],
+                   [0, 0, 0, 1],
+                   [0, 0, 1, 0]])
+
+    # 100 qubit GHZ state, the bond dimension never gets bigger than 2
+    mps = mps_zeros(100).apply(H, [0])
+    for q in range(99):
+        mps = mps.apply(CX, [q, q + 1])
+    print(mps)
+    print(mps.sample(5).sum(axis=1))
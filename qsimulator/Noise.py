@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+This module contains noise channels and the Monte-Carlo trajectory simulation of noisy circuits.
+
+A circuit is a list of (operation, qubits) pairs, where the operation is a QuantumGate or a KrausChannel and qubits
+is the list of qubits it acts on (None means the whole register). The same circuit can be run exactly on a
+DensityMatrix with run_density_matrix, or stochastically on a State with run_trajectories. A trajectory only ever
+holds one state vector, so memory stays at O(2**n) per worker process.
+"""
+
+import numpy as np
+from multiprocessing import Pool
+from qsimulator.basic import apply_local_operator
+from qsimulator.QuantumRegister import State
+from qsimulator.DensityMatrix import DensityMatrix
+
+
+class KrausChannel(object):
+    """
+    Quantum channel given by its Kraus operators, rho -> sum_i K_i rho K_i^dagger.
+
+    Parameters
+    ----------
+    operators: list of arrays
+        Kraus operators, all 2**k x 2**k for a channel acting on k qubits
+    """
+
+    def __init__(self, operators):
+        operators = [np.asarray(operator, dtype=np.complex128) for operator in operators]
+        if len(operators) == 0:
+            raise Exception("A channel needs at least one Kraus operator.")
+        shape = operators[0].shape
+        if any(operator.shape != shape for operator in operators):
+            raise Exception("Kraus operators are not of the same shape.")
+
+        completeness = sum(np.conjugate(operator.T) @ operator for operator in operators)
+        if not np.allclose(completeness, np.identity(shape[0])):
+            raise Exception("Kraus operators don't preserve the trace.")
+
+        self.operators = operators
+        self.shape = shape
+
+    def __call__(self, other, qubits=None, rng=None):
+        """
+        Applies the channel. On a DensityMatrix the channel is applied exactly. On a State a single Kraus operator is
+        picked at random with probability ||K_i psi||^2 and the renormalised state K_i psi / ||K_i psi|| is returned,
+        which is one step of a quantum trajectory.
+
+        Parameters
+        ----------
+        other: State or DensityMatrix
+        qubits: sequence of int, optional
+            Qubits the channel acts on, by default the whole register.
+        rng: np.random.Generator, optional
+            Random number generator used for State inputs.
+        """
+        if isinstance(other, DensityMatrix):
+            return other.apply_kraus(self.operators, qubits)
+        elif isinstance(other, State):
+            if qubits is None:
+                qubits = range(other.num_qubits)
+            if rng is None:
+                rng = np.random.default_rng()
+            tensor = np.reshape(other.vector, (2,) * other.num_qubits)
+
+            # Branches are only computed until the random number is reached. If rounding leaves the total short of it,
+            # the last branch with p > 0 is picked, the ones after it can't happen.
+            x = rng.random()
+            P = 0
+            (chosen, chosenP) = (None, 0)
+            for operator in self.operators:
+                branch = apply_local_operator(operator, tensor, qubits)
+                p = np.real(np.vdot(branch, branch))
+                P += p
+                if p > 0:
+                    (chosen, chosenP) = (branch, p)
+                    if P >= x:
+                        break
+            return State._from_vector(chosen.reshape(-1) / np.sqrt(chosenP), other.num_qubits)
+        else:
+            raise Exception("Unsupported object type.")
+
+
+class ReadoutError(object):
+    """
+    Classical readout error that flips each measured bit independently.
+
+    Parameters
+    ----------
+    p01: float
+        probability of reading 1 when the qubit is in |0>
+    p10: float
+        probability of reading 0 when the qubit is in |1>
+    """
+
+    def __init__(self, p01, p10=None):
+        if p10 is None:
+            p10 = p01
+        self.p01 = p01
+        self.p10 = p10
+        # Column j is the distribution of the read value given the true value j
+        self.matrix = np.array([[1 - p01, p10],
+                                [p01, 1 - p10]])
+
+    def probabilities(self, probabilities):
+        """
+        Turns the probabilities of the true outcomes into the probabilities of the read outcomes.
+
+        Parameters
+        ----------
+        probabilities -> np.ndarray of length 2**n
+
+        Returns
+        -------
+        np.ndarray of length 2**n
+        """
+        numQubits = int(np.log2(len(probabilities)))
+        tensor = np.reshape(probabilities, (2,) * numQubits)
+        for q in range(numQubits):
+            tensor = apply_local_operator(self.matrix, tensor, [q])
+        return tensor.reshape(-1)
+
+    def apply(self, outcome, numQubits, rng=None):
+        """
+        Flips the bits of a measured outcome at random.
+
+        Parameters
+        ----------
+        outcome -> int, measured basis state
+        numQubits -> int
+        rng -> np.random.Generator, optional
+
+        Returns
+        -------
+        int
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+        bits = (outcome >> np.arange(numQubits)) & 1
+        flipProbability = np.where(bits == 1, self.p10, self.p01)
+        flips = rng.random(numQubits) < flipProbability
+        return outcome ^ int(np.sum(flips.astype(np.int64) << np.arange(numQubits)))
+
+
+# ------------------------------Channel Construction-------------------------------
+
+def depolarizing_channel(p):
+    """
+    Creates a single qubit depolarizing channel, which replaces the qubit with the maximally mixed state with
+    probability p.
+
+    Parameters
+    ----------
+    p -> float
+
+    Returns
+    -------
+    KrausChannel
+    """
+    X = np.array([[0, 1], [1, 0]])
+    Y = np.array([[0, -1j], [1j, 0]])
+    Z = np.array([[1, 0], [0, -1]])
+    return KrausChannel([np.sqrt(1 - 3 * p / 4) * np.identity(2),
+                         np.sqrt(p / 4) * X, np.sqrt(p / 4) * Y, np.sqrt(p / 4) * Z])
+
+
+def amplitude_damping_channel(gamma):
+    """
+    Creates a single qubit amplitude damping channel, |1> decays to |0> with probability gamma.
+
+    Parameters
+    ----------
+    gamma -> float
+
+    Returns
+    -------
+    KrausChannel
+    """
+    return KrausChannel([np.array([[1, 0], [0, np.sqrt(1 - gamma)]]),
+                         np.array([[0, np.sqrt(gamma)], [0, 0]])])
+
+
+def phase_flip_channel(p):
+    """
+    Creates a single qubit phase flip channel, Z is applied with probability p.
+
+    Parameters
+    ----------
+    p -> float
+
+    Returns
+    -------
+    KrausChannel
+    """
+    return KrausChannel([np.sqrt(1 - p) * np.identity(2),
+                         np.sqrt(p) * np.array([[1, 0], [0, -1]])])
+
+
+# ------------------------------Circuit Execution-------------------------------
+
+def run_density_matrix(circuit, rho):
+    """
+    Runs a circuit exactly on a density matrix.
+
+    Parameters
+    ----------
+    circuit -> list of (QuantumGate or KrausChannel, qubits) pairs
+    rho -> DensityMatrix or State, initial state
+
+    Returns
+    -------
+    DensityMatrix object
+    """
+    if isinstance(rho, State):
+        rho = DensityMatrix(rho)
+    for operation, qubits in circuit:
+        rho = operation(rho, qubits)
+    return rho
+
+
+def _run_single_trajectory(circuit, state, rng):
+    for operation, qubits in circuit:
+        if isinstance(operation, KrausChannel):
+            state = operation(state, qubits, rng)
+        else:
+            state = operation(state, qubits)
+    return state
+
+
+def _run_trajectory_batch(arguments):
+    circuit, initialState, readout, seeds = arguments
+    numQubits = initialState.num_qubits
+    counts = np.zeros(2 ** numQubits, dtype=np.int64)
+
+    for seed in seeds:
+        rng = np.random.default_rng(seed)
+        state = _run_single_trajectory(circuit, initialState, rng)
+        P = state.cdf()
+        outcome = int(min(np.searchsorted(P, rng.random() * P[-1], side='right'), len(P) - 1))
+        if readout is not None:
+            outcome = readout.apply(outcome, numQubits, rng)
+        counts[outcome] += 1
+    return counts
+
+
+def run_trajectories(circuit, initialState, numTrajectories, seed=None, readout=None, processes=None,
+                     batchSize=None):
+    """
+    Runs a noisy circuit as a number of independent quantum trajectories on a State, measures every trajectory at the
+    end and returns the histogram of the measured outcomes.
+
+    Every trajectory gets its own random number stream spawned from the seed, so the result only depends on the seed
+    and not on the number of processes or the size of the batches. The trajectories are sent to the worker processes
+    in batches.
+
+    Parameters
+    ----------
+    circuit -> list of (QuantumGate or KrausChannel, qubits) pairs
+    initialState -> State object
+    numTrajectories -> int
+    seed -> int, optional, makes the result reproducible
+    readout -> ReadoutError, optional, applied to every measured outcome
+    processes -> int, number of worker processes. By default all cores are used, 1 runs in the current process.
+    batchSize -> int, number of trajectories sent to a worker at once
+
+    Returns
+    -------
+    np.ndarray of length 2**n, number of times each basis state was measured
+    """
+    seeds = np.random.SeedSequence(seed).spawn(numTrajectories)
+    if batchSize is None:
+        batchSize = max(1, min(64, numTrajectories // 16))
+    batches = [(circuit, initialState, readout, seeds[i:i + batchSize])
+               for i in range(0, numTrajectories, batchSize)]
+
+    if processes == 1:
+        results = [_run_trajectory_batch(batch) for batch in batches]
+    else:
+        with Pool(processes) as pool:
+            results = pool.map(_run_trajectory_batch, batches)
+
+    counts = np.zeros(2 ** initialState.num_qubits, dtype=np.int64)
+    for result in results:
+        counts += result
+    return counts
+
+
+if __name__ == "__main__":
+    from qsimulator.QuantumGate import hGate, cxGate
+    from qsimulator.QuantumRegister import zeros
+
+    # Bell state with some noise on both qubits
+    bell = [(hGate(), [0]), (cxGate(), [0, 1]),
+            (depolarizing_channel(0.1), [0]), (amplitude_damping_channel(0.2), [1])]
+
+    print(run_density_matrix(bell, zeros(2)).probabilities())
+    print(run_trajectories(bell, zeros(2), 1000, seed=1) / 1000)
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+This module computes exact expectation values of observables on a State, without sampling and without building any
+2**n x 2**n matrix.
+
+A Pauli string is given as a string with one of the letters I, X, Y, Z per qubit, qubit 0 first (e.g. 'XIZ'), or as a
+dictionary {qubit: letter} for the qubits it doesn't act on as the identity. A Hamiltonian is a list of
+(coefficient, Pauli string) pairs.
+
+A Pauli string acts on a basis state as P|j> = i**numY * (-1)**popcount(j & zMask) |j XOR xMask>, where the masks have
+a bit set for every qubit with an X or Y (xMask) and a Z or Y (zMask). Its expectation value is therefore a single
+sum over the amplitude array, and all the terms with the same xMask share the same product of amplitudes.
+"""
+
+import numpy as np
+from qsimulator.QuantumRegister import State
+from qsimulator.bitops import parity
+
+
+def pauli_masks(pauli, numQubits):
+    """
+    Converts a Pauli string into the bit masks used to apply it to basis state indices.
+
+    Parameters
+    ----------
+    pauli -> string such as 'XIZ', or dictionary {qubit: 'X'}
+    numQubits -> int
+
+    Returns
+    -------
+    (xMask, zMask, numY) -> integers
+    """
+    if isinstance(pauli, dict):
+        letters = ['I'] * numQubits
+        for qubit, letter in pauli.items():
+            letters[qubit] = letter
+        pauli = ''.join(letters)
+    if len(pauli) != numQubits:
+        raise Exception("Pauli string {} doesn't act on {} qubits.".format(pauli, numQubits))
+
+    xMask = 0
+    zMask = 0
+    numY = 0
+    for qubit, letter in enumerate(pauli.upper()):
+        bit = 1 << (numQubits - 1 - qubit)  # qubit 0 is the most significant bit
+        if letter in 'XY':
+            xMask |= bit
+        if letter in 'ZY':
+            zMask |= bit
+        if letter == 'Y':
+            numY += 1
+        if letter not in 'IXYZ':
+            raise Exception("Unknown Pauli operator {}.".format(letter))
+    return xMask, zMask, numY
+
+
+def pauli_product(vector, xMask, zMask, numY, indices=None):
+    """
+    Computes P times a state vector for the Pauli string with the given masks, (P psi)[k] =
+    i**numY * (-1)**popcount((k XOR xMask) & zMask) * psi[k XOR xMask]. The matrix of P is never built.
+
+    Parameters
+    ----------
+    vector -> np.ndarray of length 2**n
+    xMask, zMask, numY -> integers, see pauli_masks
+    indices -> np.ndarray, optional, np.arange(len(vector)), which can be passed in to be reused between calls
+
+    Returns
+    -------
+    np.ndarray
+    """
+    vector = np.asarray(vector, dtype=np.complex128)
+    if indices is None:
+        indices = np.arange(len(vector))
+    flipped = indices ^ xMask if xMask else indices
+    product = vector[flipped] if xMask else vector.copy()
+    if zMask:
+        product *= 1 - 2 * parity(flipped & zMask)
+    if numY % 4:
+        product *= 1j ** numY
+    return product
+
+
+def expectation_paulis(state, paulis):
+    """
+    Computes the expectation values of many Pauli strings at once. Terms are grouped by the qubits they flip, so the
+    amplitude array is permuted once per group and every term then only costs one signed sum.
+
+    Parameters
+    ----------
+    state -> State object
+    paulis -> list of Pauli strings
+
+    Returns
+    -------
+    np.ndarray of floats, one expectation value per Pauli string
+    """
+    vector = np.asarray(state.vector, dtype=np.complex128)
+    numQubits = state.num_qubits
+    indices = np.arange(len(vector))
+
+    groups = {}
+    for k, pauli in enumerate(paulis):
+        xMask, zMask, numY = pauli_masks(pauli, numQubits)
+        groups.setdefault(xMask, []).append((k, zMask, numY))
+
+    values = np.zeros(len(paulis))
+    for xMask, terms in groups.items():
+        # products[j] = conj(psi[j XOR xMask]) * psi[j]
+        products = np.conjugate(vector[indices ^ xMask]) * vector
+        for k, zMask, numY in terms:
+            if zMask == 0:
+                total = np.sum(products)
+            else:
+                total = np.sum(products * (1 - 2 * parity(indices & zMask)))
+            values[k] = np.real(1j ** numY * total)
+    return values
+
+
+def expectation_pauli(state, pauli):
+    """
+    Computes <psi|P|psi> for a Pauli string P.
+
+    Parameters
+    ----------
+    state -> State object
+    pauli -> Pauli string
+
+    Returns
+    -------
+    float
+    """
+    return expectation_paulis(state, [pauli])[0]
+
+
+def expectation_hamiltonian(state, hamiltonian):
+    """
+    Computes <psi|H|psi> for a Hamiltonian given as a sum of Pauli strings.
+
+    Parameters
+    ----------
+    state -> State object
+    hamiltonian -> list of (coefficient, Pauli string) pairs
+
+    Returns
+    -------
+    float or complex, complex only if some of the coefficients are complex
+    """
+    coefficients = np.array([coefficient for coefficient, _ in hamiltonian])
+    values = expectation_paulis(state, [pauli for _, pauli in hamiltonian])
+    return np.sum(coefficients * values)
+
+
+def hamiltonian_operator(hamiltonian, numQubits):
+    """
+    Prepares a Hamiltonian given as a sum of Pauli strings for being applied many times, e.g. during time evolution.
+    The terms are grouped by the qubits they flip and the terms with the same masks are added up, so applying H costs
+    one permutation per group and one signed product per distinct term. The signs are worked out during every
+    product, only the masks and coefficients are stored.
+
+    Parameters
+    ----------
+    hamiltonian -> list of (coefficient, Pauli string) pairs
+    numQubits -> int
+
+    Returns
+    -------
+    function that takes a state vector (np.ndarray) and returns H times it
+    """
+    indices = np.arange(2 ** numQubits)
+
+    # xMask -> {zMask: sum of coefficient * i**numY}
+    groups = {}
+    for coefficient, pauli in hamiltonian:
+        xMask, zMask, numY = pauli_masks(pauli, numQubits)
+        terms = groups.setdefault(xMask, {})
+        terms[zMask] = terms.get(zMask, 0) + coefficient * 1j ** numY
+
+    def operator(vector):
+        # (P psi)[k] = i**numY * (-1)**popcount((k XOR xMask) & zMask) * psi[k XOR xMask]
+        vector = np.asarray(vector, dtype=np.complex128)
+        result = np.zeros_like(vector)
+        for xMask, terms in groups.items():
+            flipped = indices ^ xMask if xMask else indices
+            gathered = vector[flipped] if xMask else vector
+            for zMask, factor in terms.items():
+                if zMask == 0:
+                    result += factor * gathered
+                else:
+                    result += factor * (1 - 2 * parity(flipped & zMask)) * gathered
+        return result
+
+    return operator
+
+
+def apply_hamiltonian(state, hamiltonian):
+    """
+    Computes H|psi> for a Hamiltonian given as a sum of Pauli strings, without building the matrix of H. Like in
+    expectation_paulis the amplitude array is permuted once for all the terms that flip the same qubits.
+
+    Parameters
+    ----------
+    state -> State object
+    hamiltonian -> list of (coefficient, Pauli string) pairs
+
+    Returns
+    -------
+    State object, not normalised
+    """
+    return State(hamiltonian_operator(hamiltonian, state.num_qubits)(state.vector))
+
+
+def expectation_diagonal(state, diagonal):
+    """
+    Computes <psi|D|psi> for a diagonal operator D.
+
+    Parameters
+    ----------
+    state -> State object
+    diagonal -> np.ndarray of length 2**n holding the diagonal of D, or a function that takes an array of basis state
+        indices and returns the corresponding diagonal elements
+
+    Returns
+    -------
+    float or complex
+    """
+    probabilities = state.probabilities()
+    if callable(diagonal):
+        diagonal = diagonal(np.arange(len(probabilities)))
+    return np.sum(np.asarray(diagonal) * probabilities)
+
+
+if __name__ == "__main__":
+    # Bell state (|00> + |11>)/sqrt(2)
+    bell = State(np.array([1, 0, 0, 1]) / np.sqrt(2))
+    print(expectation_paulis(bell, ['ZZ', 'XX', 'YY', 'ZI']))
+    print(expectation_hamiltonian(bell, [(0.5, 'ZZ'), (0.25, {0: 'X', 1: 'X'})]))
+    print(expectation_diagonal(bell, lambda j: j))
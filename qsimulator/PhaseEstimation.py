@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+This module contains quantum phase estimation, and quantum Fourier transforms that act on a few qubits of a State
+without building the Fourier transform matrix.
+
+Phase estimation of a unitary U on an eigenstate |psi> with U|psi> = exp(2 pi i phi)|psi> uses a counting register of
+t qubits in equal superposition. Counting qubit t - 1 - k (qubit 0 is the leftmost qubit, the most significant bit)
+controls U**(2**k) on the eigenstate register, which leaves the counting register in
+sum_x exp(2 pi i phi x)|x> / sqrt(2**t), and the inverse Fourier transform turns that into a peak at x = phi * 2**t.
+
+The powers U**(2**k) are computed by repeated squaring, U**(2**k) = (U**(2**(k-1)))**2, and cached in an
+OperatorPowers object, so the t controlled powers cost t - 1 matrix products instead of applying U 2**t - 1 times.
+The operator is either a matrix (a QuantumGate or numpy array) or a permutation of the basis states, given as the
+integer array perm with U|j> = |perm[j]> (the modular multiplication of Shor's algorithm is one); the powers of a
+permutation are permutations too and squaring one costs a single indexing operation.
+
+The Fourier transforms follow QFT_operator and inverse_QFT_operator,
+QFT|x> = sum_y exp(2 pi i x y / 2**t)|y> / sqrt(2**t) with no reversal of the qubits, and are computed with numpy's
+FFT along the chosen qubits in O(t 2**n) operations.
+"""
+
+import numpy as np
+from qsimulator.QuantumRegister import State
+
+
+class OperatorPowers(object):
+    """
+    Powers U**(2**k) of an operator, computed by repeated squaring the first time they are needed and cached.
+
+    Parameters
+    ----------
+    operator: QuantumGate, 2**m x 2**m numpy array, or integer numpy array of length 2**m
+        the unitary, or the permutation perm with U|j> = |perm[j]>
+    """
+
+    def __init__(self, operator):
+        operator = np.asarray(getattr(operator, 'matrix', operator))
+        self.permutation = operator.ndim == 1
+        if self.permutation:
+            operator = operator.astype(np.int64)
+            if not np.array_equal(np.sort(operator), np.arange(len(operator))):
+                raise Exception("A 1 dimensional operator has to be a permutation of the basis states.")
+        elif operator.ndim != 2 or operator.shape[0] != operator.shape[1]:
+            raise Exception("Operator of shape {} is not square.".format(operator.shape))
+        self.size = len(operator)
+        self.num_qubits = self.size.bit_length() - 1
+        self._powers = [operator]
+
+    def power(self, k):
+        """
+        Returns U**(2**k), as a matrix or as a permutation.
+        """
+        while len(self._powers) <= k:
+            last = self._powers[-1]
+            self._powers.append(last[last] if self.permutation else np.matmul(last, last))
+        return self._powers[k]
+
+    def apply(self, k, vectors):
+        """
+        Applies U**(2**k) to vectors of the target register, stored along the last axis.
+
+        Parameters
+        ----------
+        k -> int
+        vectors -> np.ndarray of shape (..., 2**m)
+
+        Returns
+        -------
+        np.ndarray of the same shape
+        """
+        power = self.power(k)
+        if self.permutation:
+            output = np.empty_like(vectors)
+            output[..., power] = vectors
+            return output
+        return np.matmul(vectors, power.T)
+
+
+def _fourier(state, qubits, transform):
+    n = state.num_qubits
+    qubits = list(range(n)) if qubits is None else list(qubits)
+    k = len(qubits)
+    tensor = np.moveaxis(np.reshape(state.vector, (2,) * n), qubits, range(k))
+    shape = tensor.shape
+    output = transform(tensor.reshape(2 ** k, -1), axis=0, norm='ortho').reshape(shape)
+    return State._from_vector(np.ascontiguousarray(np.moveaxis(output, range(k), qubits)).reshape(-1), n)
+
+
+def qft(state, qubits=None):
+    """
+    Applies the quantum Fourier transform to some qubits of a State, the same as QFT_operator(len(qubits)) applied to
+    those qubits.
+
+    Parameters
+    ----------
+    state -> State object
+    qubits -> sequence of ints, the first one is the most significant bit of the transformed register. By default
+        the whole register.
+
+    Returns
+    -------
+    State object
+    """
+    return _fourier(state, qubits, np.fft.ifft)
+
+
+def inverse_qft(state, qubits=None):
+    """
+    Applies the inverse quantum Fourier transform to some qubits of a State, the same as
+    inverse_QFT_operator(len(qubits)) applied to those qubits.
+
+    Parameters
+    ----------
+    state -> State object
+    qubits -> sequence of ints, the first one is the most significant bit of the transformed register. By default
+        the whole register.
+
+    Returns
+    -------
+    State object
+    """
+    return _fourier(state, qubits, np.fft.fft)
+
+
+def _counting_amplitudes(powers, eigenstate, numCounting):
+    # Amplitudes of the counting register (rows) times the eigenstate register (columns) at the end of the circuit
+    target = np.asarray(getattr(eigenstate, 'vector', eigenstate), dtype=np.complex128)
+    if len(target) != powers.size:
+        raise Exception("Eigenstate of size {} doesn't match the operator of size {}.".format(len(target),
+                                                                                            powers.size))
+    amplitudes = np.empty((2 ** numCounting, powers.size), dtype=np.complex128)
+    amplitudes[:] = target / np.sqrt(2 ** numCounting)
+
+    tensor = amplitudes.reshape((2,) * numCounting + (powers.size,))
+    for k in range(numCounting):
+        # Counting qubit numCounting - 1 - k has weight 2**k and controls U**(2**k)
+        index = [slice(None)] * (numCounting + 1)
+        index[numCounting - 1 - k] = 1
+        tensor[tuple(index)] = powers.apply(k, tensor[tuple(index)])
+
+    # The inverse QFT of the counting register, inverse_QFT_operator(numCounting) applied to every column
+    return np.fft.fft(amplitudes, axis=0, norm='ortho')
+
+
+def phase_distribution(operator, eigenstate, numCounting):
+    """
+    Returns the probabilities of the outcomes of phase estimation, outcome y standing for the phase y / 2**numCounting.
+
+    Parameters
+    ----------
+    operator -> QuantumGate, numpy matrix, permutation array or OperatorPowers (to reuse its cached powers)
+    eigenstate -> State or np.ndarray, the state of the target register, not necessarily an eigenstate
+    numCounting -> int, number of counting qubits, the precision of the phase in bits
+
+    Returns
+    -------
+    np.ndarray of length 2**numCounting
+    """
+    powers = operator if isinstance(operator, OperatorPowers) else OperatorPowers(operator)
+    amplitudes = _counting_amplitudes(powers, eigenstate, numCounting)
+    return np.sum(amplitudes.real ** 2 + amplitudes.imag ** 2, axis=1)
+
+
+def phase_estimation(operator, eigenstate, numCounting, numShots=1, seed=None):
+    """
+    Runs phase estimation and samples the measured phases.
+
+    Parameters
+    ----------
+    operator -> QuantumGate, numpy matrix, permutation array or OperatorPowers (to reuse its cached powers)
+    eigenstate -> State or np.ndarray, the state of the target register, not necessarily an eigenstate
+    numCounting -> int, number of counting qubits, the precision of the phase in bits
+    numShots -> int, number of measurements
+    seed -> int, optional, makes the measurements reproducible
+
+    Returns
+    -------
+    np.ndarray of numShots phases in [0, 1)
+    """
+    probabilities = phase_distribution(operator, eigenstate, numCounting)
+    rng = np.random.default_rng(seed)
+    outcomes = rng.choice(len(probabilities), size=numShots, p=probabilities / np.sum(probabilities))
+    return outcomes / 2 ** numCounting
+
+
+if __name__ == "__main__":
+    from fractions import Fraction
+    from qsimulator.QuantumGate import phaseGate
+
+    # The phase gate diag(1, exp(i theta)) has the eigenstate |1> with phase theta / (2 pi)
+    print(phase_estimation(phaseGate(2 * np.pi * 0.3125), np.array([0, 1]), 4, numShots=5, seed=1))
+
+    # Order finding: multiplication by a modulo N is a permutation of the numbers 0, ..., N-1 (the rest of the
+    # register is left alone), the phases of |1> are multiples of 1/r where r is the order of a
+    (a, N, m, t) = (7, 15, 4, 8)
+    permutation = np.arange(2 ** m)
+    permutation[:N] = (a * np.arange(N)) % N
+    phases = phase_estimation(permutation, np.eye(2 ** m)[1], t, numShots=10, seed=2)
+    print([Fraction(phase).limit_denominator(N) for phase in phases])
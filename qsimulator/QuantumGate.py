@@ -14,6 +14,8 @@ This module contains the quantum gates
 
 import numpy as np
 from qsimulator.basic import kronecker_product, kronecker_product_power
+from qsimulator.bitops import permute_bits
+from qsimulator import kernels
 from qsimulator.QuantumRegister import State
 from qsimulator.qubit import Qubit
 
@@ -31,8 +33,8 @@ Y = np.array([[0, -1j],
               [1j, 0]])
 # Y Gate
 
-Z = np.array([[0, -1j],
-              [1j, 0]])
+Z = np.array([[1, 0],
+              [0, -1]])
 # Z Gate
 
 H = (1 / np.sqrt(2)) * np.array([[1, 1],
@@ -180,14 +182,27 @@ class QuantumGate(object):
         else:
             raise Exception("Division can only be done with integers, floats, or complex numbers.")
 
-    def __call__(self, other):
+    def _structure(self):
+        # Specific kernel of the gate (see kernels.gate_structure), worked out once for every matrix the gate holds
+        cached = getattr(self, '_cached_structure', None)
+        if cached is None or cached[0] is not self.matrix:
+            cached = (self.matrix, kernels.gate_structure(self.matrix))
+            self._cached_structure = cached
+        return cached[1]
+
+    def __call__(self, other, qubits=None):
         """
         Applies gate to qubit(s) or does matrix product if called upon another QuantumGate object.
         
         Parameters
         ----------
-        other: array, State, Qubit, QuantumGate
-            State of quantum bit or register, or another QuantumGate object.
+        other: array, State, Qubit, QuantumGate or one of the other backends
+            State of quantum bit or register, or another QuantumGate object. The other backends (DensityMatrix, MPS,
+            StabilizerState, SparseState) are anything with an apply(matrix, qubits) method.
+        qubits: sequence of int, optional
+            Qubits the gate acts on (qubit 0 is the leftmost one). The gate then only needs to be as big as the number
+            of qubits it acts on and is applied locally, without building the operator for the whole register. By
+            default the gate acts on the whole register.
         """
 
         # Is the gate acting on the qubit class?
@@ -196,16 +211,238 @@ class QuantumGate(object):
             return State(output)
         # Is the gate acting on the quantum register?
         elif isinstance(other, State):
+            if qubits is not None:
+                return other.apply(self.matrix, qubits)
+            # Diagonal, permutation and controlled gates on the whole register get the kernels too
+            if self.matrix.shape == (len(other._vector), len(other._vector)):
+                structure = self._structure()
+                if structure is not None:
+                    n = other.num_qubits
+                    output = kernels.apply_structured(other._vector, structure, other._stored_qubits(range(n)), n)
+                    return State._from_vector(output, n, other._order)
             output = np.matmul(self.matrix, other.vector)
-            return State(output)
+            if len(output) != len(other.vector):
+                return State(output)
+            return State._from_vector(output, other.num_qubits)
         # Is the gate acting on another gate?
         elif isinstance(other, QuantumGate):
             output = np.matmul(self.matrix, other.matrix)
             return QuantumGate(output)
+        # Is the gate acting on another backend? They are not imported here so that they are only loaded when used.
+        elif hasattr(other, 'apply'):
+            return other.apply(self.matrix, qubits)
         else:
             raise Exception("Unsupported object type.")
 
 
+class ParameterizedGate(QuantumGate):
+    """
+    Quantum gate that depends on a single real parameter, U(theta) = exp(-i theta G) for a hermitian generator G.
+
+    The generator is diagonalised once when the gate is created, so binding a new parameter value only rescales the
+    eigenvalue phases and overwrites the existing matrix in place. Every QuantumGate (or State) that was built from
+    this gate's matrix keeps its own copy and is not affected.
+
+    Parameters
+    ----------
+    generator: array
+        hermitian matrix G
+    theta: float
+        initial value of the parameter
+    """
+
+    def __init__(self, generator, theta=0.0):
+        self.generator = np.asarray(generator, dtype=np.complex128)
+        self._eigenvalues, self._eigenvectors = np.linalg.eigh(self.generator)
+        self._eigenvectorsDagger = np.conjugate(self._eigenvectors.T)
+        super().__init__(np.empty_like(self.generator))
+        self.bind(theta)
+
+    def bind(self, theta):
+        """
+        Sets the parameter to a new value, overwriting the matrix of the gate in place.
+
+        Parameters
+        ----------
+        theta -> float
+
+        Returns
+        -------
+        self, so that the gate can be applied straight away: gate.bind(0.3)(state)
+        """
+        self.theta = theta
+        self._cached_structure = None  # the matrix is overwritten in place
+        np.matmul(self._eigenvectors * np.exp(-1j * theta * self._eigenvalues), self._eigenvectorsDagger,
+                  out=self.matrix)
+        return self
+
+    def derivative(self):
+        """
+        Returns the derivative of the gate matrix with respect to the parameter, dU/dtheta = -i G U.
+        """
+        return -1j * np.matmul(self.generator, self.matrix)
+
+
+class SwapGate(QuantumGate):
+    """
+    Gate that swaps two qubits of a register of numQubits qubits.
+
+    Applied to a whole State it only changes the order in which the State stores its qubits (see State.swap), no
+    amplitude is moved. The other backends get a local 4 x 4 SWAP. The 2**n x 2**n matrix is only built if something
+    asks for it.
+
+    Parameters
+    ----------
+    numQubits: int
+    swap1, swap2: int
+        qubits to swap
+    """
+
+    def __init__(self, numQubits, swap1, swap2):
+        self.num_qubits = numQubits
+        self.qubits = (swap1, swap2)
+        self.shape = (2 ** numQubits, 2 ** numQubits)
+        self._matrix = None
+
+    @property
+    def matrix(self):
+        if self._matrix is None:
+            permutation = list(range(self.num_qubits))
+            (permutation[self.qubits[0]], permutation[self.qubits[1]]) = self.qubits[::-1]
+            columns = np.arange(2 ** self.num_qubits)
+            self._matrix = np.zeros(self.shape)
+            self._matrix[permute_bits(columns, permutation, self.num_qubits), columns] = 1
+        return self._matrix
+
+    def __call__(self, other, qubits=None):
+        """
+        Swaps the two qubits of a State or of one of the other backends, see QuantumGate.__call__.
+        """
+        if qubits is None:
+            if isinstance(other, State):
+                return other.swap(*self.qubits)
+            if not isinstance(other, (Qubit, QuantumGate)) and hasattr(other, 'apply'):
+                return other.apply(SWAP, list(self.qubits))
+        return super().__call__(other, qubits)
+
+
+def _answers(func, numQubits):
+    # Values f(0), ..., f(2**n - 1) of a boolean function given as a function or as an array
+    if callable(func):
+        func = [func(x) for x in range(2 ** numQubits)]
+    answers = np.asarray(func).astype(np.int64)
+    if answers.shape != (2 ** numQubits,) or np.any((answers != 0) & (answers != 1)):
+        raise Exception("A boolean function of {} bits needs {} values that are 0 or 1.".format(numQubits,
+                                                                                               2 ** numQubits))
+    return answers
+
+
+class PhaseOracle(QuantumGate):
+    """
+    Phase oracle of a boolean function f of n bits, |x> -> (-1)**f(x) |x>.
+
+    Applied to a State it flips the signs of the amplitudes in a single pass, without building the 2**n x 2**n matrix,
+    which is only built if something asks for it.
+
+    Parameters
+    ----------
+    answers: array of 2**n ints
+        the values f(0), ..., f(2**n - 1), 0 or 1
+    """
+
+    def __init__(self, answers):
+        self.answers = np.asarray(answers, dtype=np.int64)
+        self.num_qubits = len(self.answers).bit_length() - 1
+        self.signs = 1 - 2 * self.answers
+        self.shape = (len(self.answers), len(self.answers))
+        self._matrix = None
+
+    @property
+    def matrix(self):
+        if self._matrix is None:
+            self._matrix = np.diag(self.signs.astype(np.float64))
+        return self._matrix
+
+    def __call__(self, other, qubits=None):
+        """
+        Flips the signs of a State, see QuantumGate.__call__. qubits are the qubits holding x, by default the whole
+        register.
+        """
+        if isinstance(other, State):
+            qubits = range(other.num_qubits) if qubits is None else qubits
+            output = other._vector.astype(np.complex128)
+            kernels.apply_diagonal(output, self.signs, other._stored_qubits(qubits), other.num_qubits)
+            return State._from_vector(output, other.num_qubits, other._order)
+        return super().__call__(other, qubits)
+
+
+class XorOracle(QuantumGate):
+    """
+    Oracle of a boolean function f of n bits acting on n + 1 qubits, |x>|y> -> |x>|y XOR f(x)>, the last qubit being
+    the output qubit.
+
+    Applied to a State it swaps the amplitudes of y = 0 and y = 1 where f(x) = 1, without building the
+    2**(n+1) x 2**(n+1) matrix. When the output qubit is in the state |-> = (|0> - |1>) / sqrt(2), which is how
+    Deutsch-Jozsa and Grover use it, that swap is the phase kickback |x>|-> -> (-1)**f(x) |x>|->, and the oracle is
+    applied as the sign flips of the PhaseOracle of f instead. The result is the same either way. Better still, drop
+    the output qubit altogether and apply XorOracle.phase_oracle() to the n qubits of x, see to_phase_oracle.
+
+    Parameters
+    ----------
+    answers: array of 2**n ints
+        the values f(0), ..., f(2**n - 1), 0 or 1
+    """
+
+    def __init__(self, answers):
+        self.answers = np.asarray(answers, dtype=np.int64)
+        self.num_qubits = len(self.answers).bit_length()
+        self.shape = (2 * len(self.answers), 2 * len(self.answers))
+        self._matrix = None
+
+    @property
+    def matrix(self):
+        if self._matrix is None:
+            self._matrix = np.zeros(self.shape)
+            columns = np.arange(self.shape[0])
+            self._matrix[self.permutation(), columns] = 1
+        return self._matrix
+
+    def permutation(self):
+        """
+        Returns the image of every basis state |x>|y>, its index being 2x + y.
+        """
+        columns = np.arange(2 * len(self.answers))
+        return columns ^ self.answers[columns >> 1]
+
+    def phase_oracle(self):
+        """
+        Returns the PhaseOracle of the same function, acting on the n qubits of x.
+        """
+        return PhaseOracle(self.answers)
+
+    def __call__(self, other, qubits=None):
+        """
+        Applies the oracle to a State, see QuantumGate.__call__. The last of the qubits (by default the last qubit of
+        the register) is the output qubit.
+        """
+        if isinstance(other, State):
+            n = other.num_qubits
+            qubits = list(range(n)) if qubits is None else list(qubits)
+            if len(qubits) != self.num_qubits:
+                raise Exception("Oracle acts on {} qubits, not {}.".format(self.num_qubits, len(qubits)))
+            stored = other._stored_qubits(qubits)
+            tensor = np.moveaxis(np.reshape(other._vector, (2,) * n), stored[-1], -1)
+            # Up to rounding, e.g. for a |-> made by gates. Swapping a pair (a, b) and flipping its signs differ by
+            # |a + b|, so the two ways of applying the oracle agree to within that tolerance.
+            if np.allclose(tensor[..., 0], -tensor[..., 1], rtol=1e-10, atol=1e-14):
+                # Output qubit in |->, the oracle is a phase flip of x and leaves the output qubit alone
+                return self.phase_oracle()(other, qubits[:-1])
+            output = kernels.apply_permutation(other._vector.astype(np.complex128, copy=False), self.permutation(),
+                                               stored, n)
+            return State._from_vector(output, n, other._order)
+        return super().__call__(other, qubits)
+
+
 # ------------------------------Gate Construction-------------------------------
 
 def iGate(d):
@@ -310,11 +547,69 @@ def swapGate(numQubits, swap1, swap2):
 
     Returns
     -------
-    QuantumGate instance, apply to the whole system and the two qubits will be swapped.
+    SwapGate instance, apply to the whole system and the two qubits will be swapped.
     """
-    # TODO: finish this if needed
-    numEntries = 2 ** numQubits
-    return QuantumGate(SWAP)
+    return SwapGate(numQubits, swap1, swap2)
+
+
+def phaseOracle(func, numQubits):
+    """
+    Creates the phase oracle |x> -> (-1)**f(x) |x> of a boolean function.
+
+    Parameters
+    ----------
+    func -> function of an int returning 0 or 1, or the array of its 2**numQubits values
+    numQubits -> int, number of bits of the input of the function
+
+    Returns
+    -------
+    PhaseOracle instance
+    """
+    return PhaseOracle(_answers(func, numQubits))
+
+
+def xorOracle(func, numQubits):
+    """
+    Creates the oracle |x>|y> -> |x>|y XOR f(x)> of a boolean function, acting on numQubits + 1 qubits.
+
+    Parameters
+    ----------
+    func -> function of an int returning 0 or 1, or the array of its 2**numQubits values
+    numQubits -> int, number of bits of the input of the function
+
+    Returns
+    -------
+    XorOracle instance
+    """
+    return XorOracle(_answers(func, numQubits))
+
+
+def to_phase_oracle(oracle):
+    """
+    Compiles an oracle |x>|y> -> |x>|y XOR f(x)> into the phase oracle |x> -> (-1)**f(x) |x> it amounts to when the
+    output qubit y is in the state |-> (phase kickback). The phase oracle acts on the input qubits only, so the output
+    qubit can be left out of the register, which halves its size.
+
+    Parameters
+    ----------
+    oracle -> XorOracle, or a QuantumGate or numpy array of the form above with the output qubit last
+
+    Returns
+    -------
+    PhaseOracle instance
+    """
+    if isinstance(oracle, XorOracle):
+        return oracle.phase_oracle()
+    matrix = np.asarray(getattr(oracle, 'matrix', oracle))
+    permutation = kernels._permutation(matrix) if matrix.ndim == 2 and matrix.shape[0] == matrix.shape[1] else None
+    if permutation is None or len(matrix) < 2 or len(matrix) & (len(matrix) - 1):
+        raise Exception("Oracle is not a permutation of the basis states of a register.")
+    # Column |x>|0> has its 1 in the row |x>|f(x)>, and column |x>|1> in the row |x>|1 - f(x)>
+    columns = np.arange(len(matrix))
+    answers = (permutation[0::2] - columns[0::2])
+    if np.any((answers != 0) & (answers != 1)) or np.any(permutation[1::2] != columns[1::2] - answers):
+        raise Exception("Oracle is not of the form |x>|y> -> |x>|y XOR f(x)>.")
+    return PhaseOracle(answers)
 
 
 def QFT_operator(numQubits):
@@ -354,6 +649,81 @@ def inverse_QFT_operator(numQubits):
     return QuantumGate(np.conjugate(QFT.matrix.T))
 
 
+def rxGate(theta=0.0):
+    """
+    Creates a rotation gate around the X axis, RX(theta) = exp(-i theta X / 2).
+
+    Parameters
+    ----------
+    theta -> float
+
+    Returns
+    -------
+    ParameterizedGate
+    """
+    return ParameterizedGate(X / 2, theta)
+
+
+def ryGate(theta=0.0):
+    """
+    Creates a rotation gate around the Y axis, RY(theta) = exp(-i theta Y / 2).
+
+    Parameters
+    ----------
+    theta -> float
+
+    Returns
+    -------
+    ParameterizedGate
+    """
+    return ParameterizedGate(Y / 2, theta)
+
+
+def rzGate(theta=0.0):
+    """
+    Creates a rotation gate around the Z axis, RZ(theta) = exp(-i theta Z / 2).
+
+    Parameters
+    ----------
+    theta -> float
+
+    Returns
+    -------
+    ParameterizedGate
+    """
+    return ParameterizedGate(Z / 2, theta)
+
+
+def phaseGate(phi=0.0):
+    """
+    Creates a phase shift gate, diag(1, exp(i phi)). The S gate is phaseGate(pi / 2).
+
+    Parameters
+    ----------
+    phi -> float
+
+    Returns
+    -------
+    ParameterizedGate
+    """
+    return ParameterizedGate(-np.diag([0, 1]), phi)
+
+
+def cphaseGate(phi=0.0):
+    """
+    Creates a controlled phase shift gate, diag(1, 1, 1, exp(i phi)). The CZ gate is cphaseGate(pi).
+
+    Parameters
+    ----------
+    phi -> float
+
+    Returns
+    -------
+    ParameterizedGate
+    """
+    return ParameterizedGate(-np.diag([0, 0, 0, 1]), phi)
+
+
 def cxGate():
     """
     Creates a Controlled NOT gate object when called.
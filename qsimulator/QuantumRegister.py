@@ -7,12 +7,21 @@ This module contains the State class that is used to represent a state of a quan
 
 import numpy as np
 import random
-import qsimulator as qs
 from qsimulator.basic import kronecker_product, kronecker_product_power
+from qsimulator.bitops import to_bits
+from qsimulator import kernels
+
+_SWAP = np.array([[1, 0, 0, 0],
+                  [0, 0, 1, 0],
+                  [0, 1, 0, 0],
+                  [0, 0, 0, 1]])
 
 
 class State(object):
 
+    # States are created in huge numbers (every gate application makes a new one), __slots__ keeps them small
+    __slots__ = ('_vector', 'num_qubits', '_order', '_probabilities', '_cdf', '_norm')
+
     def __init__(self, stateArray):
         """
         Base class that represents the state of a quantum system. Input to the __init__ constructor is a numpy
@@ -25,12 +34,164 @@ class State(object):
         will only work with 2**n states, where n is the number of qubits. This whole system is designed
         in the same way.)
 
+        The probabilities, their cumulative sum and the norm are computed the first time they are needed and cached.
+        Assigning a new array to State.vector clears the cache, if the array is changed in place call
+        State.invalidate() afterwards.
+
+        The amplitudes are not necessarily stored in the usual qubit order. A State carries the order in which its
+        qubits are stored (State.qubit_order), so swapping or reordering qubits (State.swap, State.permute_qubits)
+        only changes that order and never moves the amplitudes, and gates are applied to the qubits wherever they are
+        stored. The amplitudes are transposed into the usual order, in a single pass, the first time State.vector is
+        read.
+
         Parameters
         ----------
         stateArray -> np.ndarray, represents the coefficients
         """
         self.vector = stateArray
-        self.num_qubits = int(np.log2(len(self.vector)))
+
+    @classmethod
+    def _from_vector(cls, stateArray, numQubits, order=None):
+        """
+        Cheap constructor for internal use when the number of qubits is already known, skips working it out again.
+        order is the qubit order of the amplitudes, None for the usual order.
+        """
+        state = cls.__new__(cls)
+        state._vector = stateArray
+        state.num_qubits = numQubits
+        state._order = None if order is None or list(order) == list(range(numQubits)) else tuple(order)
+        state._probabilities = None
+        state._cdf = None
+        state._norm = None
+        return state
+
+    @property
+    def vector(self):
+        if self._order is not None:
+            # Axis k of the stored tensor holds qubit order[k], bring every qubit back to its own axis in one copy
+            tensor = np.reshape(self._vector, (2,) * self.num_qubits)
+            self._vector = np.ascontiguousarray(np.transpose(tensor, np.argsort(self._order))).reshape(-1)
+            self._order = None
+        return self._vector
+
+    @vector.setter
+    def vector(self, stateArray):
+        self._vector = stateArray
+        self.num_qubits = len(stateArray).bit_length() - 1  # same as int(np.log2(len(stateArray)))
+        self._order = None
+        self.invalidate()
+
+    @property
+    def qubit_order(self):
+        """
+        The qubits in the order in which the amplitudes are stored, the qubit of the most significant bit of the
+        stored index first. [0, 1, ..., n-1] is the usual order.
+        """
+        return list(range(self.num_qubits)) if self._order is None else list(self._order)
+
+    def _stored_qubits(self, qubits):
+        # Axes of the stored tensor that hold the given qubits
+        if self._order is None:
+            return list(qubits)
+        return [self._order.index(q) for q in qubits]
+
+    def swap(self, qubit1, qubit2):
+        """
+        Swaps two qubits. Only the qubit order changes, the returned State shares the amplitude array.
+
+        Parameters
+        ----------
+        qubit1, qubit2 -> int
+
+        Returns
+        -------
+        State object
+        """
+        order = self.qubit_order
+        (i, j) = self._stored_qubits([qubit1, qubit2])
+        (order[i], order[j]) = (order[j], order[i])
+        return State._from_vector(self._vector, self.num_qubits, order)
+
+    def permute_qubits(self, permutation):
+        """
+        Reorders the qubits: qubit q becomes qubit permutation[q]. Only the qubit order changes, the returned State
+        shares the amplitude array.
+
+        Parameters
+        ----------
+        permutation -> sequence of num_qubits ints
+
+        Returns
+        -------
+        State object
+        """
+        if sorted(permutation) != list(range(self.num_qubits)):
+            raise Exception("{} is not a permutation of the qubits.".format(list(permutation)))
+        return State._from_vector(self._vector, self.num_qubits, [permutation[q] for q in self.qubit_order])
+
+    def apply(self, matrix, qubits):
+        """
+        Applies a gate to the chosen qubits, wherever they are stored. A 4 x 4 SWAP only changes the qubit order.
+
+        Parameters
+        ----------
+        matrix -> 2**k x 2**k numpy array
+        qubits -> sequence of k integers
+
+        Returns
+        -------
+        State object
+        """
+        qubits = list(qubits)
+        if len(qubits) == 2 and np.shape(matrix) == (4, 4) and np.array_equal(matrix, _SWAP):
+            return self.swap(*qubits)
+        output = kernels.apply_gate(self._vector, matrix, self._stored_qubits(qubits), self.num_qubits)
+        return State._from_vector(output, self.num_qubits, self._order)
+
+    def invalidate(self):
+        """
+        Clears the cached probabilities, cumulative probabilities and norm. Needed after State.vector was modified
+        in place.
+        """
+        self._probabilities = None
+        self._cdf = None
+        self._norm = None
+
+    def probabilities(self):
+        """
+        Returns the probabilities of measuring each of the basis states, |coefficient|**2.
+
+        Returns
+        -------
+        np.ndarray of floats
+        """
+        if self._probabilities is None:
+            self._probabilities = kernels.probabilities(np.asarray(self.vector))
+        return self._probabilities
+
+    def cdf(self):
+        """
+        Returns the cumulative sum of the probabilities, used to sample measurements by bisection.
+
+        Returns
+        -------
+        np.ndarray of floats
+        """
+        if self._cdf is None:
+            self._cdf = kernels.cdf(self.probabilities())
+        return self._cdf
+
+    def norm(self):
+        """
+        Returns the norm of the state, 1 for a normalised state.
+
+        Returns
+        -------
+        float
+        """
+        if self._norm is None:
+            self._norm = float(np.sqrt(self.cdf()[-1]))
+        return self._norm
 
     def __str__(self):
         """
@@ -55,10 +216,11 @@ class State(object):
         State object instance.
         """
         if isinstance(other, State):
-            newState = kronecker_product(self.vector, other.vector)
-            return State(newState)
+            newState = kronecker_product(self._vector, other._vector)
+            order = self.qubit_order + [q + self.num_qubits for q in other.qubit_order]
+            return State._from_vector(newState, self.num_qubits + other.num_qubits, order)
         elif isinstance(other, (int, float, np.complex128)):
-            return State(self.vector * other)
+            return State._from_vector(self._vector * other, self.num_qubits, self._order)
         else:
             raise Exception("Unsupported type of object.")
 
@@ -68,10 +230,9 @@ class State(object):
         See State.__mul__ for implementation.
         """
         if isinstance(other, State):
-            newState = kronecker_product(other.vector, self.vector)
-            return State(newState)
+            return other * self
         elif isinstance(other, (int, float, np.complex128)):
-            return State(self.vector * other)
+            return State._from_vector(self._vector * other, self.num_qubits, self._order)
         else:
             raise Exception("Unsupported type of object.")
 
@@ -97,7 +258,7 @@ class State(object):
         Returns the State object with division implemented element-wise.
         """
         if isinstance(other, (float, int, np.complex128)):
-            return State(self.vector / other)
+            return State._from_vector(self._vector / other, self.num_qubits, self._order)
         else:
             raise Exception("Unsupported type of object.")
 
@@ -110,61 +271,43 @@ class State(object):
         -------
         int
         """
-        P = 0
-        x = random.random()
-        i = -1
-
-        while P < x:
-            P += (abs(self.vector[i + 1])) ** 2
-            i += 1
+        # First basis state whose cumulative probability reaches the random number
+        cdf = self.cdf()
+        return int(min(np.searchsorted(cdf, random.random() * cdf[-1]), len(cdf) - 1))
 
-        return i
-
-    def collapse_qubits(self, numQubits):
+    def collapse_qubits(self, numQubits=None, qubits=None):
         """
         Measure the state for a given number of qubits. Measures the "rightmost" qubits. For example, if the register
         consists of 5 qubits and the parameter numQubits is assigned the number 3, 3 rightmost qubits are measured
-        and the state of the remaining 2 qubit system is returned as a State object.
+        and the state of the remaining 2 qubit system is returned as a State object. Any other qubits can be measured
+        by listing them instead.
 
         Parameters
         ----------
         numQubits -> int
+        qubits -> sequence of ints, optional, the qubits to measure instead of the rightmost numQubits
 
         Returns
         -------
-        State object
+        State object, the unmeasured qubits in the same order as before
         """
-        if numQubits > self.num_qubits:
-            raise Exception("Can't measure more qubits than there are qubits in the register.")
-        else:
-            P = 0
-            x = random.random()
-            i = -1
-
-            while P < x:
-                P += (abs(self.vector[i + 1])) ** 2
-                i += 1
-
-            ibin = str(qs.decimal_to_binary(i))  # binary representation of i
-
-            #  Manually add 0s to the left of the binary representation
-            if len(ibin) != self.num_qubits:
-                ibin = '0' * (self.num_qubits - len(ibin)) + ibin
-
-            measuredQubits = ibin[len(ibin)-numQubits:]
-            newState = []
-
-            for j in range(len(self.vector)):  # Find states which correspond to the measured state
-                binj = str(qs.decimal_to_binary(j))
-
-                if len(binj) != self.num_qubits:  # Manual addition of 0s again
-                    binj = '0' * (self.num_qubits - len(binj)) + binj
-
-                if binj[len(binj)-numQubits:] == measuredQubits:  # Save the new states
-                    newState.append(self.vector[j])
-
-            normalized = newState / np.linalg.norm(newState)
-            return State(normalized)
+        n = self.num_qubits
+        if qubits is None:
+            if numQubits is None:
+                raise Exception("Give either the number of rightmost qubits to measure or the list of qubits.")
+            if numQubits > n:
+                raise Exception("Can't measure more qubits than there are qubits in the register.")
+            qubits = range(n - numQubits, n)
+        bits = to_bits(self.measure(), n)
+
+        # Keep the coefficients of the states whose measured qubits agree with the measurement
+        index = [slice(None)] * n
+        for qubit in qubits:
+            index[qubit] = bits[qubit]
+        newState = np.reshape(self.vector, (2,) * n)[tuple(index)].reshape(-1)
+
+        normalized = newState / np.linalg.norm(newState)
+        return State(normalized)
 
 
 def ones(numQubits):
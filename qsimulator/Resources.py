@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+This module estimates the memory, floating point operations and time a planned sequence of operations needs before
+anything is allocated, and picks the cheapest way of running it that fits in a memory budget.
+
+A plan is a circuit, a list of (gate, qubits) pairs with qubits None meaning the whole register. The gates can be
+QuantumGates or numpy arrays, the oracles of QuantumGate (PhaseOracle, XorOracle, SwapGate, whose matrices are never
+built by the estimate), or Operations, which only describe a gate that hasn't been built yet (its size and kind), so
+that a plan can be checked before its big matrices exist.
+
+Two execution strategies are estimated:
+
+    - 'matrix': every operation is built as a 2**n x 2**n matrix and multiplied into the state vector, the way the
+      scripts of the project were written. Peak memory grows like 4**n.
+    - 'local': every operation is applied to the state vector with the kernels of qsimulator.kernels (State.apply),
+      only its own 2**k x 2**k matrix is built. Peak memory grows like 2**n.
+
+The time of an operation is estimated from its floating point operations and the bytes it moves, whichever takes
+longer at the rates FLOPS_PER_SECOND and BYTES_PER_SECOND (calibrate measures both on the current machine), plus
+OPERATION_OVERHEAD for the Python call. The estimates are meant to tell plans that can run from plans that can't and
+to rank the strategies, the measured times are typically within a small factor of them.
+"""
+
+import os
+import time
+import numpy as np
+from qsimulator import kernels
+from qsimulator.basic import apply_local_operator
+from qsimulator.QuantumGate import SWAP, QuantumGate, PhaseOracle, XorOracle, SwapGate
+from qsimulator.QuantumRegister import State
+
+FLOPS_PER_SECOND = 1e9
+BYTES_PER_SECOND = 4e9
+OPERATION_OVERHEAD = 2e-5  # seconds
+MEMORY_BUDGET = None  # bytes, None is 80 % of the memory available when the estimate is made
+
+STRATEGIES = ('matrix', 'local')
+KINDS = ('dense', 'diagonal', 'permutation', 'controlled', 'swap')
+_AMPLITUDE = 16  # bytes of a complex128
+_OPERATION_BYTES = 192  # Python objects made for every operation of a plan while it is estimated and run
+
+
+class ResourceError(Exception):
+    """
+    Raised when no execution strategy of a plan fits in the memory budget. The report with every estimate is
+    ResourceError.report.
+    """
+
+    def __init__(self, report):
+        super().__init__("No execution strategy fits in the memory budget.\n" + str(report))
+        self.report = report
+
+
+class Operation(object):
+    """
+    Description of a gate or oracle that hasn't been built, for estimating a plan before allocating anything.
+
+    Parameters
+    ----------
+    numQubits: int
+        number of qubits the operation acts on
+    kind: str
+        'dense' for a general matrix, 'diagonal' (phase oracles, Z, CZ, phase gates), 'permutation' (XOR oracles,
+        modular arithmetic, X, CX, Toffoli), 'controlled' (a 1 qubit gate controlled by the other qubits) or 'swap'
+    name: str, optional
+        shown in the report
+    matrices: int
+        number of 2**k x 2**k matrices alive at once while the operation is built and applied as a matrix, e.g. an
+        operation built as the product of two matrices keeps 3 of them
+    itemsize: int
+        bytes of an entry of those matrices, 16 for complex128 and 8 for float64
+    """
+
+    def __init__(self, numQubits, kind='dense', name=None, matrices=1, itemsize=16):
+        if kind not in KINDS:
+            raise Exception("Unknown kind of operation {}, use one of {}.".format(kind, ', '.join(KINDS)))
+        self.num_qubits = numQubits
+        self.kind = kind
+        self.name = name or kind
+        self.matrices = matrices
+        self.itemsize = itemsize
+
+    def __repr__(self):
+        return "Operation({}, '{}', '{}')".format(self.num_qubits, self.kind, self.name)
+
+
+class Estimate(object):
+    """
+    Predicted cost of running a plan with one strategy.
+
+    Attributes
+    ----------
+    strategy: str
+    peak_memory: int, bytes
+    flops: float, floating point operations
+    bytes: float, bytes read and written
+    runtime: float, seconds
+    fits: bool, whether peak_memory is within the memory budget
+    """
+
+    def __init__(self, strategy, peakMemory, flops, numBytes, runtime, fits):
+        self.strategy = strategy
+        self.peak_memory = peakMemory
+        self.flops = flops
+        self.bytes = numBytes
+        self.runtime = runtime
+        self.fits = fits
+
+    def __str__(self):
+        return "{:<8} peak memory {:>10}  {:.3g} flops  {:>10} moved  ~{}{}".format(
+            self.strategy, _format_bytes(self.peak_memory), self.flops, _format_bytes(self.bytes),
+            _format_time(self.runtime), "" if self.fits else "  (over budget)")
+
+
+class ResourceReport(object):
+    """
+    Estimates of every strategy for a plan, and the chosen strategy: the fastest one that fits in the memory budget,
+    None if none fits.
+    """
+
+    def __init__(self, numQubits, numOperations, budget, estimates):
+        self.num_qubits = numQubits
+        self.num_operations = numOperations
+        self.budget = budget
+        self.estimates = estimates
+        fitting = [estimate for estimate in estimates.values() if estimate.fits]
+        self.chosen = min(fitting, key=lambda estimate: estimate.runtime).strategy if fitting else None
+
+    def __getitem__(self, strategy):
+        return self.estimates[strategy]
+
+    def __str__(self):
+        lines = ["{} operations on {} qubits, memory budget {}".format(self.num_operations, self.num_qubits,
+                                                                       _format_bytes(self.budget))]
+        lines += ["    " + str(estimate) for estimate in self.estimates.values()]
+        lines.append("chosen: {}".format(self.chosen))
+        return '\n'.join(lines)
+
+
+def _format_bytes(numBytes):
+    for unit in ('B', 'kB', 'MB', 'GB', 'TB'):
+        if numBytes < 1024 or unit == 'TB':
+            return "{:.3g} {}".format(numBytes, unit)
+        numBytes /= 1024
+
+
+def _format_time(seconds):
+    if seconds < 1:
+        return "{:.3g} ms".format(seconds * 1e3)
+    if seconds < 3600:
+        return "{:.3g} s".format(seconds)
+    return "{:.3g} h".format(seconds / 3600)
+
+
+def available_memory():
+    """
+    Returns the memory available to new allocations in bytes, from /proc/meminfo or the number of free pages.
+    """
+    try:
+        with open('/proc/meminfo') as meminfo:
+            for line in meminfo:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_AVPHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        return 4 * 1024 ** 3
+
+
+def _classify(gate):
+    # (kind, number of qubits, number of controls, bytes of the gate itself, bytes of its matrices when it is built
+    # as a matrix) without building lazy matrices
+    if isinstance(gate, Operation):
+        k = gate.num_qubits
+        return gate.kind, k, k - 1 if gate.kind == 'controlled' else 0, 0, gate.matrices * gate.itemsize * 4 ** k
+    if isinstance(gate, SwapGate):
+        return 'swap', 2, 0, 0, 0
+    if isinstance(gate, PhaseOracle):
+        # The matrices of the oracles are float64
+        return 'diagonal', gate.num_qubits, 0, gate.answers.nbytes + gate.signs.nbytes, 8 * 4 ** gate.num_qubits
+    if isinstance(gate, XorOracle):
+        return 'permutation', gate.num_qubits, 0, gate.answers.nbytes, 8 * 4 ** gate.num_qubits
+    matrix = np.asarray(getattr(gate, 'matrix', gate))
+    k = len(matrix).bit_length() - 1
+    if k == 2 and np.array_equal(matrix, SWAP):
+        return 'swap', k, 0, matrix.nbytes, matrix.nbytes
+    if kernels._is_diagonal(matrix):
+        return 'diagonal', k, 0, matrix.nbytes, matrix.nbytes
+    if kernels._is_controlled(matrix):
+        return 'controlled', k, k - 1, matrix.nbytes, matrix.nbytes
+    if kernels._permutation(matrix) is not None:
+        return 'permutation', k, 0, matrix.nbytes, matrix.nbytes
+    return 'dense', k, 0, matrix.nbytes, matrix.nbytes
+
+
+def _local_cost(kind, k, controls, numQubits):
+    # (flops, bytes moved, extra memory) of applying an operation to a state vector with the kernels
+    size = 2 ** numQubits
+    if kind == 'swap':
+        return 0.0, 0.0, 0
+    if kind == 'diagonal':
+        return 6.0 * size, 2.0 * _AMPLITUDE * size, _AMPLITUDE * 2 ** k
+    if kind == 'permutation':
+        return 0.0, 2.0 * _AMPLITUDE * size, 8 * 2 ** k
+    if kind == 'controlled':
+        return 14.0 * size / 2 ** controls, 2.0 * _AMPLITUDE * size / 2 ** controls, 0
+    # A dense k qubit gate is a 2**k x 2**k matrix product with every group of amplitudes it mixes
+    return 8.0 * 2 ** k * size, 2.0 * _AMPLITUDE * size, _AMPLITUDE * 4 ** k
+
+
+def _time(flops, numBytes, numOperations):
+    return max(flops / FLOPS_PER_SECOND, numBytes / BYTES_PER_SECOND) + numOperations * OPERATION_OVERHEAD
+
+
+def _resident(operations):
+    # The gates of a plan are alive for the whole run, a gate repeated in the plan counts once
+    gates = dict((key, gateBytes) for (_, _, _, gateBytes, _, key) in operations)
+    return sum(gates.values()) + _OPERATION_BYTES * len(operations)
+
+
+def _estimate_local(operations, numQubits, budget):
+    # The state given to run_plan, the current state and the output of an operation are alive at once, next to the
+    # gates of the plan
+    state = _AMPLITUDE * 2 ** numQubits
+    resident = 3 * state + _resident(operations)
+    (flops, numBytes, runtime, peak) = (0.0, 0.0, 0.0, resident)
+    for kind, k, controls, _, _, _ in operations:
+        (f, b, extra) = _local_cost(kind, k, controls, numQubits)
+        flops += f
+        numBytes += b
+        runtime += _time(f, b, 1)
+        peak = max(peak, resident + extra)
+    return Estimate('local', peak, flops, numBytes, runtime, peak <= budget)
+
+
+def _estimate_matrix(operations, numQubits, budget):
+    size = 2 ** numQubits
+    (state, matrix) = (_AMPLITUDE * size, _AMPLITUDE * size ** 2)
+    resident = 3 * state + _resident(operations)
+    (flops, numBytes, runtime, peak) = (0.0, 0.0, 0.0, resident)
+    cached = set()  # gates whose whole register matrix was built lazily and stays with the gate
+    for kind, k, controls, gateBytes, matrixBytes, key in operations:
+        if kind == 'swap' and k < numQubits:
+            # Swaps only change the qubit order of a State, their matrix is never built
+            runtime += OPERATION_OVERHEAD
+            continue
+        (f, b) = (8.0 * size ** 2, float(matrix))  # the matrix-vector product
+        if k < numQubits:
+            # The whole register matrix is built by applying the gate to every column of the identity
+            (buildFlops, buildBytes, _) = _local_cost(kind, k, controls, numQubits)
+            (f, b) = (f + size * buildFlops, b + 2.0 * matrix)
+            memory = 2 * matrix
+        elif gateBytes >= matrixBytes:
+            # A gate on the whole register that is its own matrix, already counted with the plan
+            memory = 0
+        else:
+            # An Operation still has to be built, and the oracles build their matrix once and keep it
+            b += float(matrixBytes)
+            if key not in cached:
+                resident += matrixBytes if gateBytes else 0
+                cached.add(key)
+            memory = 0 if gateBytes else matrixBytes
+        flops += f
+        numBytes += b
+        runtime += _time(f, b, 1)
+        peak = max(peak, resident + memory)
+    return Estimate('matrix', peak, flops, numBytes, runtime, peak <= budget)
+
+
+_ESTIMATORS = {'matrix': _estimate_matrix, 'local': _estimate_local}
+
+
+def _operations(plan, numQubits):
+    operations = []
+    for gate, qubits in plan:
+        (kind, k, controls, gateBytes, matrixBytes) = _classify(gate)
+        if qubits is not None and len(qubits) != k:
+            raise Exception("Operation on {} qubits applied to the qubits {}.".format(k, list(qubits)))
+        if k > numQubits:
+            raise Exception("Operation on {} qubits doesn't fit in a register of {}.".format(k, numQubits))
+        operations.append((kind, k, controls, gateBytes, matrixBytes, id(gate)))
+    return operations
+
+
+def estimate_resources(plan, numQubits, memoryBudget=None, strategies=STRATEGIES):
+    """
+    Estimates the peak memory, floating point operations and runtime of a plan for every execution strategy, and
+    picks the fastest strategy that fits in the memory budget. Nothing of the size of the register is allocated.
+
+    Parameters
+    ----------
+    plan -> list of (gate, qubits) pairs, the gates being QuantumGates, numpy arrays or Operations
+    numQubits -> int
+    memoryBudget -> int, bytes, by default MEMORY_BUDGET
+    strategies -> sequence of str, the strategies to estimate, see STRATEGIES
+
+    Returns
+    -------
+    ResourceReport object, ResourceReport.chosen is None if no strategy fits
+    """
+    if memoryBudget is None:
+        memoryBudget = MEMORY_BUDGET if MEMORY_BUDGET is not None else int(0.8 * available_memory())
+    operations = _operations(plan, numQubits)
+    estimates = {}
+    for strategy in strategies:
+        if strategy not in _ESTIMATORS:
+            raise Exception("Unknown strategy {}, use one of {}.".format(strategy, ', '.join(STRATEGIES)))
+        estimates[strategy] = _ESTIMATORS[strategy](operations, numQubits, memoryBudget)
+    return ResourceReport(numQubits, len(operations), memoryBudget, estimates)
+
+
+def select_backend(plan, numQubits, memoryBudget=None, strategies=STRATEGIES):
+    """
+    Picks the fastest strategy for a plan that fits in the memory budget, or fails before anything is allocated.
+
+    Parameters
+    ----------
+    plan -> list of (gate, qubits) pairs
+    numQubits -> int
+    memoryBudget -> int, bytes, by default MEMORY_BUDGET
+    strategies -> sequence of str, the strategies to choose from
+
+    Returns
+    -------
+    ResourceReport object
+
+    Raises
+    ------
+    ResourceError if no strategy fits, its message is the report with every estimate
+    """
+    report = estimate_resources(plan, numQubits, memoryBudget, strategies)
+    if report.chosen is None:
+        raise ResourceError(report)
+    return report
+
+
+def run_plan(state, plan, memoryBudget=None, strategies=STRATEGIES):
+    """
+    Runs a plan on a State with the strategy chosen by select_backend. All the gates of the plan have to be built,
+    Operations can't be run.
+
+    Parameters
+    ----------
+    state -> State object
+    plan -> list of (gate, qubits) pairs, the gates being QuantumGates or numpy arrays
+    memoryBudget -> int, bytes, by default MEMORY_BUDGET
+    strategies -> sequence of str, the strategies to choose from
+
+    Returns
+    -------
+    (State, ResourceReport)
+    """
+    n = state.num_qubits
+    for gate, _ in plan:
+        if isinstance(gate, Operation):
+            raise Exception("{} hasn't been built and can't be run.".format(gate))
+    report = select_backend(plan, n, memoryBudget, strategies)
+    for (gate, qubits), (kind, k, _, _, _, _) in zip(plan, _operations(plan, n)):
+        # Swaps of a few qubits only change the qubit order of the State, whatever the strategy
+        if report.chosen == 'local' or (kind == 'swap' and k < n):
+            if isinstance(gate, QuantumGate):
+                state = gate(state, qubits)
+            else:
+                state = state.apply(gate, range(n) if qubits is None else qubits)
+            continue
+        matrix = np.asarray(getattr(gate, 'matrix', gate))
+        if qubits is not None and len(qubits) < n:
+            identity = np.identity(2 ** n, dtype=np.complex128).reshape((2,) * n + (2 ** n,))
+            matrix = apply_local_operator(matrix, identity, qubits).reshape(2 ** n, 2 ** n)
+        state = State._from_vector(np.matmul(matrix, state.vector), n)
+    return state, report
+
+
+def calibrate(size=1 << 22, repeats=3):
+    """
+    Measures the floating point and memory throughput of the current machine and stores them in FLOPS_PER_SECOND
+    and BYTES_PER_SECOND.
+
+    Parameters
+    ----------
+    size -> int, number of complex amplitudes of the arrays used for the measurements
+    repeats -> int, the best of this many runs is kept
+
+    Returns
+    -------
+    (float, float) -> floating point operations per second, bytes per second
+    """
+    global FLOPS_PER_SECOND, BYTES_PER_SECOND
+    vector = np.ones(size, dtype=np.complex128)
+    (flopTimes, copyTimes) = ([], [])
+    matrix = np.ones((4, 4), dtype=np.complex128)
+    for _ in range(repeats):
+        time1 = time.perf_counter()
+        np.matmul(matrix, vector.reshape(4, -1))
+        time2 = time.perf_counter()
+        np.copyto(np.empty_like(vector), vector)
+        time3 = time.perf_counter()
+        (flopTimes, copyTimes) = (flopTimes + [time2 - time1], copyTimes + [time3 - time2])
+    FLOPS_PER_SECOND = 8.0 * 4 * size / min(flopTimes)
+    BYTES_PER_SECOND = 2.0 * _AMPLITUDE * size / min(copyTimes)
+    return FLOPS_PER_SECOND, BYTES_PER_SECOND
+
+
+if __name__ == "__main__":
+    from qsimulator.QuantumGate import hGate, cxGate, phaseOracle
+    from qsimulator.QuantumRegister import zeros
+
+    print(calibrate())
+
+    # Grover's algorithm on 16 qubits with a dense Grover operator, as 201 oracle-reflection products
+    n = 16
+    grover = [(Operation(n, 'dense', 'grover iteration'), None)] * int(np.pi / 4 * np.sqrt(2 ** n))
+    try:
+        select_backend(grover, n, strategies=['matrix'])
+    except ResourceError as error:
+        print(error)
+
+    # The same with a phase oracle and Hadamard gates on every qubit
+    layer = [(hGate(), [q]) for q in range(n)]
+    plan = [(Operation(n, 'diagonal', 'oracle'), None)] + layer + [(Operation(n, 'diagonal', 'reflection'), None)] \
+        + layer
+    print(select_backend(plan * int(np.pi / 4 * np.sqrt(2 ** n)), n))
+
+    # Small plans are run with the strategy that is chosen
+    n = 8
+    plan = [(hGate(), [0])] + [(cxGate(), [q, q + 1]) for q in range(n - 1)] + [(phaseOracle(lambda x: x & 1, n), None)]
+    (state, report) = run_plan(zeros(n), plan)
+    print(report)
+    print(state.vector[[0, -1]])
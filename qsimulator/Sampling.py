@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+This module samples measurements of a State until a decision can be made at a chosen confidence, instead of a fixed
+number of shots.
+
+Shots are drawn in batches, all the shots of a batch with a single vectorized bisection of the cumulative
+probabilities, and added to a running histogram. After every batch a stopping rule looks at the histogram and either
+asks for more shots or returns a value (the decision or the estimate) together with its estimated error. Batches double
+in size, so the number of checks only grows with the logarithm of the number of shots.
+
+A stopping rule is a function rule(counts, shots, check) of the histogram (np.ndarray, counts[y] is the number of
+times outcome y was measured), the number of shots and the number of the check (1 for the first batch, 2 for the
+second, ...), returning None to keep sampling or the pair (value, error). Two rules are provided:
+
+    - most_likely(confidence): the most likely outcome, e.g. the marked item of Grover's algorithm or the all zero
+      outcome of a constant function in the Deutsch-Jozsa algorithm,
+    - estimate_probability(outcomes, tolerance, confidence): the probability of some outcomes, to within tolerance.
+
+Both are checked after every batch, so their error probability 1 - confidence is shared out between the checks,
+check k getting 6 / (pi**2 k**2) of it. The error probability of the whole run is then at most 1 - confidence no
+matter when it stops.
+"""
+
+import math
+import statistics
+import numpy as np
+from qsimulator.bitops import extract_field
+
+DEFAULT_BATCH = 16
+MAX_BATCH = 1 << 16
+MAX_SHOTS = 1 << 20
+
+
+class SamplingResult(object):
+    """
+    Outcome of adaptive_sample.
+
+    Attributes
+    ----------
+    counts: np.ndarray of ints, the histogram of the outcomes
+    shots: int, number of shots that were taken
+    value: what the stopping rule returned, None if it never stopped
+    error: float, the estimated error of the value returned by the rule, None if it never stopped
+    converged: bool, False if maxShots was reached before the rule stopped
+    batches: int, number of batches
+    """
+
+    def __init__(self, counts, shots, value, error, converged, batches):
+        self.counts = counts
+        self.shots = shots
+        self.value = value
+        self.error = error
+        self.converged = converged
+        self.batches = batches
+
+    def __str__(self):
+        if not self.converged:
+            return "No decision after {} shots in {} batches.".format(self.shots, self.batches)
+        return "{} with estimated error {:.3g} after {} shots in {} batches.".format(self.value, self.error,
+                                                                                   self.shots, self.batches)
+
+
+def _cdf(state):
+    return state.cdf() if hasattr(state, 'cdf') else np.cumsum(state.probabilities())
+
+
+def sample(state, numShots, qubits=None, seed=None):
+    """
+    Measures a state many times at once. Like State.measure it doesn't collapse the state.
+
+    Parameters
+    ----------
+    state -> State or DensityMatrix object
+    numShots -> int
+    qubits -> sequence of ints, optional, only these qubits are measured, the first one giving the most significant
+        bit of the outcome. By default the whole register.
+    seed -> int or np.random.Generator, optional, makes the measurements reproducible
+
+    Returns
+    -------
+    np.ndarray of numShots ints
+    """
+    rng = np.random.default_rng(seed)
+    return _sample(_cdf(state), state.num_qubits, numShots, qubits, rng)
+
+
+def _sample(cdf, numQubits, numShots, qubits, rng):
+    # First basis state whose cumulative probability reaches each of the random numbers, as in State.measure
+    outcomes = np.minimum(np.searchsorted(cdf, rng.random(numShots) * cdf[-1]), len(cdf) - 1)
+    if qubits is not None:
+        outcomes = extract_field(outcomes, list(qubits), numQubits)
+    return outcomes
+
+
+def _check_error(confidence, check):
+    # Error probability allowed at check k, these add up to 1 - confidence over all the checks
+    return (1 - confidence) * 6 / (math.pi ** 2 * check ** 2)
+
+
+def _kl_bound(wins, losses):
+    # Chernoff bound on the probability that an outcome wins at least wins out of wins + losses draws against an
+    # outcome that is at least as likely, exp(-m KL(wins / m || 1/2))
+    m = wins + losses
+    q = wins / m
+    kl = q * np.log(2 * q) + np.where(losses > 0, (1 - q) * np.log(2 * np.maximum(1 - q, 1e-300)), 0)
+    return np.exp(-m * kl)
+
+
+def most_likely(confidence=0.99):
+    """
+    Stopping rule for the most likely outcome. It stops when the outcome measured most often is, with the chosen
+    confidence, more likely than every other outcome. The outcomes that were never measured are compared together,
+    as one outcome holding all their probability.
+
+    Parameters
+    ----------
+    confidence -> float, probability that the returned outcome is the most likely one
+
+    Returns
+    -------
+    function rule(counts, shots, check) -> None or (int, float), the outcome and the probability that it is not the
+        most likely one
+    """
+    def rule(counts, shots, check):
+        leader = int(np.argmax(counts))
+        wins = counts[leader]
+        others = np.delete(counts, leader)
+        losses = others[others > 0]
+        if len(losses) < len(others):
+            losses = np.append(losses, 0)
+        if wins == 0 or np.any(losses >= wins):
+            return None
+        # Union bound over the alternatives, each one tested on the shots that went to it or to the leader
+        error = float(np.sum(_kl_bound(wins, losses.astype(np.float64))))
+        if error > _check_error(confidence, check):
+            return None
+        return leader, error
+    return rule
+
+
+def estimate_probability(outcomes, tolerance=0.01, confidence=0.99):
+    """
+    Stopping rule for the probability of measuring some outcomes. It stops when the Wilson score interval of the
+    probability is at most tolerance wide on each side, which takes far fewer shots when the probability is close to
+    0 or 1.
+
+    Parameters
+    ----------
+    outcomes -> int, sequence of ints, or a function of the np.ndarray of all the outcomes returning a boolean array
+    tolerance -> float, half width of the confidence interval
+    confidence -> float, probability that the probability lies within the interval
+
+    Returns
+    -------
+    function rule(counts, shots, check) -> None or (float, float), the estimated probability and the half width of
+        its confidence interval
+    """
+    def rule(counts, shots, check):
+        if callable(outcomes):
+            hits = counts[outcomes(np.arange(len(counts)))].sum()
+        else:
+            hits = counts[np.atleast_1d(outcomes)].sum()
+        z = statistics.NormalDist().inv_cdf(1 - _check_error(confidence, check) / 2)
+        p = hits / shots
+        halfWidth = z / (1 + z ** 2 / shots) * math.sqrt(p * (1 - p) / shots + z ** 2 / (4 * shots ** 2))
+        if halfWidth > tolerance:
+            return None
+        return float(p), halfWidth
+    return rule
+
+
+def adaptive_sample(state, rule, qubits=None, batchSize=DEFAULT_BATCH, maxShots=MAX_SHOTS, seed=None):
+    """
+    Measures a state in batches of shots until the stopping rule is satisfied.
+
+    Parameters
+    ----------
+    state -> State or DensityMatrix object
+    rule -> function rule(counts, shots, check) returning None or (value, error), e.g. most_likely(0.99)
+    qubits -> sequence of ints, optional, only these qubits are measured, the first one giving the most significant
+        bit of the outcome. By default the whole register.
+    batchSize -> int, number of shots in the first batch, every following batch is twice as big up to MAX_BATCH
+    maxShots -> int, sampling gives up after this many shots
+    seed -> int or np.random.Generator, optional, makes the measurements reproducible
+
+    Returns
+    -------
+    SamplingResult object
+    """
+    rng = np.random.default_rng(seed)
+    cdf = _cdf(state)
+    n = state.num_qubits
+    counts = np.zeros(2 ** (n if qubits is None else len(qubits)), dtype=np.int64)
+
+    (shots, check) = (0, 0)
+    while shots < maxShots:
+        size = min(batchSize << min(check, 30), MAX_BATCH, maxShots - shots)
+        counts += np.bincount(_sample(cdf, n, size, qubits, rng), minlength=len(counts))
+        shots += size
+        check += 1
+        result = rule(counts, shots, check)
+        if result is not None:
+            return SamplingResult(counts, shots, result[0], result[1], True, check)
+    return SamplingResult(counts, shots, None, None, False, check)
+
+
+if __name__ == "__main__":
+    from qsimulator.QuantumRegister import State
+
+    # Grover's algorithm on 6 qubits after the optimal 6 iterations, the marked item 42 has probability 0.9966
+    (n, marked) = (6, 42)
+    vector = np.full(2 ** n, 1 / np.sqrt(2 ** n))
+    for _ in range(6):
+        vector[marked] *= -1
+        vector = 2 * np.mean(vector) - vector
+    state = State(vector)
+    print(adaptive_sample(state, most_likely(0.999), seed=1))
+
+    # The probability of the marked item, and of an outcome of the first 3 qubits
+    print(adaptive_sample(state, estimate_probability(marked, tolerance=0.01), seed=2))
+    print(adaptive_sample(state, estimate_probability(5, tolerance=0.05), qubits=[0, 1, 2], seed=3))
+
+    # A user defined rule: stop as soon as an outcome other than the marked one shows up
+    def rule(counts, shots, check):
+        others = np.flatnonzero(counts)
+        others = others[others != marked]
+        return (int(others[0]), 0.0) if len(others) else None
+    print(adaptive_sample(state, rule, seed=4))
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+This module saves and loads States, QuantumGates, DensityMatrices and SparseStates in a compact binary format that is
+also used to checkpoint long simulations.
+
+File layout
+-----------
+    b'QSIM'                    magic number
+    uint16 little-endian       format version
+    uint32 little-endian       length of the header
+    header                     UTF-8 JSON: kind, num_qubits, dtype, shape, qubit_order, compression, metadata, ...
+    padding                    zero bytes up to a multiple of 64, so that the data is aligned
+    data                       raw little-endian array data (C order)
+
+The qubit order is the list of qubits in the order of the bits of the index, most significant bit first, which is
+[0, 1, ..., n-1] for the usual ordering where qubit 0 is the leftmost qubit. A State whose qubits were swapped or
+reordered is saved as it is stored (see State.qubit_order) and loaded back with the same qubit order.
+
+Uncompressed data can be memory mapped, loading a State then costs nothing until the amplitudes are read. With
+compression='zlib' the data is split into chunks which are compressed separately and stored as a uint64 byte count
+followed by the compressed bytes, which pays off for vectors with long runs of zeros.
+"""
+
+import json
+import os
+import struct
+import zlib
+import numpy as np
+from qsimulator.QuantumRegister import State
+from qsimulator.QuantumGate import QuantumGate
+from qsimulator.DensityMatrix import DensityMatrix
+from qsimulator.SparseState import SparseState
+
+MAGIC = b'QSIM'
+VERSION = 1
+ALIGNMENT = 64
+CHUNK_SIZE = 2 ** 20  # number of array elements per compressed chunk
+
+
+def _write_header(file, header):
+    encoded = json.dumps(header).encode('utf-8')
+    file.write(MAGIC + struct.pack('<HI', VERSION, len(encoded)) + encoded)
+    file.write(b'\0' * (-file.tell() % ALIGNMENT))
+
+
+def _read_header(file):
+    if file.read(4) != MAGIC:
+        raise Exception("Not a qsimulator file.")
+    (version, length) = struct.unpack('<HI', file.read(6))
+    if version > VERSION:
+        raise Exception("File format version {} is newer than the supported version {}.".format(version, VERSION))
+    header = json.loads(file.read(length).decode('utf-8'))
+    header['data_offset'] = 10 + length + (-(10 + length) % ALIGNMENT)
+    return header
+
+
+def _as_descr(descr):
+    # JSON turns the tuples of a structured dtype description into lists
+    if isinstance(descr, list):
+        return [tuple(field) for field in descr]
+    return descr
+
+
+def _little_endian(array):
+    array = np.ascontiguousarray(array)
+    return array.astype(array.dtype.newbyteorder('<'), copy=False)
+
+
+class StreamWriter(object):
+    """
+    Writes an array to a file piece by piece, so that a state that is computed in parts never has to be held in
+    memory at once. Used as a context manager:
+
+        with StreamWriter('state.qsim', 'State', (2 ** n,)) as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+
+    The file is written under a temporary name and only moved into place once all the data was written, so a job
+    that gets killed half way never leaves a broken checkpoint behind.
+
+    Parameters
+    ----------
+    path: str
+    kind: str
+        'State', 'QuantumGate', 'DensityMatrix' or 'SparseState'
+    shape: tuple of ints
+        shape of the whole array
+    dtype: numpy dtype, default complex128
+    compression: None or 'zlib'
+    metadata: dict, optional
+        anything JSON serialisable, e.g. the index of the next gate of the circuit
+    numQubits: int, optional
+        by default worked out from the first dimension of the shape
+    qubitOrder: list of ints, optional
+        order of the qubits in the data, by default the usual order
+    """
+
+    def __init__(self, path, kind, shape, dtype=np.complex128, compression=None, metadata=None, numQubits=None,
+                 qubitOrder=None):
+        if compression not in (None, 'zlib'):
+            raise Exception("Unknown compression {}.".format(compression))
+        self.path = path
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype).newbyteorder('<')
+        self.compression = compression
+        self.remaining = int(np.prod(self.shape))
+
+        if numQubits is None:
+            numQubits = int(np.log2(self.shape[0]))
+        if qubitOrder is None:
+            qubitOrder = range(numQubits)
+        self.header = {'kind': kind, 'num_qubits': numQubits, 'dtype': np.lib.format.dtype_to_descr(self.dtype),
+                       'shape': list(self.shape), 'qubit_order': list(qubitOrder),
+                       'compression': compression, 'chunk_size': CHUNK_SIZE, 'metadata': metadata or {}}
+        self._temporaryPath = path + '.tmp'
+        self._file = open(self._temporaryPath, 'wb')
+        _write_header(self._file, self.header)
+
+    def write(self, data):
+        """
+        Appends the next part of the array (in C order).
+        """
+        data = np.asarray(data, dtype=self.dtype).reshape(-1)
+        if len(data) > self.remaining:
+            raise Exception("More data written than the shape allows.")
+        self.remaining -= len(data)
+
+        if self.compression is None:
+            self._file.write(data.tobytes())
+        else:
+            for i in range(0, len(data), CHUNK_SIZE):
+                compressed = zlib.compress(data[i:i + CHUNK_SIZE].tobytes())
+                self._file.write(struct.pack('<Q', len(compressed)) + compressed)
+
+    def close(self):
+        self._file.close()
+        if self.remaining != 0:
+            os.remove(self._temporaryPath)
+            raise Exception("{} elements were never written.".format(self.remaining))
+        os.replace(self._temporaryPath, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        if excType is None:
+            self.close()
+        else:
+            self._file.close()
+            os.remove(self._temporaryPath)
+
+
+def save(obj, path, compression=None, metadata=None):
+    """
+    Saves a State, QuantumGate, DensityMatrix or SparseState to a file.
+
+    Parameters
+    ----------
+    obj -> State, QuantumGate, DensityMatrix or SparseState
+    path -> str
+    compression -> None or 'zlib'
+    metadata -> dict, optional, stored in the header
+    """
+    if isinstance(obj, SparseState):
+        # Indices and amplitudes are stored side by side in a structured array
+        array = np.zeros(len(obj.indices), dtype=[('index', '<i8'), ('amplitude', '<c16')])
+        array['index'] = obj.indices
+        array['amplitude'] = obj.amplitudes
+        with StreamWriter(path, 'SparseState', array.shape, array.dtype, compression, metadata,
+                          obj.num_qubits) as writer:
+            writer.write(array)
+        return
+
+    qubitOrder = None
+    if isinstance(obj, State):
+        # Stored as it is, in whatever qubit order the State keeps it, the order goes in the header
+        (kind, array, qubitOrder) = ('State', obj._vector, obj.qubit_order)
+    elif isinstance(obj, QuantumGate):
+        (kind, array) = ('QuantumGate', obj.matrix)
+    elif isinstance(obj, DensityMatrix):
+        (kind, array) = ('DensityMatrix', obj.matrix)
+    else:
+        raise Exception("Unsupported type of object.")
+
+    array = _little_endian(array)
+    if not np.iscomplexobj(array):
+        array = array.astype('<c16')
+    with StreamWriter(path, kind, array.shape, array.dtype, compression, metadata, qubitOrder=qubitOrder) as writer:
+        writer.write(array)
+
+
+def read_header(path):
+    """
+    Reads only the header of a file.
+
+    Parameters
+    ----------
+    path -> str
+
+    Returns
+    -------
+    dict
+    """
+    with open(path, 'rb') as file:
+        return _read_header(file)
+
+
+def load(path, mmap=True):
+    """
+    Loads an object saved with save (or written with StreamWriter).
+
+    Parameters
+    ----------
+    path -> str
+    mmap -> bool, memory map uncompressed data instead of reading it, the file is then only read when the data is
+        used and the object can't be modified in place
+
+    Returns
+    -------
+    State, QuantumGate, DensityMatrix or SparseState
+    """
+    with open(path, 'rb') as file:
+        header = _read_header(file)
+        kind = header['kind']
+        dtype = np.lib.format.descr_to_dtype(_as_descr(header['dtype']))
+        shape = tuple(header['shape'])
+
+        if header['compression'] is None:
+            if mmap:
+                array = np.memmap(path, dtype=dtype, mode='r', offset=header['data_offset'], shape=shape)
+            else:
+                file.seek(header['data_offset'])
+                array = np.fromfile(file, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+        else:
+            file.seek(header['data_offset'])
+            chunks = []
+            while True:
+                size = file.read(8)
+                if len(size) < 8:
+                    break
+                chunks.append(np.frombuffer(zlib.decompress(file.read(struct.unpack('<Q', size)[0])), dtype=dtype))
+            array = np.concatenate(chunks) if chunks else np.zeros(0, dtype=dtype)
+            array = array.reshape(shape)
+
+    if kind == 'State':
+        return State._from_vector(array, header['num_qubits'], header.get('qubit_order'))
+    elif kind == 'QuantumGate':
+        return QuantumGate(array)
+    elif kind == 'DensityMatrix':
+        return DensityMatrix(array)
+    elif kind == 'SparseState':
+        return SparseState(array['index'], array['amplitude'], header['num_qubits'])
+    else:
+        raise Exception("Unknown kind of object {}.".format(kind))
+
+
+def save_checkpoint(path, state, step, metadata=None):
+    """
+    Saves the state of a simulation together with the number of gates that were already applied. The file is only
+    replaced once it was completely written.
+
+    Parameters
+    ----------
+    path -> str
+    state -> State, DensityMatrix or SparseState
+    step -> int, number of gates already applied
+    metadata -> dict, optional
+    """
+    metadata = dict(metadata or {})
+    metadata['step'] = step
+    save(state, path, metadata=metadata)
+
+
+def load_checkpoint(path):
+    """
+    Loads a checkpoint saved with save_checkpoint. The state is read into memory so that the simulation can carry on
+    from it.
+
+    Parameters
+    ----------
+    path -> str
+
+    Returns
+    -------
+    (state, step, metadata)
+    """
+    obj = load(path, mmap=False)
+    metadata = read_header(path)['metadata']
+    return obj, metadata.pop('step'), metadata
+
+
+if __name__ == "__main__":
+    import tempfile
+    from qsimulator.QuantumRegister import equiprobable
+
+    path = os.path.join(tempfile.mkdtemp(), 'state.qsim')
+    save(equiprobable(3), path)
+    print(read_header(path))
+    print(load(path))
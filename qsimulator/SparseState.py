@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+This module contains the SparseState class, a State that only stores its nonzero amplitudes.
+
+Basis states, the output register of Shor's algorithm and anything that has only been through classical reversible
+gates (X, CX, Toffoli, permutation oracles) have very few nonzero amplitudes, however many qubits there are. A
+SparseState keeps them as an array of basis state indices and an array of the matching amplitudes, and a gate only
+produces the amplitudes reachable from the stored ones. Once the fraction of nonzero amplitudes passes the threshold
+the dense State is cheaper, and the gates return a State instead.
+
+Indices are stored as 64 bit integers, so a SparseState can have at most 63 qubits.
+"""
+
+import numpy as np
+import random
+from qsimulator.QuantumRegister import State
+from qsimulator.bitops import extract_field, insert_field
+
+# Fill ratio above which a SparseState is converted to a dense State
+DENSE_THRESHOLD = 1 / 16
+
+
+class SparseState(object):
+
+    def __init__(self, indices, amplitudes, numQubits, threshold=DENSE_THRESHOLD):
+        """
+        Sparse representation of the state of a quantum system. Qubit 0 is the leftmost qubit (the most significant
+        bit of the index), like in State.
+
+        Example: SparseState([0, 5], [1, 1] / sqrt(2), 3) is the state "(|000> + |101>)/sqrt(2)".
+
+        Parameters
+        ----------
+        indices -> array of ints, basis states with a nonzero amplitude (no repeated indices)
+        amplitudes -> array of complex numbers, the matching amplitudes
+        numQubits -> int
+        threshold -> float, fill ratio above which gates return a dense State
+        """
+        if numQubits > 63:
+            raise Exception("SparseState supports at most 63 qubits.")
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.amplitudes = np.asarray(amplitudes, dtype=np.complex128)
+        self.num_qubits = numQubits
+        self.threshold = threshold
+
+    def __str__(self):
+        """
+        Defines the behaviour when print(SparseState) is invoked, e.g. "0.707|0> + 0.707|5>".
+        """
+        return ' + '.join('{:.3g}|{}>'.format(amplitude, index)
+                          for index, amplitude in zip(self.indices, self.amplitudes))
+
+    def __mul__(self, other):
+        """
+        Defines the behaviour when * operator is invoked. If the second operand is another SparseState the kronecker
+        product is returned, the first operand being the leftmost qubits.
+        """
+        if isinstance(other, SparseState):
+            indices = (self.indices[:, None] << other.num_qubits) | other.indices[None, :]
+            amplitudes = self.amplitudes[:, None] * other.amplitudes[None, :]
+            return SparseState(indices.reshape(-1), amplitudes.reshape(-1), self.num_qubits + other.num_qubits,
+                               self.threshold)
+        else:
+            raise Exception("Unsupported type of object.")
+
+    def fill_ratio(self):
+        """
+        Returns the fraction of the 2**n amplitudes that are stored.
+        """
+        return len(self.indices) / 2 ** self.num_qubits
+
+    def apply(self, matrix, qubits=None):
+        """
+        Applies a gate to the chosen qubits. For every stored amplitude only the entries of the gate's column that
+        are nonzero produce new amplitudes, so permutation gates never increase the number of stored amplitudes.
+
+        Parameters
+        ----------
+        matrix -> 2**k x 2**k numpy array
+        qubits -> sequence of k integers, the qubits the gate acts on. If None the gate acts on all qubits.
+
+        Returns
+        -------
+        SparseState object, or State if the result is denser than the threshold
+        """
+        n = self.num_qubits
+        if qubits is None:
+            qubits = range(n)
+        qubits = list(qubits)
+        k = len(qubits)
+        matrix = np.asarray(matrix)
+
+        # Local index of every stored amplitude on the gate's qubits, and the index with those bits cleared
+        local = extract_field(self.indices, qubits, n)
+        cleared = insert_field(self.indices, qubits, 0, n)
+
+        newIndices = []
+        newAmplitudes = []
+        for row in range(2 ** k):
+            coefficients = matrix[row, local]
+            nonzero = coefficients != 0
+            if not np.any(nonzero):
+                continue
+            newIndices.append(insert_field(cleared[nonzero], qubits, row, n))
+            newAmplitudes.append(coefficients[nonzero] * self.amplitudes[nonzero])
+
+        indices = np.concatenate(newIndices) if newIndices else np.zeros(0, dtype=np.int64)
+        amplitudes = np.concatenate(newAmplitudes) if newAmplitudes else np.zeros(0, dtype=np.complex128)
+
+        # Add up the amplitudes that ended up on the same basis state and drop the ones that cancelled out
+        indices, inverse = np.unique(indices, return_inverse=True)
+        amplitudes = np.bincount(inverse, amplitudes.real, len(indices)) \
+            + 1j * np.bincount(inverse, amplitudes.imag, len(indices))
+        keep = np.abs(amplitudes) > 1e-14
+        new = SparseState(indices[keep], amplitudes[keep], n, self.threshold)
+
+        if new.fill_ratio() > self.threshold:
+            return new.to_state()
+        return new
+
+    def to_state(self):
+        """
+        Converts to a dense State.
+
+        Returns
+        -------
+        State object
+        """
+        vector = np.zeros(2 ** self.num_qubits, dtype=np.complex128)
+        vector[self.indices] = self.amplitudes
+        return State(vector)
+
+    def measure(self):
+        """
+        Measures the state and returns a number corresponding to what was measured. It doesn't collapse the state.
+
+        Returns
+        -------
+        int
+        """
+        P = np.cumsum(np.abs(self.amplitudes) ** 2)
+        if len(P) == 0 or P[-1] == 0:
+            raise Exception("Can't measure the zero state, every amplitude is 0.")
+        i = min(np.searchsorted(P, random.random() * P[-1], side='right'), len(P) - 1)
+        return int(self.indices[i])
+
+    def collapse_qubits(self, numQubits):
+        """
+        Measure the state for a given number of qubits. Measures the "rightmost" qubits, see State.collapse_qubits.
+
+        Parameters
+        ----------
+        numQubits -> int
+
+        Returns
+        -------
+        SparseState object
+        """
+        if numQubits > self.num_qubits:
+            raise Exception("Can't measure more qubits than there are qubits in the register.")
+        mask = (1 << numQubits) - 1
+        measured = self.measure() & mask
+
+        matching = (self.indices & mask) == measured
+        amplitudes = self.amplitudes[matching]
+        return SparseState(self.indices[matching] >> numQubits, amplitudes / np.linalg.norm(amplitudes),
+                           self.num_qubits - numQubits, self.threshold)
+
+
+def sparse_from_state(state, threshold=DENSE_THRESHOLD):
+    """
+    Converts a State into a SparseState, keeping its nonzero amplitudes.
+
+    Parameters
+    ----------
+    state -> State object
+    threshold -> float, fill ratio above which gates return a dense State
+
+    Returns
+    -------
+    SparseState object
+    """
+    indices = np.flatnonzero(state.vector)
+    return SparseState(indices, np.asarray(state.vector)[indices], state.num_qubits, threshold)
+
+
+def sparse_basis(numQubits, index, threshold=DENSE_THRESHOLD):
+    """
+    This function initializes a quantum system in the basis state |index>.
+
+    Parameters
+    ----------
+    numQubits -> integer
+    index -> integer
+
+    Returns
+    -------
+    SparseState object
+    """
+    return SparseState([index], [1], numQubits, threshold)
+
+
+def sparse_zeros(numQubits, threshold=DENSE_THRESHOLD):
+    """
+    This function initializes a quantum system in which every qubit is in the state |0>.
+    """
+    return sparse_basis(numQubits, 0, threshold)
+
+
+def sparse_ones(numQubits, threshold=DENSE_THRESHOLD):
+    """
+    This function initializes a quantum system in which every qubit is in the state |1>.
+    """
+    return sparse_basis(numQubits, 2 ** numQubits - 1, threshold)
+
+
+if __name__ == "__main__":
+    CX = np.array([[1, 0, 0, 0],
+                   [0, 1, 0, 0],
+                   [0, 0, 0, 1],
+                   [0, 0, 1, 0]])
+    H = (1 / np.sqrt(2)) * np.array([[1, 1],
+                                     [1, -1]])
+
+    # A 48 qubit register that only ever has two nonzero amplitudes
+    state = sparse_zeros(48).apply(H, [0])
+    for q in range(47):
+        state = state.apply(CX, [q, q + 1])
+    print(state)
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+This module contains the stabilizer tableau simulator for Clifford circuits.
+
+A circuit made only of H, S, X, Y, Z, CX, CZ and SWAP gates keeps |00...0> a stabilizer state, which is described by
+2n Pauli operators (n destabilizers and n stabilizers) instead of 2**n amplitudes. The tableau stores their X and Z
+bits and signs (Aaronson and Gottesman, "Improved simulation of stabilizer circuits", 2004). Every gate only touches
+one or two columns of the tableau and a measurement does at most O(n) row operations of length n, so circuits with
+hundreds of qubits are no problem.
+
+A circuit is a list of (gate, qubits) pairs like in the Noise module, where the gate is a QuantumGate or a numpy array.
+simulate runs it on the tableau when every gate is Clifford and falls back to a State otherwise.
+"""
+
+import numpy as np
+from qsimulator.basic import apply_local_operator
+from qsimulator.QuantumRegister import State
+from qsimulator.bitops import to_bits, from_bits
+
+# Tableau operations of the recognised Clifford gates, checked up to a global phase
+_S_DAGGER = np.array([[1, 0], [0, -1j]])
+_CLIFFORD_GATES = [
+    (np.array([[1, 0], [0, 1]]), []),
+    (np.array([[0, 1], [1, 0]]), [('x', 0)]),
+    (np.array([[0, -1j], [1j, 0]]), [('y', 0)]),
+    (np.array([[1, 0], [0, -1]]), [('z', 0)]),
+    (np.array([[1, 1], [1, -1]]) / np.sqrt(2), [('h', 0)]),
+    (np.array([[1, 0], [0, 1j]]), [('s', 0)]),
+    (_S_DAGGER, [('z', 0), ('s', 0)]),
+    (np.array([[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 0, 1], [0, 0, 1, 0]]), [('cx', 0, 1)]),
+    (np.array([[1, 0, 0, 0], [0, 0, 0, 1], [0, 0, 1, 0], [0, 1, 0, 0]]), [('cx', 1, 0)]),
+    (np.array([[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, -1]]), [('cz', 0, 1)]),
+    (np.array([[1, 0, 0, 0], [0, 0, 1, 0], [0, 1, 0, 0], [0, 0, 0, 1]]), [('swap', 0, 1)]),
+]
+
+
+def _equal_up_to_phase(matrix1, matrix2):
+    if matrix1.shape != matrix2.shape:
+        return False
+    i = np.flatnonzero(np.abs(matrix2) > 1e-12)[0]
+    phase = matrix1.flat[i] / matrix2.flat[i]
+    return abs(abs(phase) - 1) < 1e-9 and np.allclose(matrix1, phase * matrix2)
+
+
+def clifford_operations(matrix):
+    """
+    Recognises a Clifford gate from its matrix (up to a global phase).
+
+    Parameters
+    ----------
+    matrix -> numpy array or QuantumGate
+
+    Returns
+    -------
+    list of tableau operations, e.g. [('cx', 0, 1)], with indices into the qubits of the gate, or None if the gate is
+    not one of the recognised Clifford gates
+    """
+    matrix = np.asarray(getattr(matrix, 'matrix', matrix))
+    for clifford, operations in _CLIFFORD_GATES:
+        if _equal_up_to_phase(matrix, clifford):
+            return operations
+    return None
+
+
+def is_clifford(circuit):
+    """
+    Checks whether every gate of a circuit is one of the recognised Clifford gates.
+
+    Parameters
+    ----------
+    circuit -> list of (gate, qubits) pairs
+
+    Returns
+    -------
+    bool
+    """
+    return all(clifford_operations(gate) is not None for gate, _ in circuit)
+
+
+def _phase_exponents(x1, z1, x2, z2):
+    """
+    Exponent of i picked up when the Pauli (x1, z1) is multiplied by the Pauli (x2, z2), summed over the qubits.
+    Broadcasts over rows.
+    """
+    x1, z1, x2, z2 = (a.astype(np.int64) for a in (x1, z1, x2, z2))
+    g = np.where(x1 & z1, z2 - x2, 0) + np.where(x1 & (1 - z1), z2 * (2 * x2 - 1), 0) \
+        + np.where((1 - x1) & z1, x2 * (1 - 2 * z2), 0)
+    return np.sum(g, axis=-1)
+
+
+class StabilizerState(object):
+
+    def __init__(self, numQubits):
+        """
+        Stabilizer tableau of a register of numQubits qubits, initialised to |00...0>. Qubit 0 is the leftmost qubit,
+        like in State.
+
+        Rows 0..n-1 of the tableau are the destabilizers and rows n..2n-1 the stabilizers. The signs are stored as
+        affine functions over GF(2): column 0 of signs is the constant and any further columns are coefficients of
+        symbolic random bits, which is what lets sample draw many shots from a single pass of measurements.
+
+        Parameters
+        ----------
+        numQubits -> int
+        """
+        n = numQubits
+        self.num_qubits = n
+        self.x = np.zeros((2 * n, n), dtype=np.uint8)
+        self.z = np.zeros((2 * n, n), dtype=np.uint8)
+        self.x[np.arange(n), np.arange(n)] = 1
+        self.z[n + np.arange(n), np.arange(n)] = 1
+        self.signs = np.zeros((2 * n, 1), dtype=np.uint8)
+
+    def copy(self):
+        new = StabilizerState.__new__(StabilizerState)
+        new.num_qubits = self.num_qubits
+        new.x = self.x.copy()
+        new.z = self.z.copy()
+        new.signs = self.signs.copy()
+        return new
+
+    def __str__(self):
+        """
+        Defines the behaviour when print(StabilizerState) is invoked, prints the stabilizers, e.g. +XX, +ZZ.
+        """
+        n = self.num_qubits
+        letters = np.array(['I', 'X', 'Z', 'Y'])
+        rows = []
+        for i in range(n, 2 * n):
+            rows.append('-+'[1 - self.signs[i, 0]] + ''.join(letters[self.x[i] + 2 * self.z[i]]))
+        return '\n'.join(rows)
+
+    # ---------------------------------Gates-----------------------------------
+
+    def h(self, a):
+        self.signs[:, 0] ^= self.x[:, a] & self.z[:, a]
+        self.x[:, a], self.z[:, a] = self.z[:, a].copy(), self.x[:, a].copy()
+
+    def s(self, a):
+        self.signs[:, 0] ^= self.x[:, a] & self.z[:, a]
+        self.z[:, a] ^= self.x[:, a]
+
+    def x_(self, a):
+        self.signs[:, 0] ^= self.z[:, a]
+
+    def y(self, a):
+        self.signs[:, 0] ^= self.x[:, a] ^ self.z[:, a]
+
+    def z_(self, a):
+        self.signs[:, 0] ^= self.x[:, a]
+
+    def cx(self, a, b):
+        self.signs[:, 0] ^= self.x[:, a] & self.z[:, b] & (self.x[:, b] ^ self.z[:, a] ^ 1)
+        self.x[:, b] ^= self.x[:, a]
+        self.z[:, a] ^= self.z[:, b]
+
+    def cz(self, a, b):
+        self.h(b)
+        self.cx(a, b)
+        self.h(b)
+
+    def swap(self, a, b):
+        self.x[:, [a, b]] = self.x[:, [b, a]]
+        self.z[:, [a, b]] = self.z[:, [b, a]]
+
+    def apply(self, matrix, qubits=None):
+        """
+        Applies a Clifford gate to the chosen qubits.
+
+        Parameters
+        ----------
+        matrix -> numpy array, one of the recognised Clifford gates
+        qubits -> sequence of integers, the qubits the gate acts on. If None the gate acts on all qubits.
+
+        Returns
+        -------
+        StabilizerState object
+        """
+        operations = clifford_operations(matrix)
+        if operations is None:
+            raise Exception("Gate is not a Clifford gate, it can't be simulated with a stabilizer tableau.")
+        if qubits is None:
+            qubits = range(self.num_qubits)
+        qubits = list(qubits)
+        new = self.copy()
+        methods = {'h': new.h, 's': new.s, 'x': new.x_, 'y': new.y, 'z': new.z_,
+                   'cx': new.cx, 'cz': new.cz, 'swap': new.swap}
+        for name, *indices in operations:
+            methods[name](*[qubits[i] for i in indices])
+        return new
+
+    # ------------------------------Measurement-------------------------------
+
+    def _rowsum(self, h, i):
+        """
+        Replaces the rows h (an index or an array of indices) with the product of themselves and row i.
+        """
+        exponents = _phase_exponents(self.x[i], self.z[i], self.x[h], self.z[h])
+        self.signs[h] ^= self.signs[i]
+        self.signs[h, 0] ^= ((exponents % 4) // 2).astype(np.uint8)
+        self.x[h] ^= self.x[i]
+        self.z[h] ^= self.z[i]
+
+    def _measure(self, a, outcome):
+        """
+        Measures qubit a. If the outcome is random the stabilizer of the measured qubit gets the given outcome, which
+        is an affine function (a row of signs). Returns the affine function of the outcome and whether it was random.
+        """
+        n = self.num_qubits
+        candidates = np.flatnonzero(self.x[n:, a]) + n
+        if len(candidates) > 0:
+            p = candidates[0]
+            rows = np.flatnonzero(self.x[:, a])
+            rows = rows[rows != p]
+            if len(rows) > 0:
+                self._rowsum(rows, p)
+            self.x[p - n], self.z[p - n], self.signs[p - n] = self.x[p], self.z[p], self.signs[p]
+            self.x[p] = 0
+            self.z[p] = 0
+            self.z[p, a] = 1
+            self.signs[p] = outcome
+            return outcome, True
+
+        # Deterministic outcome, the product of the stabilizers picked out by the destabilizers is +-Z_a
+        x = np.zeros(n, dtype=np.uint8)
+        z = np.zeros(n, dtype=np.uint8)
+        sign = np.zeros(self.signs.shape[1], dtype=np.uint8)
+        for i in np.flatnonzero(self.x[:n, a]):
+            exponent = _phase_exponents(self.x[i + n], self.z[i + n], x, z)
+            sign ^= self.signs[i + n]
+            sign[0] ^= (exponent % 4) // 2
+            x ^= self.x[i + n]
+            z ^= self.z[i + n]
+        return sign, False
+
+    def measure_qubit(self, a, rng=None):
+        """
+        Measures a single qubit and collapses the tableau.
+
+        Parameters
+        ----------
+        a -> int, qubit to measure
+        rng -> np.random.Generator, optional
+
+        Returns
+        -------
+        int, 0 or 1
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+        outcome = np.zeros(self.signs.shape[1], dtype=np.uint8)
+        outcome[0] = rng.integers(2)
+        sign, _ = self._measure(a, outcome)
+        return int(sign[0])
+
+    def sample(self, numShots=1, rng=None):
+        """
+        Samples measurements of all the qubits without collapsing the tableau.
+
+        The measurements are done once on a copy of the tableau with a symbolic bit for every random outcome. Every
+        outcome is then an affine function of those bits, and all the shots are obtained by drawing the random bits
+        and evaluating the functions with one matrix product.
+
+        Parameters
+        ----------
+        numShots -> int
+        rng -> np.random.Generator, optional
+
+        Returns
+        -------
+        np.ndarray of shape (numShots, n) of measured bits, column 0 being qubit 0
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+        n = self.num_qubits
+        tableau = self.copy()
+        tableau.signs = np.zeros((2 * n, n + 1), dtype=np.uint8)
+        tableau.signs[:, 0] = self.signs[:, 0]
+
+        functions = np.zeros((n, n + 1), dtype=np.uint8)
+        numRandom = 0
+        for a in range(n):
+            variable = np.zeros(n + 1, dtype=np.uint8)
+            variable[numRandom + 1] = 1
+            functions[a], random = tableau._measure(a, variable)
+            numRandom += random
+
+        bits = np.ones((numShots, n + 1), dtype=np.int64)
+        bits[:, 1:numRandom + 1] = rng.integers(0, 2, size=(numShots, numRandom))
+        bits[:, numRandom + 1:] = 0
+        return ((bits @ functions.T.astype(np.int64)) % 2).astype(np.int8)
+
+    def measure(self):
+        """
+        Measures the register and returns a number corresponding to the basis state that was measured. It doesn't
+        collapse the state.
+
+        Returns
+        -------
+        int
+        """
+        return from_bits(self.sample(1)[0])
+
+
+def simulate(circuit, numQubits, numShots=1, seed=None):
+    """
+    Runs a circuit on |00...0> and samples measurements of all the qubits. If every gate is a Clifford gate the
+    stabilizer tableau is used, otherwise the circuit is applied to a State.
+
+    Parameters
+    ----------
+    circuit -> list of (gate, qubits) pairs, gates are QuantumGates or numpy arrays
+    numQubits -> int
+    numShots -> int
+    seed -> int, optional
+
+    Returns
+    -------
+    np.ndarray of shape (numShots, numQubits) of measured bits, column 0 being qubit 0
+    """
+    rng = np.random.default_rng(seed)
+    if is_clifford(circuit):
+        tableau = StabilizerState(numQubits)
+        for gate, qubits in circuit:
+            tableau = tableau.apply(gate, qubits)
+        return tableau.sample(numShots, rng)
+
+    tensor = np.zeros((2,) * numQubits, dtype=np.complex128)
+    tensor[(0,) * numQubits] = 1
+    for gate, qubits in circuit:
+        tensor = apply_local_operator(np.asarray(getattr(gate, 'matrix', gate)), tensor, qubits)
+    state = State(tensor.reshape(-1))
+
+    probabilities = state.probabilities()
+    outcomes = rng.choice(len(probabilities), size=numShots, p=probabilities / np.sum(probabilities))
+    return to_bits(outcomes, numQubits)
+
+
+if __name__ == "__main__":
+    H = np.array([[1, 1], [1, -1]]) / np.sqrt(2)
+    CX = np.array([[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 0, 1], [0, 0, 1, 0]])
+
+    # 500 qubit GHZ state
+    circuit = [(H, [0])] + [(CX, [q, q + 1]) for q in range(499)]
+    shots = simulate(circuit, 500, numShots=10)
+    print(shots.sum(axis=1))
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+This module extracts the unitary of a circuit and checks whether two circuits are equivalent, without multiplying
+2**n x 2**n matrices together.
+
+A circuit is a list of (gate, qubits) pairs, qubits None meaning the whole register. Column j of the unitary of a
+circuit is the circuit applied to the basis state |j>, so the unitary is built by running the circuit on blocks of
+basis states at once (a block is a 2**n x batchSize array and every gate is applied locally to all of its columns),
+with the blocks shared out between worker processes. For circuits that keep basis states sparse (permutations,
+oracles, controlled gates) the columns can be simulated as SparseStates and the unitary returned in sparse form.
+
+Checking the equivalence of two circuits only needs them to agree on a few random states: two different unitaries
+agree on a random state with probability zero, and running k states through a circuit costs O(k 2**n) per gate where
+comparing the full matrices costs O(8**n).
+"""
+
+import numpy as np
+from multiprocessing import Pool
+from qsimulator.basic import apply_local_operator
+from qsimulator.SparseState import SparseState
+
+# Number of amplitudes in a block of columns simulated at once, 16 MB of complex numbers
+BATCH_AMPLITUDES = 1 << 20
+
+
+def _circuit_matrices(circuit, numQubits):
+    return [(np.asarray(getattr(gate, 'matrix', gate)), range(numQubits) if qubits is None else list(qubits))
+            for gate, qubits in circuit]
+
+
+def _run_block(matrices, block, numQubits):
+    # Runs the circuit on every column of a 2**n x B block at once
+    tensor = block.reshape((2,) * numQubits + (block.shape[1],))
+    for matrix, qubits in matrices:
+        tensor = apply_local_operator(matrix, tensor, qubits)
+    return tensor.reshape(2 ** numQubits, -1)
+
+
+def _unitary_columns(arguments):
+    matrices, numQubits, start, stop = arguments
+    block = np.zeros((2 ** numQubits, stop - start), dtype=np.complex128)
+    block[np.arange(start, stop), np.arange(stop - start)] = 1
+    return _run_block(matrices, block, numQubits)
+
+
+def _sparse_columns(arguments):
+    matrices, numQubits, start, stop, tolerance = arguments
+    # The whole block is one SparseState with extra leftmost qubits holding the column, |j - start>|j>, so that every
+    # gate is applied to all the columns at once. A threshold of 1 keeps it sparse whatever happens to it.
+    columnQubits = max(1, (stop - start - 1).bit_length())
+    columns = np.arange(start, stop, dtype=np.int64)
+    state = SparseState(((columns - start) << numQubits) | columns, np.ones(len(columns)), columnQubits + numQubits,
+                        threshold=1)
+    for matrix, qubits in matrices:
+        state = state.apply(matrix, [columnQubits + q for q in qubits])
+    keep = np.abs(state.amplitudes) > tolerance
+    indices = state.indices[keep]
+    return indices & ((1 << numQubits) - 1), start + (indices >> numQubits), state.amplitudes[keep]
+
+
+def _map(function, batches, processes):
+    if processes == 1 or len(batches) == 1:
+        return [function(batch) for batch in batches]
+    with Pool(processes) as pool:
+        return pool.map(function, batches)
+
+
+def circuit_unitary(circuit, numQubits, batchSize=None, processes=None, sparse=False, tolerance=1e-12):
+    """
+    Builds the unitary of a circuit column by column, by simulating blocks of basis states.
+
+    Parameters
+    ----------
+    circuit -> list of (gate, qubits) pairs, the gates being QuantumGates or numpy arrays
+    numQubits -> int
+    batchSize -> int, number of columns simulated at once. By default a dense block holds BATCH_AMPLITUDES amplitudes
+        and the sparse columns are split into 8 blocks.
+    processes -> int, number of worker processes. By default all cores are used, 1 runs in the current process.
+    sparse -> bool, simulate the columns as SparseStates and return the unitary in coordinate form
+    tolerance -> float, entries smaller than this are dropped from the sparse form
+
+    Returns
+    -------
+    2**n x 2**n np.ndarray, or if sparse is True the tuple (rows, columns, values) of np.ndarrays with the nonzero
+        entries, e.g. for scipy.sparse.coo_matrix((values, (rows, columns)))
+    """
+    dimension = 2 ** numQubits
+    matrices = _circuit_matrices(circuit, numQubits)
+    if batchSize is None:
+        if sparse:
+            batchSize = max(1, min(dimension // 8, BATCH_AMPLITUDES))
+        else:
+            batchSize = max(1, min(dimension, BATCH_AMPLITUDES // dimension))
+    ranges = [(start, min(start + batchSize, dimension)) for start in range(0, dimension, batchSize)]
+
+    if sparse:
+        results = _map(_sparse_columns, [(matrices, numQubits, start, stop, tolerance) for start, stop in ranges],
+                       processes)
+        return tuple(np.concatenate(parts) for parts in zip(*results))
+
+    results = _map(_unitary_columns, [(matrices, numQubits, start, stop) for start, stop in ranges], processes)
+    return np.concatenate(results, axis=1)
+
+
+def circuits_equivalent(circuit1, circuit2, numQubits, numStates=4, seed=None, tolerance=1e-9, globalPhase=True):
+    """
+    Checks whether two circuits implement the same unitary by running both on the same random states.
+
+    Parameters
+    ----------
+    circuit1, circuit2 -> lists of (gate, qubits) pairs
+    numQubits -> int
+    numStates -> int, number of random states, a single one is already enough with probability 1
+    seed -> int, optional, makes the check reproducible
+    tolerance -> float, largest difference between the amplitudes of the two outputs
+    globalPhase -> bool, if True the circuits may differ by a global phase
+
+    Returns
+    -------
+    bool
+    """
+    rng = np.random.default_rng(seed)
+    states = rng.normal(size=(2 ** numQubits, numStates)) + 1j * rng.normal(size=(2 ** numQubits, numStates))
+    states /= np.linalg.norm(states, axis=0)
+
+    output1 = _run_block(_circuit_matrices(circuit1, numQubits), states, numQubits)
+    output2 = _run_block(_circuit_matrices(circuit2, numQubits), states, numQubits)
+    if globalPhase:
+        # The same phase has to work for every state, so it is fitted to all of them together
+        overlap = np.vdot(output2, output1)
+        if abs(overlap) > 0:
+            output2 = output2 * (overlap / abs(overlap))
+    return bool(np.max(np.abs(output1 - output2)) <= tolerance)
+
+
+if __name__ == "__main__":
+    import time
+    from qsimulator.QuantumGate import SWAP, hGate, xGate, zGate, cxGate, czGate
+
+    # SWAP is three CNOTs, CZ is a CNOT conjugated by Hadamards on the target
+    swap = [(cxGate(), [0, 1]), (cxGate(), [1, 0]), (cxGate(), [0, 1])]
+    cz = [(hGate(), [1]), (cxGate(), [0, 1]), (hGate(), [1])]
+    print(np.allclose(circuit_unitary(swap, 2, processes=1), SWAP))
+    print(circuits_equivalent(cz, [(czGate(), [0, 1])], 2))
+    print(circuits_equivalent([(xGate(), [0]), (zGate(), [0])], [(zGate(), [0]), (xGate(), [0])], 1))
+
+    n = 12
+    ladder = [(cxGate(), [q, q + 1]) for q in range(n - 1)]
+    time1 = time.time()
+    (rows, columns, values) = circuit_unitary(ladder, n, sparse=True, processes=1)
+    time2 = time.time()
+    print("{} nonzero entries of a {} qubit CNOT ladder in {} s.".format(len(values), n, time2 - time1))
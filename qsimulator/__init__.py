@@ -1,7 +1,81 @@
-from qsimulator.basic import *
-from qsimulator.QuantumGate import *
-from qsimulator.QuantumRegister import *
-from qsimulator.Auxiliary import *
+"""
+The submodules of qsimulator are imported lazily: "import qsimulator" itself imports nothing (not even numpy), and a
+submodule is only loaded the first time one of its names is used, e.g. qsimulator.State loads QuantumRegister and
+qsimulator.MPS loads the MPS backend. Everything stays available under the same names as before.
+"""
 
+import importlib
+import sys
+import types
 
 __version__ = 'beta'
+
+# Public names of every submodule
+_SUBMODULES = {
+    'basic': ['kronecker_product', 'kronecker_product_multi', 'kronecker_product_power', 'apply_local_operator'],
+    'Auxiliary': ['binary_to_decimal', 'decimal_to_binary'],
+    'bitops': ['get_bit', 'extract_field', 'insert_field', 'split_registers', 'join_registers', 'permute_bits',
+               'popcount', 'parity', 'to_bits', 'from_bits'],
+    'kernels': ['numba_available', 'apply_gate'],
+    'qubit': ['Qubit'],
+    'QuantumRegister': ['State', 'ones', 'zeros', 'equiprobable'],
+    'QuantumGate': ['I', 'X', 'Y', 'Z', 'H', 'S', 'CX', 'CZ', 'SWAP', 'CCX', 'QuantumGate', 'ParameterizedGate',
+                    'SwapGate', 'PhaseOracle', 'XorOracle', 'iGate', 'xGate', 'yGate', 'zGate', 'hGate', 'sGate',
+                    'swapGate', 'phaseOracle', 'xorOracle', 'to_phase_oracle', 'QFT_operator', 'inverse_QFT_operator',
+                    'rxGate', 'ryGate', 'rzGate', 'phaseGate', 'cphaseGate', 'cxGate', 'czGate', 'toffGate'],
+    'DensityMatrix': ['DensityMatrix'],
+    'Noise': ['KrausChannel', 'ReadoutError', 'depolarizing_channel', 'amplitude_damping_channel',
+              'phase_flip_channel', 'run_density_matrix', 'run_trajectories'],
+    'MPS': ['MPS', 'state_to_mps', 'product_mps', 'mps_zeros', 'mps_equiprobable'],
+    'Stabilizer': ['clifford_operations', 'is_clifford', 'StabilizerState', 'simulate'],
+    'Observables': ['pauli_masks', 'pauli_product', 'expectation_paulis', 'expectation_pauli',
+                    'expectation_hamiltonian', 'hamiltonian_operator', 'apply_hamiltonian', 'expectation_diagonal'],
+    'Evolution': ['KRYLOV_DIM', 'trotter_step', 'trotter_evolve', 'expm_multiply', 'krylov_evolve'],
+    'Gradient': ['run_circuit', 'expectation_and_gradient', 'gradient'],
+    'Sampling': ['DEFAULT_BATCH', 'MAX_BATCH', 'MAX_SHOTS', 'SamplingResult', 'sample', 'most_likely',
+                 'estimate_probability', 'adaptive_sample'],
+    'PhaseEstimation': ['OperatorPowers', 'qft', 'inverse_qft', 'phase_distribution', 'phase_estimation'],
+    'Resources': ['STRATEGIES', 'KINDS', 'ResourceError', 'Operation', 'Estimate', 'ResourceReport',
+                  'available_memory', 'estimate_resources', 'select_backend', 'run_plan', 'calibrate'],
+    'Unitary': ['BATCH_AMPLITUDES', 'circuit_unitary', 'circuits_equivalent'],
+    'ExecutionPlan': ['ExecutionPlan', 'circuit_structure', 'compile_circuit', 'plan_cache_info', 'clear_plan_cache'],
+    'CacheBlocking': ['BLOCK_QUBITS', 'BlockSchedule', 'schedule_circuit', 'run_blocked'],
+    'SparseState': ['DENSE_THRESHOLD', 'SparseState', 'sparse_from_state', 'sparse_basis', 'sparse_zeros',
+                    'sparse_ones'],
+    'JobService': ['DEFAULT_PRELOAD', 'JobCancelled', 'JobServer', 'JobClient', 'run_job'],
+    'Serialization': ['MAGIC', 'VERSION', 'ALIGNMENT', 'CHUNK_SIZE', 'StreamWriter', 'save', 'read_header', 'load',
+                      'save_checkpoint', 'load_checkpoint'],
+}
+
+# Name -> submodule that defines it
+_NAMES = {name: module for module, names in _SUBMODULES.items() for name in names}
+
+__all__ = list(_NAMES)
+
+
+def __getattr__(name):
+    if name in _NAMES:
+        value = getattr(importlib.import_module('qsimulator.' + _NAMES[name]), name)
+        globals()[name] = value  # next time the name is found without calling __getattr__
+        return value
+    if name in _SUBMODULES:
+        return importlib.import_module('qsimulator.' + name)
+    raise AttributeError("module 'qsimulator' has no attribute '{}'".format(name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_NAMES))
+
+
+class _Package(types.ModuleType):
+
+    def __setattr__(self, name, value):
+        # Importing a submodule binds it to the package under its own name. Some submodules are named after the
+        # class they define (QuantumGate, DensityMatrix, MPS, SparseState), qsimulator.QuantumGate has to stay the
+        # class no matter in which order things were imported.
+        if isinstance(value, types.ModuleType) and _NAMES.get(name) == name:
+            value = getattr(value, name)
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _Package
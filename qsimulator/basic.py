@@ -103,6 +103,35 @@ def kronecker_product_power(matrix, power):
         return result
 
 
+def apply_local_operator(matrix: np.ndarray, tensor: np.ndarray, axes) -> np.ndarray:
+    """
+    Applies an operator acting on k qubits to the chosen axes of a tensor in which every axis has length 2. The
+    operator is contracted only with the axes it acts on, so the full 2**n x 2**n matrix is never built.
+
+    A state vector of n qubits is turned into such a tensor with vector.reshape((2,) * n); axis 0 is then the leftmost
+    qubit (the most significant bit of the basis state index), consistent with how kronecker_product orders qubits.
+
+    Parameters
+    ----------
+    matrix -> 2**k x 2**k operator, numpy array
+    tensor -> numpy array of shape (2, 2, ..., 2)
+    axes -> sequence of k integers, axes of the tensor the operator acts on (in the order of the operator's qubits)
+
+    Returns
+    -------
+    tensor -> result of the operation, numpy array of the same shape as the input tensor
+    """
+    axes = list(axes)
+    k = len(axes)
+    if matrix.shape != (2 ** k, 2 ** k):
+        raise Exception("Operator of shape {} can't act on {} qubits.".format(matrix.shape, k))
+
+    operator = matrix.reshape((2,) * (2 * k))
+    # tensordot places the output axes of the operator first, they are moved back to where they came from
+    result = np.tensordot(operator, tensor, axes=(list(range(k, 2 * k)), axes))
+    return np.moveaxis(result, list(range(k)), axes)
+
+
 # Do tests here
 if __name__ == "__main__":
     a = np.array([0, 1, 2])
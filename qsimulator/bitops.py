@@ -0,0 +1,241 @@
+"""
+Bit manipulation of basis state indices, used instead of converting indices to binary strings and back.
+
+Every function works on a single integer as well as on a numpy array of indices (for example np.arange(2 ** n), all
+the basis states at once), in which case the whole array is processed with a few vectorized operations.
+
+Qubits are numbered like everywhere else in qsimulator: qubit 0 is the leftmost qubit, which is the most significant
+bit of an index of an n qubit register, so qubit q sits at bit position n - 1 - q.
+"""
+
+import numpy as np
+
+
+def _as_array(indices):
+    return np.asarray(indices, dtype=np.int64)
+
+
+def _result(value):
+    # Scalars in, Python ints out
+    return int(value) if np.ndim(value) == 0 else value
+
+
+def get_bit(indices, qubit, numQubits):
+    """
+    Returns the value (0 or 1) of one qubit in the given basis states.
+
+    Parameters
+    ----------
+    indices -> int or np.ndarray of ints
+    qubit -> int
+    numQubits -> int, size of the register
+
+    Returns
+    -------
+    int or np.ndarray of ints
+    """
+    return _result((_as_array(indices) >> (numQubits - 1 - qubit)) & 1)
+
+
+def extract_field(indices, qubits, numQubits):
+    """
+    Reads the bits of the chosen qubits and packs them into an integer, the first qubit in the list being the most
+    significant bit. For example the field of qubits [1, 2] of |0110> is 3.
+
+    Parameters
+    ----------
+    indices -> int or np.ndarray of ints
+    qubits -> sequence of ints
+    numQubits -> int, size of the register
+
+    Returns
+    -------
+    int or np.ndarray of ints
+    """
+    array = _as_array(indices)
+    field = np.zeros_like(array)
+    for qubit in qubits:
+        field = (field << 1) | ((array >> (numQubits - 1 - qubit)) & 1)
+    return _result(field)
+
+
+def insert_field(indices, qubits, values, numQubits):
+    """
+    Overwrites the bits of the chosen qubits with the bits of values, the inverse of extract_field.
+
+    Parameters
+    ----------
+    indices -> int or np.ndarray of ints
+    qubits -> sequence of ints
+    values -> int or np.ndarray of ints, the first qubit in the list gets the most significant bit
+    numQubits -> int, size of the register
+
+    Returns
+    -------
+    int or np.ndarray of ints
+    """
+    array = _as_array(indices)
+    values = _as_array(values)
+    k = len(qubits)
+    for i, qubit in enumerate(qubits):
+        position = numQubits - 1 - qubit
+        bit = (values >> (k - 1 - i)) & 1
+        array = (array & ~(np.int64(1) << position)) | (bit << position)
+    return _result(array)
+
+
+def split_registers(indices, sizes):
+    """
+    Splits indices of a register made of several registers next to each other into the indices of every register,
+    leftmost register first. For example split_registers(0b10011, [2, 3]) is [2, 3].
+
+    Parameters
+    ----------
+    indices -> int or np.ndarray of ints
+    sizes -> sequence of ints, number of qubits of every register
+
+    Returns
+    -------
+    list of ints or np.ndarrays of ints
+    """
+    array = _as_array(indices)
+    fields = []
+    shift = sum(sizes)
+    for size in sizes:
+        shift -= size
+        fields.append(_result((array >> shift) & ((1 << size) - 1)))
+    return fields
+
+
+def join_registers(fields, sizes):
+    """
+    Joins the indices of several registers into the index of the combined register, the inverse of split_registers.
+
+    Parameters
+    ----------
+    fields -> sequence of ints or np.ndarrays of ints, leftmost register first
+    sizes -> sequence of ints, number of qubits of every register
+
+    Returns
+    -------
+    int or np.ndarray of ints
+    """
+    result = np.int64(0)
+    for field, size in zip(fields, sizes):
+        result = (result << size) | (_as_array(field) & ((1 << size) - 1))
+    return _result(result)
+
+
+def permute_bits(indices, permutation, numQubits):
+    """
+    Moves the qubits of the given basis states around: qubit q of the input ends up as qubit permutation[q] of the
+    output.
+
+    Parameters
+    ----------
+    indices -> int or np.ndarray of ints
+    permutation -> sequence of numQubits ints
+    numQubits -> int
+
+    Returns
+    -------
+    int or np.ndarray of ints
+    """
+    array = _as_array(indices)
+    result = np.zeros_like(array)
+    for qubit, target in enumerate(permutation):
+        result |= ((array >> (numQubits - 1 - qubit)) & 1) << (numQubits - 1 - target)
+    return _result(result)
+
+
+def popcount(indices):
+    """
+    Returns the number of set bits of every index.
+
+    Parameters
+    ----------
+    indices -> int or np.ndarray of non-negative ints
+
+    Returns
+    -------
+    int or np.ndarray of ints
+    """
+    array = _as_array(indices)
+    # Classic SWAR popcount: count bits in pairs, then nibbles, then bytes, and add the bytes up
+    array = array - ((array >> 1) & 0x5555555555555555)
+    array = (array & 0x3333333333333333) + ((array >> 2) & 0x3333333333333333)
+    array = (array + (array >> 4)) & 0x0F0F0F0F0F0F0F0F
+    count = np.zeros_like(array)
+    for shift in range(0, 64, 8):
+        count += (array >> shift) & 0xFF
+    return _result(count)
+
+
+def parity(indices):
+    """
+    Returns the parity (0 or 1) of the number of set bits of every index.
+
+    Parameters
+    ----------
+    indices -> int or np.ndarray of non-negative ints
+
+    Returns
+    -------
+    int or np.ndarray of ints
+    """
+    array = _as_array(indices).copy()
+    shift = 32
+    while shift > 0:
+        array ^= array >> shift
+        shift //= 2
+    return _result(array & 1)
+
+
+def to_bits(indices, numQubits):
+    """
+    Converts indices into arrays of bits, qubit 0 first.
+
+    Parameters
+    ----------
+    indices -> int or np.ndarray of ints
+    numQubits -> int
+
+    Returns
+    -------
+    np.ndarray of shape indices.shape + (numQubits,)
+    """
+    array = _as_array(indices)
+    return ((array[..., None] >> np.arange(numQubits - 1, -1, -1)) & 1).astype(np.int8)
+
+
+def from_bits(bits):
+    """
+    Converts arrays of bits (qubit 0 first) into indices, the inverse of to_bits.
+
+    Parameters
+    ----------
+    bits -> np.ndarray whose last axis holds the bits
+
+    Returns
+    -------
+    int or np.ndarray of ints, Python ints (in an object array) for more than 63 bits, which don't fit in an int64
+    """
+    bits = np.asarray(bits, dtype=np.int64)
+    numQubits = bits.shape[-1]
+    if numQubits > 63:
+        # Chunks of up to 63 bits are converted with int64s and shifted into Python ints
+        result = np.zeros(bits.shape[:-1], dtype=object)
+        for start in range(0, numQubits, 63):
+            chunk = bits[..., start:start + 63]
+            result = (result << chunk.shape[-1]) | np.asarray(from_bits(chunk), dtype=object)
+        return _result(result)
+    result = np.sum(bits << np.arange(numQubits - 1, -1, -1), axis=-1)
+    return _result(result)
+
+
+if __name__ == "__main__":
+    indices = np.arange(8)
+    print(extract_field(indices, [0, 2], 3))
+    print(split_registers(0b10011, [2, 3]))
+    print(popcount(indices), parity(indices))
+    print(permute_bits(indices, [2, 1, 0], 3))
@@ -0,0 +1,440 @@
+"""
+State vector kernels: applying gates to a state vector in place, and computing its probabilities and their cumulative
+sum.
+
+Every kernel has two implementations. When Numba is installed the kernels are compiled with parallel loops that sweep
+the vector once, pairing up (or grouping into fours) the amplitudes that a gate mixes without any temporaries. Without
+Numba, or with USE_NUMBA set to False, the same kernels are written with numpy views of the state tensor. Numba is
+only imported (and the kernels compiled) the first time a kernel runs, so importing this module stays cheap.
+
+Qubits are numbered like everywhere else in qsimulator: qubit 0 is the leftmost qubit, the most significant bit of an
+index, so qubit q of an n qubit register sits at bit position n - 1 - q.
+"""
+
+import numpy as np
+from qsimulator.basic import apply_local_operator
+
+USE_NUMBA = True  # set to False to always use the numpy kernels
+
+# Size of the blocks of the parallel cumulative sum
+CDF_BLOCK = 1 << 16
+
+_numba = None  # compiled kernels, False if Numba is not installed
+
+
+def _compile_numba():
+    try:
+        import numba
+    except ImportError:
+        return False
+
+    @numba.njit(parallel=True, cache=True)
+    def apply_1q(vector, m00, m01, m10, m11, position):
+        low = (1 << position) - 1
+        for i in numba.prange(vector.shape[0] // 2):
+            i0 = ((i >> position) << (position + 1)) | (i & low)
+            i1 = i0 | (1 << position)
+            (a0, a1) = (vector[i0], vector[i1])
+            vector[i0] = m00 * a0 + m01 * a1
+            vector[i1] = m10 * a0 + m11 * a1
+
+    @numba.njit(parallel=True, cache=True)
+    def apply_2q(vector, matrix, position0, position1):
+        # position0 is the bit of the first qubit of the gate (the most significant bit of the gate's local index)
+        (low, high) = (min(position0, position1), max(position0, position1))
+        (bit0, bit1) = (1 << position0, 1 << position1)
+        for i in numba.prange(vector.shape[0] // 4):
+            base = ((i >> low) << (low + 1)) | (i & ((1 << low) - 1))
+            base = ((base >> high) << (high + 1)) | (base & ((1 << high) - 1))
+            (i0, i1, i2, i3) = (base, base | bit1, base | bit0, base | bit0 | bit1)
+            (a0, a1, a2, a3) = (vector[i0], vector[i1], vector[i2], vector[i3])
+            vector[i0] = matrix[0, 0] * a0 + matrix[0, 1] * a1 + matrix[0, 2] * a2 + matrix[0, 3] * a3
+            vector[i1] = matrix[1, 0] * a0 + matrix[1, 1] * a1 + matrix[1, 2] * a2 + matrix[1, 3] * a3
+            vector[i2] = matrix[2, 0] * a0 + matrix[2, 1] * a1 + matrix[2, 2] * a2 + matrix[2, 3] * a3
+            vector[i3] = matrix[3, 0] * a0 + matrix[3, 1] * a1 + matrix[3, 2] * a2 + matrix[3, 3] * a3
+
+    @numba.njit(parallel=True, cache=True)
+    def apply_controlled(vector, m00, m01, m10, m11, controlMask, position):
+        low = (1 << position) - 1
+        for i in numba.prange(vector.shape[0] // 2):
+            i0 = ((i >> position) << (position + 1)) | (i & low)
+            if i0 & controlMask == controlMask:
+                i1 = i0 | (1 << position)
+                (a0, a1) = (vector[i0], vector[i1])
+                vector[i0] = m00 * a0 + m01 * a1
+                vector[i1] = m10 * a0 + m11 * a1
+
+    @numba.njit(parallel=True, cache=True)
+    def apply_diagonal(vector, diagonal, positions):
+        for i in numba.prange(vector.shape[0]):
+            local = 0
+            for position in positions:
+                local = (local << 1) | ((i >> position) & 1)
+            vector[i] *= diagonal[local]
+
+    @numba.njit(parallel=True, cache=True)
+    def apply_permutation(output, vector, permutation, positions):
+        mask = 0
+        for position in positions:
+            mask |= 1 << position
+        for i in numba.prange(vector.shape[0]):
+            local = 0
+            for position in positions:
+                local = (local << 1) | ((i >> position) & 1)
+            target = permutation[local]
+            j = i & ~mask
+            for k in range(positions.shape[0]):
+                j |= ((target >> (positions.shape[0] - 1 - k)) & 1) << positions[k]
+            output[j] = vector[i]
+
+    @numba.njit(parallel=True, cache=True)
+    def probabilities(vector, output):
+        for i in numba.prange(vector.shape[0]):
+            output[i] = vector[i].real ** 2 + vector[i].imag ** 2
+
+    @numba.njit(parallel=True, cache=True)
+    def cdf(probabilities, output, block):
+        # Cumulative sum of every block in parallel, then every block is shifted by the total of the blocks before it
+        numBlocks = (probabilities.shape[0] + block - 1) // block
+        totals = np.zeros(numBlocks)
+        for b in numba.prange(numBlocks):
+            total = 0.0
+            for i in range(b * block, min((b + 1) * block, probabilities.shape[0])):
+                total += probabilities[i]
+                output[i] = total
+            totals[b] = total
+        offsets = np.cumsum(totals) - totals
+        for b in numba.prange(1, numBlocks):
+            for i in range(b * block, min((b + 1) * block, probabilities.shape[0])):
+                output[i] += offsets[b]
+
+    return {'apply_1q': apply_1q, 'apply_2q': apply_2q, 'apply_controlled': apply_controlled,
+            'apply_diagonal': apply_diagonal, 'apply_permutation': apply_permutation,
+            'probabilities': probabilities, 'cdf': cdf}
+
+
+def _kernels():
+    global _numba
+    if not USE_NUMBA:
+        return None
+    if _numba is None:
+        _numba = _compile_numba()
+    return _numba or None
+
+
+def numba_available():
+    """
+    Returns True if the compiled Numba kernels are used, False if the numpy ones are.
+    """
+    return _kernels() is not None
+
+
+def _positions(qubits, numQubits):
+    return np.array([numQubits - 1 - q for q in qubits], dtype=np.int64)
+
+
+def _qubit_view(vector, qubit, numQubits):
+    # View of the vector with the chosen qubit as the middle axis, so [:, 0] and [:, 1] pair up the amplitudes
+    return vector.reshape(2 ** qubit, 2, 2 ** (numQubits - 1 - qubit))
+
+
+def _update_pair(zero, one, matrix):
+    # zero and one are views of the amplitudes with the target qubit 0 and 1, updated in place
+    (m00, m01), (m10, m11) = matrix
+    a0 = zero.copy()
+    zero *= m00
+    zero += m01 * one
+    one *= m11
+    one += m10 * a0
+
+
+def apply_1q(vector, matrix, qubit, numQubits):
+    """
+    Applies a 1 qubit gate to a state vector in place.
+
+    Parameters
+    ----------
+    vector -> contiguous complex128 np.ndarray of length 2**numQubits, modified in place
+    matrix -> 2 x 2 np.ndarray
+    qubit -> int
+    numQubits -> int
+    """
+    kernels = _kernels()
+    if kernels:
+        (m00, m01), (m10, m11) = np.asarray(matrix, dtype=np.complex128)
+        kernels['apply_1q'](vector, m00, m01, m10, m11, numQubits - 1 - qubit)
+    else:
+        view = _qubit_view(vector, qubit, numQubits)
+        _update_pair(view[:, 0], view[:, 1], matrix)
+
+
+def apply_2q(vector, matrix, qubits, numQubits):
+    """
+    Applies a 2 qubit gate to a state vector in place.
+
+    Parameters
+    ----------
+    vector -> contiguous complex128 np.ndarray of length 2**numQubits, modified in place
+    matrix -> 4 x 4 np.ndarray
+    qubits -> two ints, the first one is the most significant bit of the gate's index
+    numQubits -> int
+    """
+    kernels = _kernels()
+    if kernels:
+        (position0, position1) = _positions(qubits, numQubits)
+        kernels['apply_2q'](vector, np.asarray(matrix, dtype=np.complex128), position0, position1)
+    else:
+        tensor = vector.reshape((2,) * numQubits)
+        tensor[...] = apply_local_operator(matrix, tensor, qubits)
+
+
+def apply_controlled(vector, matrix, controls, target, numQubits):
+    """
+    Applies a 1 qubit gate to the target qubit of a state vector in place, on the basis states where all the control
+    qubits are 1.
+
+    Parameters
+    ----------
+    vector -> contiguous complex128 np.ndarray of length 2**numQubits, modified in place
+    matrix -> 2 x 2 np.ndarray
+    controls -> sequence of ints
+    target -> int
+    numQubits -> int
+    """
+    kernels = _kernels()
+    if kernels:
+        (m00, m01), (m10, m11) = np.asarray(matrix, dtype=np.complex128)
+        controlMask = 0
+        for control in controls:
+            controlMask |= 1 << (numQubits - 1 - control)
+        kernels['apply_controlled'](vector, m00, m01, m10, m11, controlMask, numQubits - 1 - target)
+    else:
+        # Fixing the control axes to 1 leaves a view of the amplitudes the gate acts on
+        index = [slice(None)] * numQubits
+        for control in controls:
+            index[control] = 1
+        sub = vector.reshape((2,) * numQubits)[tuple(index)]
+        axis = target - sum(1 for control in controls if control < target)
+        sub = np.moveaxis(sub, axis, 0)
+        # sub[0, ...] stays a view even when the target is the only axis left
+        _update_pair(sub[0, ...], sub[1, ...], matrix)
+
+
+def apply_diagonal(vector, diagonal, qubits, numQubits):
+    """
+    Multiplies a state vector in place by a diagonal gate.
+
+    Parameters
+    ----------
+    vector -> contiguous complex128 np.ndarray of length 2**numQubits, modified in place
+    diagonal -> np.ndarray of length 2**k, the diagonal of the gate
+    qubits -> sequence of k ints
+    numQubits -> int
+    """
+    diagonal = np.asarray(diagonal, dtype=np.complex128)
+    kernels = _kernels()
+    if kernels:
+        kernels['apply_diagonal'](vector, diagonal, _positions(qubits, numQubits))
+    else:
+        # Broadcast the diagonal as a tensor with its axes on the gate's qubits, in increasing order
+        order = np.argsort(qubits)
+        shape = [1] * numQubits
+        for q in qubits:
+            shape[q] = 2
+        diagonal = np.transpose(diagonal.reshape((2,) * len(qubits)), order).reshape(shape)
+        tensor = vector.reshape((2,) * numQubits)
+        tensor *= diagonal
+
+
+def apply_permutation(vector, permutation, qubits, numQubits):
+    """
+    Applies a permutation gate, which sends the local basis state j of the chosen qubits to permutation[j].
+
+    Parameters
+    ----------
+    vector -> complex128 np.ndarray of length 2**numQubits
+    permutation -> sequence of 2**k ints
+    qubits -> sequence of k ints
+    numQubits -> int
+
+    Returns
+    -------
+    np.ndarray, a new state vector
+    """
+    permutation = np.asarray(permutation, dtype=np.int64)
+    kernels = _kernels()
+    if kernels:
+        output = np.empty_like(vector)
+        kernels['apply_permutation'](output, vector, permutation, _positions(qubits, numQubits))
+        return output
+    k = len(qubits)
+    tensor = np.moveaxis(vector.reshape((2,) * numQubits), qubits, range(k))
+    front = tensor.reshape((2 ** k,) + tensor.shape[k:])
+    output = np.empty_like(front)
+    output[permutation] = front
+    return np.moveaxis(output.reshape(tensor.shape), range(k), qubits).reshape(-1)
+
+
+def probabilities(vector):
+    """
+    Returns |coefficient|**2 of every amplitude of a state vector.
+    """
+    kernels = _kernels()
+    if kernels and vector.dtype == np.complex128:
+        output = np.empty(len(vector))
+        kernels['probabilities'](vector, output)
+        return output
+    return vector.real ** 2 + vector.imag ** 2 if np.iscomplexobj(vector) else np.abs(vector) ** 2
+
+
+def cdf(probabilities):
+    """
+    Returns the cumulative sum of an array of probabilities.
+    """
+    kernels = _kernels()
+    if kernels and probabilities.dtype == np.float64:
+        output = np.empty_like(probabilities)
+        kernels['cdf'](probabilities, output, CDF_BLOCK)
+        return output
+    return np.cumsum(probabilities)
+
+
+def _is_diagonal(matrix):
+    return np.count_nonzero(matrix) == np.count_nonzero(np.diagonal(matrix))
+
+
+def _permutation(matrix):
+    # Image of every basis state if the matrix is a permutation, None otherwise. The checks only look at the nonzero
+    # entries, so big gates don't need temporaries of their size.
+    if np.count_nonzero(matrix) != len(matrix):
+        return None
+    (rows, columns) = np.nonzero(matrix)
+    if np.any(matrix[rows, columns] != 1) or np.any(np.bincount(rows, minlength=len(matrix)) != 1):
+        return None
+    permutation = np.empty(len(matrix), dtype=np.int64)
+    permutation[columns] = rows
+    return permutation
+
+
+def _is_controlled(matrix):
+    # Identity everywhere but on the bottom right 2 x 2 block: a 1 qubit gate controlled by all the other qubits
+    d = len(matrix) - 2
+    if d <= 0 or np.count_nonzero(matrix) > d + 4:
+        return False
+    (rows, columns) = np.nonzero(matrix)
+    outside = (rows < d) | (columns < d)
+    return bool(np.count_nonzero(outside) == d and np.all(rows[outside] == columns[outside])
+                and np.all(matrix[rows[outside], columns[outside]] == 1))
+
+
+def gate_structure(matrix):
+    """
+    Works out which specific kernel a gate can use. Dense gates are turned down after looking at their first row,
+    and the other checks only look at the nonzero entries, so this is cheap even for big gates.
+
+    Parameters
+    ----------
+    matrix -> 2**k x 2**k np.ndarray
+
+    Returns
+    -------
+    ('diagonal', diagonal), ('permutation', permutation), ('controlled', 2 x 2 matrix on the target), or None for a
+        gate that needs the 1 qubit, 2 qubit or general kernel
+    """
+    matrix = np.asarray(matrix)
+    # All three kinds have a single nonzero entry in their first row (a controlled gate starts with the identity) and
+    # at most 2**k + 2 nonzero entries in all
+    if np.count_nonzero(matrix[0]) > 1 or np.count_nonzero(matrix) > len(matrix) + 2:
+        return None
+    if _is_diagonal(matrix):
+        return 'diagonal', np.diagonal(matrix).copy()
+    permutation = _permutation(matrix)
+    if permutation is not None:
+        return 'permutation', permutation
+    if _is_controlled(matrix):
+        return 'controlled', matrix[-2:, -2:].copy()
+    return None
+
+
+def apply_structured(vector, structure, qubits, numQubits):
+    """
+    Applies a gate described by gate_structure. The input vector is not modified.
+
+    Parameters
+    ----------
+    vector -> np.ndarray of length 2**numQubits
+    structure -> tuple returned by gate_structure, not None
+    qubits -> sequence of k ints
+    numQubits -> int
+
+    Returns
+    -------
+    np.ndarray, the new state vector
+    """
+    (kind, data) = structure
+    vector = np.asarray(vector)
+    qubits = list(qubits)
+    if kind == 'permutation':
+        return apply_permutation(vector.astype(np.complex128, copy=False), data, qubits, numQubits)
+    output = vector.astype(np.complex128)
+    if kind == 'diagonal':
+        apply_diagonal(output, data, qubits, numQubits)
+    else:
+        apply_controlled(output, data, qubits[:-1], qubits[-1], numQubits)
+    return output
+
+
+def apply_gate(vector, matrix, qubits, numQubits):
+    """
+    Applies a gate to the chosen qubits of a state vector with the most specific kernel for it: diagonal gates (Z, S,
+    CZ, phase gates), permutations (X, CX, SWAP, Toffoli), controlled gates, and otherwise the 1 or 2 qubit kernel.
+    Bigger gates fall back to apply_local_operator. The input vector is not modified.
+
+    Parameters
+    ----------
+    vector -> np.ndarray of length 2**numQubits
+    matrix -> 2**k x 2**k np.ndarray
+    qubits -> sequence of k ints
+    numQubits -> int
+
+    Returns
+    -------
+    np.ndarray, the new state vector
+    """
+    matrix = np.asarray(matrix)
+    qubits = list(qubits)
+    k = len(qubits)
+    if matrix.shape != (2 ** k, 2 ** k):
+        raise Exception("Gate of shape {} can't act on {} qubits.".format(matrix.shape, k))
+    vector = np.asarray(vector)
+
+    structure = gate_structure(matrix)
+    if structure is not None:
+        return apply_structured(vector, structure, qubits, numQubits)
+    if k == 1:
+        output = vector.astype(np.complex128)
+        apply_1q(output, matrix, qubits[0], numQubits)
+        return output
+    if k == 2:
+        output = vector.astype(np.complex128)
+        apply_2q(output, matrix, qubits, numQubits)
+        return output
+    return apply_local_operator(matrix, vector.reshape((2,) * numQubits), qubits).reshape(-1)
+
+
+if __name__ == "__main__":
+    import time
+
+    n = 22
+    vector = np.zeros(2 ** n, dtype=np.complex128)
+    vector[0] = 1
+    H = (1 / np.sqrt(2)) * np.array([[1, 1],
+                                     [1, -1]])
+    print("Numba kernels: {}".format(numba_available()))
+
+    time1 = time.time()
+    for q in range(n):
+        apply_1q(vector, H, q, n)
+    time2 = time.time()
+    print("{} Hadamard gates on {} qubits took {} s.".format(n, n, time2 - time1))
+    print(cdf(probabilities(vector))[-1])
@@ -12,11 +12,14 @@ from qsimulator.basic import kronecker_product
 
 class Qubit(object):
 
+    __slots__ = ('norm_alpha', 'norm_beta', 'vector', 'P_alpha', 'P_beta')
+
     def __init__(self, alpha, beta):
 
-        # Normalised coefficients
-        self.norm_alpha = alpha / (math.sqrt(abs(alpha) ** 2 + abs(beta) ** 2))
-        self.norm_beta = beta / (math.sqrt((abs(alpha)) ** 2 + (abs(beta)) ** 2))
+        # Normalised coefficients, the norm is only computed once
+        norm = math.sqrt(abs(alpha) ** 2 + abs(beta) ** 2)
+        self.norm_alpha = alpha / norm
+        self.norm_beta = beta / norm
 
         # Matrix form
         self.vector = np.array([self.norm_alpha, self.norm_beta])
@@ -35,4 +38,4 @@ class Qubit(object):
     # Method to return quantum register from tensor product of qubits
     def __mul__(self, other):
         newState = kronecker_product(self.vector, other.vector)
-        return QR.State(newState)
+        return QR.State._from_vector(newState, len(newState).bit_length() - 1)
@@ -47,7 +47,7 @@ Quantum subroutine
 
 def construct_function(a, N):
     def func(x):
-        return a**x % N
+        return pow(int(a), int(x), N)  # modular exponentiation, a**x overflows for numpy integers
     return func
 
 
@@ -60,28 +60,29 @@ def quantum_subroutine(a, N):
     outputRegQubitsNum = int(np.ceil(np.log(N)/np.log(2)))
     outputReg = qs.zeros(outputRegQubitsNum)
 
+    # Fail before allocating anything if the dense oracle and QFT matrices don't fit in memory. This is only a check,
+    # the script has no other way of applying them, so the 'matrix' strategy is the only one estimated and nothing can
+    # fall back to gates on the state vector. The Operations describe the matrices allocated below.
+    numQubits = inputRegQubitsNum + outputRegQubitsNum
+    qs.select_backend([(qs.Operation(numQubits, 'permutation', 'oracle', itemsize=8), None)], numQubits,
+                      strategies=['matrix'])
+    qs.select_backend([(qs.Operation(inputRegQubitsNum, 'dense', 'QFT'), None)], inputRegQubitsNum,
+                      strategies=['matrix'])
+
     # We need an operator that maps |a>|0>**q state to |a>|x**a mod N>**q state
     crtState = inputReg * outputReg
     f = construct_function(a, N)
     size = len(crtState.vector)
-    operatorMatrix = np.zeros((size, size))
-    totalQubits = inputRegQubitsNum + outputRegQubitsNum
+    operatorMatrix = np.zeros((size, size))  # float64, the 'oracle' Operation of the check above has itemsize=8
 
     # In order to optimize calculation times we ignore any entry in the matrix for which
-    # current state is 0, meaning we can skip a lot of calculations
+    # current state is 0, meaning we only fill the columns |x>|0> and each of them has a single 1 in the row |x>|f(x)>
     time1 = time.time()
-    for i in range(size):
-        for j in range(0, size, 2**outputRegQubitsNum):
-            binj = str(qs.decimal_to_binary(j))  # Need to manually add 0 bits to the left if j is small
-            if len(binj) != totalQubits:
-                binj = '0' * (totalQubits - len(binj)) + binj
-            inputRegBits = binj[:inputRegQubitsNum]
-            inputRegNumber = qs.binary_to_decimal(inputRegBits)
-            functionMapBin = str(qs.decimal_to_binary(f(inputRegNumber)))
-            if len(functionMapBin) != outputRegQubitsNum:
-                functionMapBin = '0' * (outputRegQubitsNum - len(functionMapBin)) + functionMapBin
-            if qs.binary_to_decimal(str(inputRegBits) + str(functionMapBin)) == i:
-                operatorMatrix[i][j] = 1
+    sizes = [inputRegQubitsNum, outputRegQubitsNum]
+    inputs = np.arange(numStates)
+    outputs = np.array([f(x) for x in inputs], dtype=np.int64)
+    columns = qs.join_registers([inputs, 0], sizes)
+    operatorMatrix[qs.join_registers([inputs, outputs], sizes), columns] = 1
     time2 = time.time()
     print("Time to construct the oracle matrix was {} s.".format(time2 - time1))
 
@@ -94,7 +95,7 @@ def quantum_subroutine(a, N):
     # Measure the output register
     crtState = crtState.collapse_qubits(outputRegQubitsNum)
 
-    # Apply QFT
+    # Apply QFT, a complex128 matrix, the 'QFT' Operation of the check above
     crtState = qs.QFT_operator(inputRegQubitsNum)(crtState)
     time4 = time.time()
     print("Time to apply the QFT was {} s.".format(time4 - time3))
@@ -0,0 +1,28 @@
+import numpy as np
+from qsimulator.bitops import from_bits, to_bits
+from qsimulator.MPS import mps_zeros
+from qsimulator.QuantumGate import X
+from qsimulator.Stabilizer import StabilizerState
+
+
+def test_from_bits_inverts_to_bits():
+    indices = np.arange(64)
+    assert np.array_equal(from_bits(to_bits(indices, 6)), indices)
+
+
+def test_from_bits_wider_than_int64():
+    assert from_bits(np.ones(70, dtype=np.int8)) == 2 ** 70 - 1
+    bits = np.zeros((2, 100), dtype=np.int8)
+    bits[1, 0] = 1
+    assert list(from_bits(bits)) == [0, 2 ** 99]
+    # Every chunk of 63 bits lands in the right place
+    bits = np.random.default_rng(0).integers(0, 2, (3, 130))
+    assert list(from_bits(bits)) == [sum(int(b) << (129 - q) for q, b in enumerate(row)) for row in bits]
+
+
+def test_measure_100_qubit_mps():
+    assert mps_zeros(100).apply(X, [0]).measure() == 2 ** 99
+
+
+def test_measure_100_qubit_stabilizer_state():
+    assert StabilizerState(100).apply(X, [0]).measure() == 2 ** 99
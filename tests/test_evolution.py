@@ -0,0 +1,95 @@
+import tracemalloc
+import numpy as np
+from qsimulator.Evolution import trotter_step, trotter_evolve, expm_multiply, krylov_evolve
+from qsimulator.Observables import hamiltonian_operator
+from qsimulator.QuantumGate import I, X, Y, Z
+from qsimulator.QuantumRegister import State, zeros
+
+_LETTERS = {'I': I, 'X': X, 'Y': Y, 'Z': Z}
+
+
+def _dense(hamiltonian):
+    total = 0
+    for coefficient, pauli in hamiltonian:
+        matrix = np.ones((1, 1))
+        for letter in pauli:
+            matrix = np.kron(matrix, _LETTERS[letter])
+        total = total + coefficient * matrix
+    return total
+
+
+def _evolve_dense(hamiltonian, vector, time):
+    (eigenvalues, eigenvectors) = np.linalg.eigh(_dense(hamiltonian))
+    return eigenvectors @ (np.exp(-1j * time * eigenvalues) * (np.conjugate(eigenvectors.T) @ vector))
+
+
+def _random_state(numQubits, seed):
+    rng = np.random.default_rng(seed)
+    vector = rng.normal(size=2 ** numQubits) + 1j * rng.normal(size=2 ** numQubits)
+    return State(vector / np.linalg.norm(vector))
+
+
+def test_single_terms_are_exact_rotations():
+    state = _random_state(4, 0)
+    for pauli in ['IIII', 'ZIZZ', 'XIII', 'IYZX', 'YXYY']:
+        hamiltonian = [(0.7, pauli)]
+        expected = _evolve_dense(hamiltonian, state.vector, 0.3)
+        assert np.allclose(trotter_step(state, hamiltonian, 0.3).vector, expected)
+
+
+def test_trotter_and_krylov_match_dense_evolution():
+    hamiltonian = [(0.5, 'XXII'), (-0.3, 'IYZI'), (0.8, 'ZIIZ'), (0.2, 'YXZY'), (0.4, 'IIIX')]
+    state = _random_state(4, 1)
+    expected = _evolve_dense(hamiltonian, state.vector, 1.2)
+    (trotter, _) = trotter_evolve(state, hamiltonian, 1.2, tolerance=1e-7)
+    (krylov, _) = krylov_evolve(state, hamiltonian, 1.2, tolerance=1e-10)
+    assert np.linalg.norm(trotter.vector - expected) < 1e-6
+    assert np.linalg.norm(krylov.vector - expected) < 1e-9
+
+
+def test_high_weight_terms_need_no_dense_matrix():
+    n = 12
+    state = zeros(n)
+    tracemalloc.start()
+    try:
+        trotter_step(state, [(0.4, 'X' * n), (0.1, 'Y' * (n - 1) + 'Z')], 0.5)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    # A handful of vectors and index arrays, the dense 4096 x 4096 term alone would be 268 MB
+    assert peak < 20 * 16 * 2 ** n
+
+
+def _random_hamiltonian(numQubits, numTerms, seed):
+    rng = np.random.default_rng(seed)
+    return [(rng.normal(), ''.join(rng.choice(list('IXYZ'), numQubits))) for _ in range(numTerms)]
+
+
+def test_hamiltonian_operator_matches_dense_matrix():
+    hamiltonian = _random_hamiltonian(6, 30, 2)
+    vector = _random_state(6, 3).vector
+    assert np.allclose(hamiltonian_operator(hamiltonian, 6)(vector), _dense(hamiltonian) @ vector)
+
+
+def test_hamiltonian_operator_stores_no_signs():
+    n = 12
+    hamiltonian = _random_hamiltonian(n, 30, 4)
+    tracemalloc.start()
+    try:
+        operator = hamiltonian_operator(hamiltonian, n)
+        stored = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    # Only the index array is kept, not one array of signs for each of the ~30 groups
+    assert stored < 3 * 8 * 2 ** n
+    assert operator(zeros(n).vector).shape == (2 ** n,)
+
+
+def test_lanczos_breakdown_is_relative_to_the_hamiltonian():
+    # An eigenvector (up to rounding) of a Hamiltonian with large coefficients spans an invariant Krylov space
+    hamiltonian = [(1e6, 'XXIIII'), (7e5, 'ZYIIXI'), (3e5, 'IXZIIZ'), (2e5, 'YYYIZX'), (4e5, 'IIIXXZ')]
+    (eigenvalues, eigenvectors) = np.linalg.eigh(_dense(hamiltonian))
+    for scale in (1, 1e-9):
+        (vector, error) = expm_multiply(hamiltonian_operator(hamiltonian, 6), scale * eigenvectors[:, 3], 1.0)
+        assert error == 0
+        assert np.allclose(vector / scale, np.exp(-1j * eigenvalues[3]) * eigenvectors[:, 3], atol=1e-8)
@@ -0,0 +1,19 @@
+import subprocess
+import sys
+
+# Timing is left to benchmarks.py, a wall-clock budget would fail at random on a busy machine
+_SCRIPT = """
+import sys, qsimulator
+heavy = ['numpy'] + ['qsimulator.' + name for name in qsimulator._SUBMODULES]
+print(','.join(name for name in heavy if name in sys.modules))
+qsimulator.State
+print('numpy' in sys.modules, 'qsimulator.QuantumRegister' in sys.modules, 'qsimulator.MPS' in sys.modules)
+"""
+
+
+def test_bare_import_loads_no_heavy_modules():
+    output = subprocess.run([sys.executable, '-c', _SCRIPT], capture_output=True, text=True, check=True)
+    (loaded, afterFirstUse) = output.stdout.splitlines()
+    assert loaded == ''
+    # The first use of a name loads its submodule and nothing unrelated
+    assert afterFirstUse == 'True True False'
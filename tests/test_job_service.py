@@ -0,0 +1,55 @@
+import asyncio
+import time
+import pytest
+from qsimulator.JobService import JobServer, JobClient, JobCancelled
+
+# The workers import the jobs by name, the test directory is on their path as well
+JOBS = {'count_primes': 'qsimulator.JobService:_count_primes', 'sleep': 'test_job_service:_sleep'}
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+async def _wait_until_idle(server, timeout=30):
+    deadline = time.monotonic() + timeout
+    while server._jobs and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    return not server._jobs
+
+
+def test_submit_cancel_and_disconnect():
+    async def main():
+        server = JobServer(JOBS, port=0, workers=1, preload=())
+        await server.start()
+        try:
+            async with JobClient(server.address) as client:
+                # A finished job is forgotten by the server
+                jobId = await client.submit('count_primes', [1000])
+                assert await client.result(jobId) == 168
+                assert server._jobs == {}
+
+                # A running job that never reports progress is stopped, and its worker replaced
+                sleeper = await client.submit('sleep', [60])
+                queued = await client.submit('count_primes', [100])
+                async for event in client.events(sleeper):
+                    if event['event'] == 'started':
+                        break
+                await client.cancel(sleeper)
+                with pytest.raises(JobCancelled):
+                    await asyncio.wait_for(client.result(sleeper), 10)
+                assert await asyncio.wait_for(client.result(queued), 30) == 25
+
+            # Closing the connection cancels its running job
+            async with JobClient(server.address) as client:
+                await client.submit('sleep', [60])
+                while not server._running:
+                    await asyncio.sleep(0.05)
+            assert await _wait_until_idle(server)
+            async with JobClient(server.address) as client:
+                assert await asyncio.wait_for(client.result(await client.submit('count_primes', [100])), 30) == 25
+        finally:
+            await server.close()
+
+    asyncio.run(asyncio.wait_for(main(), 120))
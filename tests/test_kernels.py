@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from qsimulator import kernels
+from qsimulator.QuantumGate import QuantumGate, CX, H
+from qsimulator.QuantumRegister import State
+
+
+@pytest.fixture(params=[True, False], ids=['numba', 'numpy'])
+def use_numba(request, monkeypatch):
+    # Without Numba installed both runs use the numpy kernels
+    monkeypatch.setattr(kernels, 'USE_NUMBA', request.param)
+    return request.param
+
+
+def _random_state(numQubits, seed):
+    rng = np.random.default_rng(seed)
+    vector = rng.normal(size=2 ** numQubits) + 1j * rng.normal(size=2 ** numQubits)
+    return vector / np.linalg.norm(vector)
+
+
+def test_full_register_gates_use_kernels(use_numba):
+    n = 5
+    rng = np.random.default_rng(0)
+    controlled = np.identity(2 ** n, dtype=np.complex128)
+    controlled[-2:, -2:] = H
+    gates = [np.diag(np.exp(1j * rng.uniform(size=2 ** n))), np.identity(2 ** n)[rng.permutation(2 ** n)], controlled]
+    for matrix in gates:
+        assert kernels.gate_structure(matrix) is not None
+        vector = _random_state(n, 1)
+        state = State(vector.copy()).permute_qubits([2, 0, 4, 1, 3])
+        expected = matrix @ state.vector
+        gate = QuantumGate(matrix)
+        for _ in range(2):  # the second call reuses the cached structure
+            assert np.allclose(gate(state).vector, expected)
+
+
+def test_dense_gates_have_no_structure():
+    assert kernels.gate_structure(np.kron(H, H)) is None
+
+
+def test_controlled_numpy_fallback_on_two_qubits(monkeypatch):
+    # With only the target axis left the numpy fallback used to update copies instead of the vector
+    monkeypatch.setattr(kernels, 'USE_NUMBA', False)
+    vector = _random_state(2, 2)
+    output = vector.copy()
+    kernels.apply_controlled(output, CX[-2:, -2:], [0], 1, 2)
+    assert np.allclose(output, CX @ vector)
+    assert np.allclose(kernels.apply_gate(vector, CX, [0, 1], 2), CX @ vector)
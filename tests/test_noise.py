@@ -0,0 +1,23 @@
+import numpy as np
+from qsimulator.Noise import KrausChannel
+from qsimulator.QuantumRegister import zeros
+
+
+class _Draw(object):
+    # Random number generator returning a fixed number
+    def __init__(self, x):
+        self.x = x
+
+    def random(self):
+        return self.x
+
+
+def test_trajectory_skips_impossible_last_branch():
+    # Amplitude damping on |0>: the second operator can't happen, and a draw above the rounded total of the first
+    # branch must not pick it
+    gamma = 0.3
+    channel = KrausChannel([np.array([[1, 0], [0, np.sqrt(1 - gamma)]]), np.array([[0, np.sqrt(gamma)], [0, 0]])])
+    channel.operators[0] = channel.operators[0] * (1 - 1e-12)
+    state = channel(zeros(1), rng=_Draw(1 - 1e-15))
+    assert np.all(np.isfinite(state.vector))
+    assert np.allclose(state.vector, [1, 0])
@@ -0,0 +1,22 @@
+import numpy as np
+from qsimulator import kernels
+from qsimulator.QuantumGate import xorOracle, hGate, xGate, ryGate
+from qsimulator.QuantumRegister import zeros
+
+
+def test_xor_oracle_detects_minus_state_made_by_gates(monkeypatch):
+    n = 4
+    oracle = xorOracle(lambda x: int(x in (3, 9)), n)
+    state = zeros(n + 1)
+    for qubit in range(n):
+        state = hGate()(state, [qubit])
+    # |-> on the output qubit, correct only up to rounding after the rotations
+    state = xGate()(state, [n])
+    state = ryGate(0.3)(ryGate(-0.3)(hGate()(state, [n]), [n]), [n])
+    expected = oracle.matrix @ state.vector
+    assert not np.array_equal(state.vector.reshape(-1, 2)[:, 0], -state.vector.reshape(-1, 2)[:, 1])
+
+    def no_permutation(*args):
+        raise AssertionError("The oracle should have been applied as a phase flip.")
+    monkeypatch.setattr(kernels, 'apply_permutation', no_permutation)
+    assert np.allclose(oracle(state).vector, expected)
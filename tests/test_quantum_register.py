@@ -0,0 +1,15 @@
+import numpy as np
+import pytest
+from qsimulator.QuantumRegister import State, zeros
+
+
+def test_collapse_qubits_needs_qubits_to_measure():
+    with pytest.raises(Exception, match="number of rightmost qubits"):
+        zeros(2).collapse_qubits()
+
+
+def test_collapse_qubits_by_count_or_list():
+    # |011>: measuring the last two qubits or qubit 1 leaves the other qubits as they were
+    state = State(np.eye(8)[3])
+    assert np.allclose(state.collapse_qubits(2).vector, [1, 0])
+    assert np.allclose(state.collapse_qubits(qubits=[1]).vector, [0, 1, 0, 0])
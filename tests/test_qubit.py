@@ -0,0 +1,12 @@
+from qsimulator.qubit import Qubit
+from qsimulator.QuantumRegister import zeros
+
+
+def test_qubit_times_register():
+    state = Qubit(1, 0) * zeros(3)
+    assert state.num_qubits == 4
+    assert len(state.vector) == 16
+
+
+def test_qubit_times_qubit():
+    assert (Qubit(1, 0) * Qubit(0, 1)).num_qubits == 2
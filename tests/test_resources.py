@@ -0,0 +1,34 @@
+import tracemalloc
+import numpy as np
+import grover_algorithm
+from qsimulator.QuantumRegister import equiprobable
+from qsimulator.Resources import estimate_resources, run_plan
+
+
+def _measured_peak(function, *args):
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_grover_estimate_covers_measured_peak():
+    # Load the kernels first, so that only the algorithm's own arrays are measured
+    grover_algorithm.grover_algorithm(4)
+    for n in (12, 13):
+        report = estimate_resources(grover_algorithm.grover_plan(n, 0), n)
+        assert report.chosen == 'local'
+        peak = _measured_peak(grover_algorithm.grover_algorithm, n)
+        # The plan's Python objects are only roughly accounted for
+        assert 0.99 * peak <= report['local'].peak_memory <= 1.5 * peak
+
+
+def test_grover_strategies_agree():
+    plan = grover_algorithm.grover_plan(5, 7)
+    (local, _) = run_plan(equiprobable(5), plan, strategies=['local'])
+    (matrix, report) = run_plan(equiprobable(5), plan, strategies=['matrix'])
+    assert report.chosen == 'matrix'
+    assert np.allclose(local.vector, matrix.vector)
+    assert np.argmax(np.abs(local.vector)) == 7
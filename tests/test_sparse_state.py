@@ -0,0 +1,11 @@
+import numpy as np
+import pytest
+from qsimulator.SparseState import SparseState
+
+
+def test_measure_zero_state():
+    # Every amplitude is pruned by the zero matrix
+    state = SparseState(np.array([0]), np.array([1.0]), 1).apply(np.zeros((2, 2)), [0])
+    assert len(state.amplitudes) == 0
+    with pytest.raises(Exception, match="zero state"):
+        state.measure()